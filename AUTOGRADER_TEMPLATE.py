@@ -8,29 +8,68 @@ Key patterns:
 3. Main execution has comprehensive error handling
 4. Always ensures correct number of problem scores
 5. Always outputs valid CSV
+6. Each test case and each problem has a time limit, so an infinite loop
+   only fails the tests it hangs in
 """
 
 #******************************************************************************
 #DO NOT MODIFY THE CODE BELOW
 #******************************************************************************
 
+import signal as _signal
+import threading as _threading
+import time as _time
+
 POINTS_PER_PROBLEM = 4.0  # Adjust as needed
+TEST_TIME_LIMIT = 1.0      # seconds per test case
+PROBLEM_TIME_LIMIT = 1.5   # seconds for all tests of one problem
 points_by_problem = []
 
 
+class GradingTimeout(BaseException):
+    # Not an Exception, so `except Exception` in student code can't swallow it
+    pass
+
+
+def _raise_grading_timeout(signum, frame):
+    raise GradingTimeout()
+
+
+def run_with_time_limit(func, args, seconds):
+    """Calls func(*args), raising GradingTimeout after `seconds` of wall time."""
+    if (not hasattr(_signal, "setitimer")
+            or _threading.current_thread() is not _threading.main_thread()):
+        return func(*args)
+    previous = _signal.signal(_signal.SIGALRM, _raise_grading_timeout)
+    # Keep firing every 0.1s in case student code catches the first one
+    _signal.setitimer(_signal.ITIMER_REAL, seconds, 0.1)
+    try:
+        return func(*args)
+    finally:
+        _signal.setitimer(_signal.ITIMER_REAL, 0)
+        _signal.signal(_signal.SIGALRM, previous if previous is not None else _signal.SIG_DFL)
+
+
 def grade_problem(problem_num, test_cases, solution_func, max_points):
     """Grades a single problem with test cases."""
     passed_tests = 0
     num_tests = len(test_cases)
+    deadline = _time.monotonic() + PROBLEM_TIME_LIMIT
 
     for i in range(num_tests):
         inputs, expected = test_cases[i]
+        remaining = deadline - _time.monotonic()
+        if remaining <= 0:
+            print("Problem", problem_num, "- Test", (i+1), "SKIPPED: problem time limit reached")
+            continue
         try:
-            output = solution_func(*inputs)
+            output = run_with_time_limit(solution_func, inputs, min(TEST_TIME_LIMIT, remaining))
             if output == expected:
                 passed_tests += 1
             else:
                 print("Problem", problem_num, "- Test", (i+1), "FAILED. Output:", output, "Expected:", expected)
+        except GradingTimeout:
+            print("Problem", problem_num, "- Test", (i+1), "TIMEOUT: took too long")
         except Exception as ex:
             print("Problem", problem_num, "- Test", (i+1), "EXCEPTION:", ex)
 
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Asyncio notebook executor for the CS3 Autograder
+Drives many Jupyter kernels from a single event loop using nbclient's async API
+"""
+
+import asyncio
+
+from nbclient import NotebookClient
+from nbclient.exceptions import CellExecutionError, CellTimeoutError, DeadKernelError
+
+from kernel_pool import ResourceLimitedClientMixin
+from output_limits import OutputLimitMixin
+from phase_timing import PhaseTimingMixin
+
+
+class LimitedNotebookClient(PhaseTimingMixin, OutputLimitMixin, ResourceLimitedClientMixin,
+                            NotebookClient):
+    """
+    NotebookClient that caps the stream output it keeps and the resources its
+    kernel uses, and times its cells.
+    """
+
+
+class AsyncNotebookExecutor:
+    """
+    Executes notebooks concurrently from one process.
+
+    At most `concurrency` notebooks (and therefore kernels) run at once.
+    Each cell may run for `cell_timeout` seconds; output the event loop has
+    not read yet when a cell finishes is waited for just as long, so a busy
+    loop delays a notebook instead of cutting its output. A notebook that is
+    still running after `notebook_timeout` seconds is cancelled and its
+    kernel shut down. With `resource_limits` (a ResourceLimits), every
+    kernel runs under those limits.
+    """
+
+    def __init__(self, concurrency, cell_timeout, notebook_timeout=None,
+                 kernel_name='python3', resource_limits=None):
+        self.concurrency = concurrency
+        self.cell_timeout = cell_timeout
+        self.notebook_timeout = notebook_timeout
+        self.kernel_name = kernel_name
+        self.resource_limits = resource_limits
+        self._semaphore = None
+
+    async def execute(self, notebook, cwd, limiter=None, timer=None, monitor=None):
+        """
+        Executes `notebook` in place, capping its stream output with
+        `limiter` (an OutputLimiter), timing kernel start and cells with
+        `timer` (a PhaseTimer) and measuring the kernel's resource usage with
+        `monitor` (a resource_usage.UsageMonitor) if given.
+
+        Returns:
+            tuple: (status, message) where status is 'ok', 'error', 'timeout'
+            or, if the kernel broke one of its resource limits, a key of
+            resource_limits.BREACH_MESSAGES
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with self._semaphore:
+            client = LimitedNotebookClient(
+                notebook,
+                timeout=self.cell_timeout,
+                iopub_timeout=self.cell_timeout,
+                kernel_name=self.kernel_name,
+                resources={'metadata': {'path': cwd}},
+            )
+            client.output_limiter = limiter
+            client.resource_limits = self.resource_limits
+            client.phase_timer = timer
+            client.usage_monitor = monitor
+            if timer is not None:
+                timer.start_execution()
+            try:
+                await asyncio.wait_for(client.async_execute(), self.notebook_timeout)
+                return ('ok', None)
+            except (CellTimeoutError, asyncio.TimeoutError):
+                return ('timeout', None)
+            except CellExecutionError as e:
+                return (self._breach(client, e) or 'error', str(e))
+            except DeadKernelError as e:
+                return (self._breach(client, e) or 'error', f"Kernel died: {e}")
+            except Exception as e:
+                return ('error', str(e))
+            finally:
+                if timer is not None:
+                    timer.stop_execution()
+                if monitor is not None:
+                    monitor.stop()
+                if limiter is not None:
+                    limiter.close()
+
+    @staticmethod
+    def _breach(client, error):
+        """Returns the resource limit the notebook's kernel broke, or None."""
+        if client.limited_km is None:
+            return None
+        return client.limited_km.limit_breach(
+            getattr(error, 'ename', None), getattr(error, 'evalue', None)
+        )
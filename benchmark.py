@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the CS3 Autograder
+Generates a synthetic corpus of exam notebooks, grades it with the full
+run_autograder.main() pipeline and reports notebooks per second and
+per-notebook latency percentiles by category, saved as JSON so runs can be
+compared across commits and machines
+"""
+
+import argparse
+import base64
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import nbformat
+from nbformat.v4 import new_code_cell, new_markdown_cell, new_notebook, new_output
+
+from config import MEMORY_LIMIT_MB
+from phase_timing import percentile, phase_summary
+
+# A correct solution to the exam
+SOLUTION = '''
+class GraphAL:
+    def __init__(self, vertices, directed=False, weighted=False):
+        self.vertices = vertices
+        self.directed = directed
+        self.weighted = weighted
+        self.adj = [[] for _ in range(vertices)]
+
+    def insert_edge(self, source, dest, weight=1):
+        self.adj[source].append((dest, weight))
+        if not self.directed:
+            self.adj[dest].append((source, weight))
+
+    def is_there_an_edge(self, u, v):
+        return any(dest == v for dest, _ in self.adj[u])
+
+    def compute_in_degree(self, v):
+        return sum(1 for edges in self.adj for dest, _ in edges if dest == v)
+
+    def is_isolated(self, v):
+        return not self.adj[v] and self.compute_in_degree(v) == 0
+
+    def highest_out_degree_vertex(self):
+        if self.vertices == 0:
+            return -1
+        return max(range(self.vertices), key=lambda v: (len(self.adj[v]), -v))
+
+    def sorted_edge_values(self):
+        return sorted(weight for edges in self.adj for _, weight in edges)
+
+    def get_adjacent_neighbors(self, v):
+        return sorted(dest for dest, _ in self.adj[v])
+
+
+class GraphAM:
+    def __init__(self, vertices, directed=False, weighted=False):
+        self.vertices = vertices
+        self.directed = directed
+        self.weighted = weighted
+        self.am = [[0] * vertices for _ in range(vertices)]
+
+    def insert_edge(self, source, dest, weight=1):
+        self.am[source][dest] = weight
+        if not self.directed:
+            self.am[dest][source] = weight
+
+    def is_there_an_edge(self, u, v):
+        return self.am[u][v] != 0
+
+    def compute_in_degree(self, v):
+        return sum(1 for row in self.am if row[v] != 0)
+
+    def is_isolated(self, v):
+        return not any(self.am[v]) and self.compute_in_degree(v) == 0
+
+    def highest_out_degree_vertex(self):
+        if self.vertices == 0:
+            return -1
+        return max(range(self.vertices),
+                   key=lambda v: (sum(1 for w in self.am[v] if w != 0), -v))
+
+    def sorted_edge_values(self):
+        return sorted(w for row in self.am for w in row if w != 0)
+
+    def get_adjacent_neighbors(self, v):
+        return [dest for dest, w in enumerate(self.am[v]) if w != 0]
+'''
+
+# Bugs for partially wrong submissions: (correct code, wrong code)
+BUGS = [
+    ("return any(dest == v for dest, _ in self.adj[u])", "return bool(self.adj[u])"),
+    ("return sum(1 for row in self.am if row[v] != 0)", "return sum(1 for w in self.am[v] if w != 0)"),
+    ("return sorted(dest for dest, _ in self.adj[v])", "return [dest for dest, _ in self.adj[v]][1:]"),
+    ("return not any(self.am[v]) and", "return not any(self.am[v]) or"),
+    ("return sorted(weight for edges in self.adj for _, weight in edges)",
+     "return sorted(set(weight for edges in self.adj for _, weight in edges))"),
+]
+
+
+def student_cell(category, index):
+    return (f'first_name = "Bench"\n'
+            f'last_name = "{category.title().replace("_", "")}{index}"\n'
+            f'student_id = "{900000 + index}"')
+
+
+def correct_cells(index):
+    return [SOLUTION, 'g = GraphAL(3, directed=True)\ng.insert_edge(0, 1)\nprint(g.adj)']
+
+
+def partially_wrong_cells(index):
+    solution = SOLUTION
+    for correct, wrong in BUGS[index % len(BUGS):][:2]:
+        solution = solution.replace(correct, wrong)
+    return [solution]
+
+
+def syntax_error_cells(index):
+    return [SOLUTION.replace("def is_isolated(self, v):", "def is_isolated(self, v)", 1)]
+
+
+def infinite_loop_cells(index):
+    if index % 2:
+        # In a graded method: only its tests time out
+        return [SOLUTION.replace("return sum(1 for edges in self.adj for dest, _ in edges if dest == v)",
+                                 "while True:\n            pass")]
+    # At the top level: the whole notebook times out
+    return [SOLUTION, 'while True:\n    pass']
+
+
+def output_flood_cells(index):
+    return [SOLUTION, 'for i in range(300000):\n    print("debug output line", i)']
+
+
+def memory_hog_cells(index):
+    # Past MEMORY_LIMIT_MB when it is set
+    megabytes = 2 * MEMORY_LIMIT_MB if MEMORY_LIMIT_MB else 1024
+    return [SOLUTION, f'hog = bytearray({megabytes} * 1024 * 1024)\nprint(len(hog))']
+
+
+def huge_image_cells(index):
+    return [SOLUTION, 'print("Figure: the exam graph")']
+
+
+# Category -> builder of the code cells after the student details cell
+CATEGORIES = {
+    'correct': correct_cells,
+    'partially_wrong': partially_wrong_cells,
+    'syntax_error': syntax_error_cells,
+    'infinite_loop': infinite_loop_cells,
+    'output_flood': output_flood_cells,
+    'memory_hog': memory_hog_cells,
+    'huge_image': huge_image_cells,
+}
+
+IMAGE_MB = 4   # megabytes of PNG outputs saved in each huge_image notebook
+
+
+def build_notebook(category, index, rng):
+    """Returns a synthetic submission of the given category."""
+    notebook = new_notebook()
+    notebook.metadata['kernelspec'] = {
+        'name': 'python3', 'display_name': 'Python 3', 'language': 'python',
+    }
+    cells = [new_markdown_cell("# Exam Three - Part I"),
+             new_code_cell(student_cell(category, index))]
+    cells += [new_code_cell(source) for source in CATEGORIES[category](index)]
+    if category == 'huge_image':
+        # Outputs saved by the student's own run, as with inline plots
+        data = base64.b64encode(rng.randbytes(IMAGE_MB * 1024 * 1024 // 4)).decode('ascii')
+        cells[-1].outputs = [
+            new_output('display_data', data={'image/png': data, 'text/plain': '<Figure>'})
+            for _ in range(4)
+        ]
+    notebook.cells = cells
+    return notebook
+
+
+def make_corpus(directory, per_category, categories=None, seed=0):
+    """
+    Writes `per_category` synthetic notebooks of each category to `directory`.
+
+    Returns:
+        dict: Notebook filename -> category
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    corpus = {}
+    for category in categories or CATEGORIES:
+        for index in range(per_category):
+            filename = f"Exam Three - Part I_{category}{index}_attempt_2024-01-01.ipynb"
+            with open(os.path.join(directory, filename), 'w', encoding='utf-8') as f:
+                nbformat.write(build_notebook(category, index, rng), f)
+            corpus[filename] = category
+    return corpus
+
+
+def latency_summary(seconds):
+    """Count, mean and p50/p95/p99/max of per-notebook latencies."""
+    return {
+        'count': len(seconds),
+        'mean': sum(seconds) / len(seconds) if seconds else None,
+        'p50': percentile(seconds, 0.50),
+        'p95': percentile(seconds, 0.95),
+        'p99': percentile(seconds, 0.99),
+        'max': max(seconds) if seconds else None,
+    }
+
+
+def git_commit():
+    """The commit the autograder is at, or None outside a git checkout."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(records, corpus, elapsed):
+    """
+    Builds the benchmark report from the records run_autograder.main()
+    returned.
+
+    Returns:
+        dict: Throughput, overall latency, per-phase timings and, per
+        category, latency and the CSV statuses the notebooks got
+    """
+    by_category = {}
+    for record in records:
+        by_category.setdefault(corpus[record['filename']], []).append(record)
+    seconds = [record['seconds'] for record in records if record['seconds'] is not None]
+    return {
+        'notebooks': len(records),
+        'elapsed': elapsed,
+        'notebooks_per_second': len(records) / elapsed if elapsed else None,
+        'latency': latency_summary(seconds),
+        'phases': {
+            name: {'count': count, 'p50': p50, 'p95': p95, 'p99': p99, 'max': peak,
+                   'total': wall, 'cpu': cpu}
+            for name, count, p50, p95, p99, peak, wall, cpu
+            in phase_summary([r['timing'] for r in records if r['timing'] is not None])
+        },
+        'categories': {
+            category: dict(
+                latency_summary([r['seconds'] for r in group if r['seconds'] is not None]),
+                statuses=dict(Counter(r['status'] for r in group)),
+            )
+            for category, group in by_category.items()
+        },
+    }
+
+
+def print_report(report):
+    """Prints a benchmark report as a table."""
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.0f}"
+
+    print("=" * 70)
+    print(f"Notebooks: {report['notebooks']} in {report['elapsed']:.1f}s "
+          f"({report['notebooks_per_second']:.2f} notebooks/s)")
+    print(f"{'category':<16}{'n':>4}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+    rows = list(report['categories'].items()) + [('all', report['latency'])]
+    for category, summary in rows:
+        statuses = ", ".join(f"{k} {v}" for k, v in sorted(summary.get('statuses', {}).items()))
+        print(f"{category:<16}{summary['count']:>4}{ms(summary['p50']):>9}"
+              f"{ms(summary['p95']):>9}{ms(summary['p99']):>9}  {statuses}")
+    print("=" * 70)
+
+
+def parse_args(argv=None):
+    """Parses the command line options for the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="CS3 Autograder - throughput benchmark",
+        epilog="Arguments after -- are passed to run_autograder "
+               "(e.g. -- --backend fork --workers 4)",
+    )
+    parser.add_argument(
+        '--per-category', type=int, default=4, metavar='N',
+        help="Synthetic notebooks per category (default: 4)"
+    )
+    parser.add_argument(
+        '--categories', nargs='+', choices=list(CATEGORIES), metavar='CATEGORY',
+        help=f"Categories to generate (default: all of {', '.join(CATEGORIES)})"
+    )
+    parser.add_argument(
+        '--output', metavar='FILE',
+        help="JSON file for the results (default: benchmark-<time>.json)"
+    )
+    parser.add_argument(
+        '--workdir', metavar='DIR',
+        help="Directory for the corpus and the grading output "
+             "(default: a temporary directory, removed afterwards)"
+    )
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the generated corpus")
+    parser.add_argument('autograder_args', nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.per_category < 1:
+        parser.error("--per-category must be at least 1")
+    if args.autograder_args[:1] == ['--']:
+        args.autograder_args = args.autograder_args[1:]
+    return args
+
+
+def main(argv=None):
+    """Generates the corpus, grades it and saves the report."""
+    args = parse_args(argv)
+    workdir = args.workdir or tempfile.mkdtemp(prefix='autograder-benchmark-')
+    input_dir = os.path.join(workdir, 'Input')
+    output_dir = os.path.join(workdir, 'Output')
+    shutil.rmtree(output_dir, ignore_errors=True)
+
+    corpus = make_corpus(input_dir, args.per_category, args.categories, args.seed)
+    print(f"Generated {len(corpus)} notebook(s) in {input_dir}")
+
+    import run_autograder
+
+    # Every notebook is executed; the grading log goes to a file
+    autograder_argv = ['--input-dir', input_dir, '--output-dir', output_dir,
+                       '--no-cache'] + args.autograder_args
+    log_path = os.path.join(workdir, 'autograder.log')
+    print(f"Grading: run_autograder {' '.join(autograder_argv)}")
+    try:
+        with open(log_path, 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+            start = time.perf_counter()
+            records = run_autograder.main(autograder_argv)
+            elapsed = time.perf_counter() - start
+    except SystemExit:
+        print(f"ERROR: the autograder exited early, see {log_path}")
+        raise
+
+    report = summarize(records, corpus, elapsed)
+    report.update({
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'machine': {
+            'hostname': platform.node(),
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'python': sys.version.split()[0],
+        },
+        'corpus': {'per_category': args.per_category, 'seed': args.seed,
+                   'categories': sorted(set(corpus.values()))},
+        'autograder_args': args.autograder_args,
+    })
+    print_report(report)
+
+    output = args.output or datetime.datetime.now().strftime('benchmark-%Y%m%d-%H%M%S.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to: {output}")
+    if args.workdir is None:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Dependency-aware cell pruning for the CS3 Autograder
+Works out from a def/use graph of top-level names which student code cells
+the autograder depends on, so demo, timing and plotting cells can be skipped
+"""
+
+import ast
+
+from prescreen import is_dynamic, parse_cell
+
+# Calls that change the interpreter for every later cell, so a cell making
+# one is always kept
+ENVIRONMENT_CALLS = {
+    'sys.setrecursionlimit', 'sys.setswitchinterval', 'sys.path.append', 'sys.path.insert',
+    'threading.stack_size', 'resource.setrlimit', 'os.chdir',
+    'random.seed', 'np.random.seed', 'numpy.random.seed',
+}
+
+
+def _dotted_name(node):
+    """Returns 'a.b.c' for a Name/Attribute chain, or None."""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return '.'.join(reversed(parts))
+
+
+def _root_name(node):
+    """Returns the name at the root of an attribute/subscript chain, or None."""
+    while isinstance(node, (ast.Attribute, ast.Subscript)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def _argument_names(args):
+    names = [a.arg for a in args.posonlyargs + args.args + args.kwonlyargs]
+    names += [a.arg for a in (args.vararg, args.kwarg) if a is not None]
+    return names
+
+
+class _Scope:
+    """
+    Names bound and used by one scope. A function (or lambda or
+    comprehension) only uses the outer names it does not bind itself, as
+    Python resolves those statically; module and class scopes count every
+    name they load, because there the order of statements decides what a
+    name refers to.
+    """
+
+    def __init__(self, kind, nodes, params=()):
+        self.kind = kind
+        self.bound = set(params)
+        self.loads = set()
+        self.declared = set()     # global/nonlocal names
+        self.mutated = set()      # roots of x.attr = ..., x[k] = ..., x.method(...)
+        self.calls = set()        # dotted names of calls made in this scope
+        self.children = []
+        self._visit(list(nodes))
+
+    def _visit(self, stack):
+        while stack:
+            node = stack.pop()
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                self.bound.add(node.name)
+                # Decorators, defaults and annotations run in this scope
+                stack += node.decorator_list + node.args.defaults
+                stack += [d for d in node.args.kw_defaults if d is not None]
+                stack += [a.annotation for a in node.args.posonlyargs + node.args.args
+                          + node.args.kwonlyargs if a.annotation is not None]
+                if node.returns is not None:
+                    stack.append(node.returns)
+                self.children.append(_Scope('function', node.body, _argument_names(node.args)))
+                continue
+            if isinstance(node, ast.Lambda):
+                stack += node.args.defaults + [d for d in node.args.kw_defaults if d is not None]
+                self.children.append(_Scope('function', [node.body], _argument_names(node.args)))
+                continue
+            if isinstance(node, ast.ClassDef):
+                self.bound.add(node.name)
+                stack += node.bases + [k.value for k in node.keywords] + node.decorator_list
+                self.children.append(_Scope('class', node.body))
+                continue
+            if isinstance(node, (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)):
+                # The first iterable is evaluated here, the rest in the comprehension
+                stack.append(node.generators[0].iter)
+                inner = [g.target for g in node.generators]
+                inner += [g.iter for g in node.generators[1:]]
+                inner += [i for g in node.generators for i in g.ifs]
+                inner += [node.key, node.value] if isinstance(node, ast.DictComp) else [node.elt]
+                self.children.append(_Scope('function', inner))
+                continue
+
+            if isinstance(node, ast.Name):
+                if isinstance(node.ctx, ast.Load):
+                    self.loads.add(node.id)
+                else:
+                    self.bound.add(node.id)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                self.bound.update((a.asname or a.name).split('.')[0]
+                                  for a in node.names if a.name != '*')
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                self.declared.update(node.names)
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                self.bound.add(node.name)
+            elif isinstance(node, (ast.Attribute, ast.Subscript)) and (
+                    not isinstance(node.ctx, ast.Load)):
+                root = _root_name(node)
+                if root is not None:
+                    self.mutated.add(root)
+            elif isinstance(node, ast.Call):
+                name = _dotted_name(node.func)
+                if name is not None:
+                    self.calls.add(name)
+                if isinstance(node.func, ast.Attribute):
+                    root = _root_name(node.func.value)
+                    if root is not None:
+                        self.mutated.add(root)
+            stack.extend(ast.iter_child_nodes(node))
+
+    def analyse(self):
+        """
+        Returns:
+            tuple: (names used from enclosing scopes, names declared global
+            anywhere inside)
+        """
+        free = set(self.loads)
+        declared = set(self.declared)
+        for child in self.children:
+            child_free, child_declared = child.analyse()
+            free |= child_free
+            declared |= child_declared
+        if self.kind == 'function':
+            free -= self.bound - self.declared
+        return free, declared
+
+
+def cell_dependencies(tree):
+    """
+    Returns:
+        dict: 'defines' (global names the cell binds), 'uses' (global names
+        it reads, including from inside its functions), 'mutates' (global
+        names whose attributes or items it changes at top level) and
+        'environment' (True if it changes the interpreter, see
+        ENVIRONMENT_CALLS)
+    """
+    scope = _Scope('module', tree.body)
+    uses, declared = scope.analyse()
+    return {
+        'defines': scope.bound | declared,
+        'uses': uses,
+        'mutates': scope.mutated,
+        'environment': bool(scope.calls & ENVIRONMENT_CALLS),
+    }
+
+
+def cells_to_skip(sources, grader_code):
+    """
+    Finds the code cells the autograder does not depend on.
+
+    Starting from the names the autograder reads (GraphAL, GraphAM,
+    first_name, ...), a cell is kept if it defines or changes a needed name
+    or changes the interpreter, and the names a kept cell reads are needed
+    in turn. Every cell binding a needed name is kept, whatever its position.
+
+    Args:
+        sources: Student code cell sources, in notebook order
+        grader_code: The autograder code
+
+    Returns:
+        list: Indices into `sources` of the cells that can be skipped, or
+        None if the notebook cannot be analysed (IPython syntax, syntax
+        errors, exec() and the like)
+    """
+    trees = [parse_cell(source)[0] for source in sources]
+    if any(tree is None for tree in trees) or is_dynamic(trees):
+        return None
+    grader = cell_dependencies(ast.parse(grader_code))
+    needed = grader['uses'] - grader['defines']
+
+    cells = [cell_dependencies(tree) for tree in trees]
+    keep = set()
+    changed = True
+    while changed:
+        changed = False
+        for index, cell in enumerate(cells):
+            if index in keep:
+                continue
+            if cell['environment'] or (cell['defines'] | cell['mutates']) & needed:
+                keep.add(index)
+                needed |= cell['uses']
+                changed = True
+    # Empty cells cost nothing and are not worth reporting
+    return [index for index, tree in enumerate(trees) if index not in keep and tree.body]
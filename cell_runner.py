@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Kernel-less cell runner for the CS3 Autograder
+Executes notebook code cells in a plain Python namespace and records their
+outputs in the same shape as Jupyter output cells
+"""
+
+import ast
+import io
+import json
+import os
+import select
+import signal
+import time
+import traceback
+from contextlib import redirect_stdout, redirect_stderr
+
+from output_limits import LimitedWriter
+
+
+def compile_cell(source, name):
+    """
+    Compiles a cell the way IPython does: the value of a trailing expression
+    is displayed as the cell's result.
+
+    Returns:
+        tuple: (body code object, last expression code object or None)
+    """
+    tree = ast.parse(source, filename=name, mode='exec')
+    last_expr = None
+    if tree.body and isinstance(tree.body[-1], ast.Expr):
+        last_expr = ast.Expression(tree.body.pop().value)
+        last_expr = compile(last_expr, name, 'eval')
+    return compile(tree, name, 'exec'), last_expr
+
+
+def run_cell(cell, namespace, name, limiter=None):
+    """
+    Runs one cell in `namespace`.
+
+    Args:
+        cell: Source code string or the result of compile_cell()
+        namespace: Globals dictionary shared by all cells of the notebook
+        name: Filename used in tracebacks
+        limiter: Optional OutputLimiter capping the cell's stream output
+
+    Returns:
+        tuple: (list of output dicts, True if the cell raised an error)
+    """
+    if limiter is None:
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+    else:
+        stdout = LimitedWriter(limiter, 'stdout')
+        stderr = LimitedWriter(limiter, 'stderr')
+    outputs = []
+    error = None
+
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            body, last_expr = compile_cell(cell, name) if isinstance(cell, str) else cell
+            exec(body, namespace)
+            if last_expr is not None:
+                value = eval(last_expr, namespace)
+                if value is not None:
+                    outputs.append({
+                        'output_type': 'execute_result',
+                        'data': {'text/plain': repr(value)},
+                        'metadata': {},
+                    })
+    except KeyboardInterrupt:
+        raise
+    except BaseException as e:
+        # Like IPython, a student's sys.exit() is reported as a cell error
+        error = {
+            'output_type': 'error',
+            'ename': type(e).__name__,
+            'evalue': str(e),
+            'traceback': traceback.format_exception(type(e), e, e.__traceback__),
+        }
+
+    streams = []
+    if stdout.getvalue():
+        streams.append({'output_type': 'stream', 'name': 'stdout', 'text': stdout.getvalue()})
+    if stderr.getvalue():
+        streams.append({'output_type': 'stream', 'name': 'stderr', 'text': stderr.getvalue()})
+    outputs = streams + outputs
+    if error is not None:
+        outputs.append(error)
+    if limiter is not None:
+        outputs.extend(limiter.end_cell())
+    return outputs, error is not None
+
+
+def new_namespace():
+    """Returns a fresh globals dictionary for running a student's notebook."""
+    return {'__name__': '__main__', '__builtins__': __builtins__}
+
+
+def run_cells(sources, grader, grader_index, pipe, limiter=None):
+    """
+    Runs a notebook's code cells in a fresh namespace, writing one JSON line
+    [outputs, failed, wall seconds, CPU seconds] per cell to `pipe`. Stops
+    after the first failing cell.
+
+    Args:
+        sources: List of code cell sources, in notebook order
+        grader: The compiled autograder, see compile_cell()
+        grader_index: Index in `sources` of the cell replaced by `grader`
+        pipe: Text file the results are written to
+        limiter: Optional OutputLimiter capping the stream output
+    """
+    namespace = new_namespace()
+    for index, source in enumerate(sources):
+        cell = grader if index == grader_index else source
+        if limiter is not None:
+            limiter.start_cell(index)
+        wall, cpu = time.perf_counter(), time.process_time()
+        outputs, failed = run_cell(cell, namespace, f'<cell {index + 1}>', limiter)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        pipe.write(json.dumps([outputs, failed, wall, cpu]) + '\n')
+        pipe.flush()
+        if failed:
+            break
+
+
+def collect_cells(read_fd, pgid, timeout, timings=None):
+    """
+    Reads the results written by run_cells() in a child process, killing the
+    child's process group if a cell runs longer than `timeout` seconds.
+    The (wall, CPU) seconds of each cell are appended to `timings` if given,
+    with (wall, None) for a cell that timed out.
+
+    Returns:
+        tuple: (list of per-cell output lists, 'ok', 'error' or 'timeout')
+    """
+    buffer = b''
+    cells = []
+    status = 'ok'
+    # Every cell gets the full timeout, as with ExecutePreprocessor
+    last_cell = time.monotonic()
+    deadline = last_cell + timeout
+
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            status = 'timeout'
+            break
+        ready, _, _ = select.select([read_fd], [], [], remaining)
+        if not ready:
+            continue
+        chunk = os.read(read_fd, 65536)
+        if not chunk:
+            break
+        buffer += chunk
+        while b'\n' in buffer:
+            line, buffer = buffer.split(b'\n', 1)
+            outputs, failed, wall, cpu = json.loads(line)
+            cells.append(outputs)
+            if timings is not None:
+                timings.append((wall, cpu))
+            last_cell = time.monotonic()
+            deadline = last_cell + timeout
+            if failed:
+                status = 'error'
+
+    if status == 'timeout':
+        if timings is not None:
+            timings.append((time.monotonic() - last_cell, None))
+        # Kill the child along with anything it started
+        try:
+            os.killpg(pgid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    return cells, status
+
+
+def final_status(cells, status, num_cells, exit_code, resource_limits=None, pid=None):
+    """
+    Settles the status of a child that ran a notebook's cells once it has
+    exited, telling crashes and broken resource limits apart from errors.
+
+    Args:
+        cells: Per-cell outputs from collect_cells()
+        status: Status from collect_cells()
+        num_cells: Number of cells the child was asked to run
+        exit_code: The child's exit code (negative for a signal)
+        resource_limits: The ResourceLimits the child ran under, if any
+        pid: The child's process ID
+
+    Returns:
+        str: 'ok', 'error', 'timeout' or a key of
+        resource_limits.BREACH_MESSAGES
+    """
+    if status == 'ok' and (exit_code < 0 or len(cells) < num_cells):
+        # The child died without reporting (e.g. os._exit or a crash)
+        status = 'error'
+    if resource_limits is not None:
+        oom_killed = resource_limits.release(pid)
+        if status == 'error':
+            errors = [o for outputs in cells for o in outputs if o['output_type'] == 'error']
+            status = resource_limits.breach(
+                errors[-1]['ename'] if errors else None,
+                errors[-1]['evalue'] if errors else None,
+                exit_code if exit_code < 0 else None, oom_killed
+            ) or status
+    return status
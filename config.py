@@ -3,6 +3,8 @@ Configuration file for the CS3 Autograder
 Edit the paths and autograder code here
 """
 
+from grading_spec import graded_classes
+
 # ============================================================================
 # FILE PATHS
 # ============================================================================
@@ -10,577 +12,326 @@ INPUT_DIR = "/Users/daniel/Desktop/CS3 Exams/Scripts/Input"
 OUTPUT_DIR = "/Users/daniel/Desktop/CS3 Exams/Scripts/Output"
 GRADES_CSV = "/Users/daniel/Desktop/CS3 Exams/Scripts/Output/grades.csv"
 
+# Input notebooks are never modified: the autograder cell is only added to the
+# in-memory copy that is executed. Set to True to also save it into INPUT_DIR.
+MODIFY_INPUT_NOTEBOOKS = False
+
+# Every graded notebook is recorded here as it finishes (used by --resume)
+JOURNAL_PATH = "/Users/daniel/Desktop/CS3 Exams/Scripts/Output/grades.journal.jsonl"
+
+# Results of unchanged submissions are reused from this cache on later runs
+RESULT_CACHE_ENABLED = True
+CACHE_DIR = "/Users/daniel/Desktop/CS3 Exams/Scripts/Output/.grade_cache"
+CACHE_MAX_MB = 500  # least recently used results are evicted past this size
+
+# Wall and CPU time of every grading phase (inject, kernel start, each cell,
+# autograder cell, write, extract), one JSON line per notebook graded
+TIMING_LOG = "/Users/daniel/Desktop/CS3 Exams/Scripts/Output/timing.jsonl"
+
+# Every executed cell of the run (start, duration, CPU time, output size),
+# slowest first; the slowest SLOWEST_CELLS_SHOWN are also listed in the
+# summary. The same timing is kept in each executed notebook's cell metadata.
+CELL_TIMINGS_CSV = "/Users/daniel/Desktop/CS3 Exams/Scripts/Output/cell_timings.csv"
+SLOWEST_CELLS_SHOWN = 10
+
+# CPU time (user and system), peak memory, child processes and output size
+# of each notebook's execution, in grades order, next to the grades CSV
+RESOURCE_USAGE_CSV = "/Users/daniel/Desktop/CS3 Exams/Scripts/Output/grades.resources.csv"
+
+# Work queue for grading one exam on several machines (work_queue.py): a
+# SQLite database on a filesystem all of them mount. A worker holds a lease
+# on the notebook it grades, renewed every QUEUE_HEARTBEAT seconds; a lease
+# not renewed for QUEUE_LEASE_SECONDS (the worker died) is handed to another
+# worker, up to QUEUE_MAX_ATTEMPTS times per notebook.
+QUEUE_PATH = "/Users/daniel/Desktop/CS3 Exams/Scripts/Output/queue.sqlite"
+QUEUE_LEASE_SECONDS = 120
+QUEUE_HEARTBEAT = 30
+QUEUE_MAX_ATTEMPTS = 3
+
+# Live progress metrics in Prometheus text format: served at
+# http://METRICS_ADDRESS:METRICS_PORT/metrics and/or rewritten to METRICS_FILE
+# every METRICS_INTERVAL seconds while grading (None turns either off)
+METRICS_PORT = None          # e.g. 9108 (also --metrics-port)
+METRICS_ADDRESS = "127.0.0.1"
+METRICS_FILE = None          # e.g. ".../Output/metrics.prom" (also --metrics-file)
+METRICS_INTERVAL = 10
+
 # ============================================================================
 # EXECUTION SETTINGS
 # ============================================================================
-EXECUTION_TIMEOUT = 20  # seconds per notebook
+EXECUTION_TIMEOUT = 30  # seconds per notebook
+
+# Stream output (prints) kept in the executed notebook, in characters. Output
+# past these limits is written to "<notebook>.overflow.txt" in OUTPUT_DIR and
+# only the last OUTPUT_TAIL_SIZE characters of each cell are kept.
+CELL_OUTPUT_LIMIT = 100_000
+NOTEBOOK_OUTPUT_LIMIT = 1_000_000
+OUTPUT_TAIL_SIZE = 4_000
 VIRTUAL_ENV_PATH = "/Users/daniel/Desktop/CS3 Exams/Scripts/myenv"
 
+# How notebooks are executed: "kernel" runs them in a Jupyter kernel,
+# "fork" runs code cells in a forked copy of a preloaded grading process (POSIX only),
+# "async" drives many kernels concurrently from one asyncio event loop,
+# "subprocess" runs code cells in a fresh Python process without a kernel,
+# using a kernel only for notebooks with magics (%, !) or display calls
+EXECUTION_BACKEND = "kernel"
+FORK_SERVER_PRELOAD = ["math", "collections", "heapq", "itertools", "functools", "random"]
+# Notebooks executed at once by the async backend; None runs one per CPU. Every
+# kernel runs student code, so more kernels than CPUs stretch each cell's wall
+# time (and EXECUTION_TIMEOUT is wall time)
+ASYNC_CONCURRENCY = None
+NOTEBOOK_TIMEOUT = 300   # seconds before the async backend cancels a whole notebook
+
+# Limits for each kernel (or fork-server child) running a student's code; None
+# disables a limit. Memory and process limits use a cgroup v2 group per kernel
+# under RESOURCE_CGROUP_ROOT when it is set and writable by the grader. Without
+# it, processes are limited by a cgroup v1 pids group where one is writable, and
+# memory by address space. The last resort for processes, the user's process
+# count (RLIMIT_NPROC), is best-effort and does not apply to root.
+MEMORY_LIMIT_MB = 4096
+CPU_TIME_LIMIT = 120        # CPU seconds per notebook
+MAX_PROCESSES = 64          # processes and threads a notebook may start
+MAX_OPEN_FILES = 256
+RESOURCE_CGROUP_ROOT = None  # e.g. "/sys/fs/cgroup/autograder"
+
+# Warm kernels kept alive per worker and reused across notebooks
+# (0 starts a fresh kernel for every notebook). Each kernel holds about
+# 180 MB, so a run keeps workers * (KERNEL_POOL_SIZE + spares) of them.
+KERNEL_POOL_SIZE = 1
+KERNEL_POOL_RESET = "restart"  # "restart" replaces kernels after each notebook, "reset" reuses them
+# Extra warm kernels per worker, so notebooks don't wait for a restart. None
+# keeps one with a single worker and none with several, where the other
+# workers keep the CPU busy during a restart anyway.
+KERNEL_POOL_SPARES = None
+KERNEL_POOL_MAX_USES = 50    # replace a kernel after this many notebooks
+
+# Skip student cells the autograder does not depend on (demos, timing loops,
+# plots), found from a def/use graph of the cells' top-level names (also --prune)
+PRUNE_CELLS = False
+
+# Static pre-screen: notebooks that cannot score (a syntax error stops them
+# before the autograder cell, or no graded class can be built and tested) are
+# graded zero without being executed
+PRESCREEN_ENABLED = True
+
 # ============================================================================
-# AUTOGRADER CODE
-# This code will be injected into each student's notebook
+# GRADING SPEC
+# The exam's tests as data: fixtures (graphs built with the student's class),
+# the methods under test, their arguments and expected values. It is compiled
+# into AUTOGRADER_CODE; see grading_spec.py for the format.
 # ============================================================================
-AUTOGRADER_CODE = '''
-
-#******************************************************************************
-#DO NOT MODIFY THE CODE BELOW
-#******************************************************************************
-
-POINTS_PER_PROBLEM = 4.0
-points_by_problem = []
-
-
-def grade_problem(problem_num, test_cases, solution_func, max_points):
-    passed_tests = 0
-    num_tests = len(test_cases)
-
-    for i in range(num_tests):
-        inputs, expected = test_cases[i]
-        try:
-            output = solution_func(*inputs)
-            if output == expected:
-                passed_tests += 1
-            else:
-                print("Problem", problem_num, "- Test", (i+1), "FAILED. Output:", output, "Expected:", expected)
-        except Exception as ex:
-            print("Problem", problem_num, "- Test", (i+1), "EXCEPTION:", ex)
-
-    score = (passed_tests / num_tests) * max_points
-    points_by_problem.append(score)
-    print("Problem", problem_num, "Score:", score, "/", max_points)
-    return score
-
-
-# ---------------------------------------------------------------
-# Graph Builders (NO SELF-LOOPS)
-# ---------------------------------------------------------------
-
-def build_graphAL_unweighted():
-    g = GraphAL(vertices=12, directed=True)
-    edges = [
-        (0, 1), (0, 2), (0, 3),
-        (1, 4),
-        (2, 5),
-        (3, 6),
-        (4, 7),
-        (5, 8),
-        (6, 9),
-        (7, 10),
-        (8, 10),
-        (9, 10)
-    ]
-    for u, v in edges:
-        g.insert_edge(u, v)
-    return g
-
-
-def build_graphAL_weighted():
-    g = GraphAL(vertices=6, directed=True, weighted=True)
-    g.insert_edge(0, 1, 2)
-    g.insert_edge(1, 2, 4)
-    g.insert_edge(2, 3, 6)
-    g.insert_edge(3, 4, 8)
-    g.insert_edge(4, 5, 10)
-    return g
-
-
-# ---------------------------------------------------------------
-# ADJACENCY LIST GRADING (Problems 1–6)
-# ---------------------------------------------------------------
-
-def test_graphAL():
-    print("=== Adjacency List Tests ===")
-
-    section_score = 0
-    unweighted = build_graphAL_unweighted()
-    weighted = build_graphAL_weighted()
-
-    # -----------------------------
-    # Problem 1 — is_there_an_edge
-    # -----------------------------
-    def P1(graph, u, v):
-        return graph.is_there_an_edge(u, v)
-
-    try:
-        section_score += grade_problem(1, [
-        ((unweighted, 0, 1), True),   # Test 1: Edge 0->1 exists
-        ((unweighted, 0, 3), True),   # Test 2: Edge 0->3 exists
-        ((unweighted, 2, 5), True),   # Test 3: Edge 2->5 exists
-        ((unweighted, 9, 10), True),  # Test 4: Edge 9->10 exists
-        ((unweighted, 10, 9), False), # Test 5: Reverse edge does NOT exist
-        ((unweighted, 0, 11), False), # Test 6: 11 is isolated, no edge
-        ((weighted, 0, 1), True),     # Test 7: Weighted edge 0->1 exists
-        ((weighted, 1, 2), True),     # Test 8: Weighted edge 1->2 exists
-        ((weighted, 2, 5), False),    # Test 9: No edge 2->5
-        ((GraphAL(4, True), 1, 2), False) # Test 10: Empty graph → no edges
-    ], P1, POINTS_PER_PROBLEM)
-    except Exception as e:
-        print(f"Problem 1 CRASHED: {e}")
-        points_by_problem.append(0.0)
-        print("Problem 1 Score: 0.0 /", POINTS_PER_PROBLEM)
-
-    # -----------------------------
-    # Problem 2 — compute_in_degree
-    # -----------------------------
-    def P2(graph, v):
-        return graph.compute_in_degree(v)
-
-    try:
-        section_score += grade_problem(2, [
-        ((unweighted, 0), 0),   # Test 1: No incoming edges
-        ((unweighted, 1), 1),   # Test 2: One incoming edge (0->1)
-        ((unweighted, 4), 1),   # Test 3: One incoming (1->4)
-        ((unweighted, 10), 3),  # Test 4: Incoming from 7,8,9
-        ((unweighted, 5), 1),   # Test 5: Incoming from 2
-        ((unweighted, 8), 1),   # Test 6: Incoming from 5
-        ((weighted, 0), 0),     # Test 7: No incoming
-        ((weighted, 3), 1),     # Test 8: Incoming from 2
-        ((weighted, 5), 1),     # Test 9: Incoming from 4
-        ((GraphAL(5, True), 3), 0) # Test 10: Empty graph → in-degree 0
-    ], P2, POINTS_PER_PROBLEM)
-    except Exception as e:
-        print(f"Problem 2 CRASHED: {e}")
-        points_by_problem.append(0.0)
-        print("Problem 2 Score: 0.0 /", POINTS_PER_PROBLEM)
-
-    # -----------------------------
-    # Problem 3 — is_isolated
-    # -----------------------------
-    def P3(graph, v):
-        return graph.is_isolated(v)
-
-    iso_AL = GraphAL(6, directed=True)
-    iso_AL.insert_edge(0, 1)
-    iso_AL.insert_edge(2, 3)
-
-    weighted_iso = GraphAL(6, directed=True, weighted=True)
-    weighted_iso.insert_edge(0, 1, 2)
-    weighted_iso.insert_edge(2, 4, 4)
-
-    empty = GraphAL(5, directed=True)
-
-    try:
-        section_score += grade_problem(3, [
-        ((iso_AL, 4), True),   # Test 1: No in/out edges
-        ((iso_AL, 5), True),   # Test 2: Fully isolated
-        ((iso_AL, 0), False),  # Test 3: Outgoing edge exists
-        ((iso_AL, 1), False),  # Test 4: Incoming edge exists
-        ((empty, 3), True),    # Test 5: Empty graph → all isolated
-        ((weighted_iso, 3), True), # Test 6: Isolated in weighted graph
-        ((weighted_iso, 4), False), # Test 7: Incoming edge exists
-        ((weighted_iso, 2), False), # Test 8: Outgoing edge exists
-        ((GraphAL(1, True), 0), True), # Test 9: Single vertex isolated
-        ((GraphAL(3, True), 2), True)  # Test 10: Vertex isolated
-    ], P3, POINTS_PER_PROBLEM)
-    except Exception as e:
-        print(f"Problem 3 CRASHED: {e}")
-        points_by_problem.append(0.0)
-        print("Problem 3 Score: 0.0 /", POINTS_PER_PROBLEM)
-
-    # -----------------------------
-    # Problem 4 — highest_out_degree_vertex
-    # -----------------------------
-    def P4(graph):
-        return graph.highest_out_degree_vertex()
-
-    cg = GraphAL(6, directed=True)
-    cg.insert_edge(5, 1)
-
-    try:
-        section_score += grade_problem(4, [
-        ((unweighted,), 0),   # Test 1
-        ((weighted,), 0),     # Test 2
-        ((cg,), 5),           # Test 3
-        ((GraphAL(3, True),), 0), # Test 4
-        ((GraphAL(1, True),), 0), # Test 5
-        ((GraphAL(0, True),), -1),# Test 6
-        ((build_graphAL_unweighted(),), 0), # Test 7
-        ((build_graphAL_weighted(),), 0),   # Test 8
-        ((GraphAL(4, True),), 0), # Test 9
-        ((GraphAL(2, True),), 0)  # Test 10
-    ], P4, POINTS_PER_PROBLEM)
-    except Exception as e:
-        print(f"Problem 4 CRASHED: {e}")
-        points_by_problem.append(0.0)
-        print("Problem 4 Score: 0.0 /", POINTS_PER_PROBLEM)
-
-    # -----------------------------
-    # Problem 5 — sorted_edge_values
-    # -----------------------------
-    def P5(graph):
-        return graph.sorted_edge_values()
-
-    emptyW = GraphAL(5, directed=True, weighted=True)
-
-    try:
-        section_score += grade_problem(5, [
-        ((unweighted,), [1]*12),             # Test 1
-        ((weighted,), [2,4,6,8,10]),         # Test 2
-        ((emptyW,), []),                     # Test 3
-        ((GraphAL(0, True),), []),           # Test 4
-        ((GraphAL(1, True),), []),           # Test 5
-        ((GraphAL(2, True, True),), []),     # Test 6
-        ((build_graphAL_weighted(),), [2,4,6,8,10]), # Test 7
-        ((build_graphAL_unweighted(),), [1]*12),     # Test 8
-        ((cg,), [1]),                        # Test 9
-        ((GraphAL(3, True),), [])            # Test 10
-    ], P5, POINTS_PER_PROBLEM)
-    except Exception as e:
-        print(f"Problem 5 CRASHED: {e}")
-        points_by_problem.append(0.0)
-        print("Problem 5 Score: 0.0 /", POINTS_PER_PROBLEM)
-
-    # -----------------------------
-    # Problem 6 — get_adjacent_neighbors
-    # -----------------------------
-    def P6(graph, v):
-        return graph.get_adjacent_neighbors(v)  # outgoing neighbors only
-
-    # Build custom graphs for isolated and multi-neighbor tests
-    gA = GraphAL(6, directed=True)
-    gA.insert_edge(1, 0)
-    gA.insert_edge(1, 2)
-    gA.insert_edge(1, 4)
-
-    gB = GraphAL(5, directed=True)
-    gB.insert_edge(0, 3)
-    gB.insert_edge(0, 2)
-
-    gC = GraphAL(4, directed=False)
-    gC.insert_edge(2, 1)
-    gC.insert_edge(2, 3)
-
-    gD = GraphAL(6, directed=True)
-    # 5 isolated
-
-    gE = GraphAL(6, directed=True)
-    gE.insert_edge(3, 5)
-    gE.insert_edge(3, 1)
-    gE.insert_edge(3, 4)
-
-    try:
-        section_score += grade_problem(6, [
-        ((gA, 1), [0,2,4]),         # Test 1: Multi outgoing neighbors
-        ((gA, 0), []),              # Test 2: No outgoing edges
-        ((gB, 0), [2,3]),           # Test 3: Two neighbors
-        ((gB, 3), []),              # Test 4: No outgoing edges for 3
-        ((gC, 2), [1,3]),           # Test 5: Undirected behaves normally
-        ((gC, 1), [2]),             # Test 6: One neighbor
-        ((gD, 5), []),              # Test 7: Isolated vertex
-        ((gE, 3), [1,4,5]),         # Test 8: Three outgoing edges
-        ((unweighted, 0), [1,2,3]), # Test 9: Main exam graph node 0
-        ((unweighted, 10), [])      # Test 10: Node 10 has no outgoing edges
-    ], P6, POINTS_PER_PROBLEM)
-    except Exception as e:
-        print(f"Problem 6 CRASHED: {e}")
-        points_by_problem.append(0.0)
-        print("Problem 6 Score: 0.0 /", POINTS_PER_PROBLEM)
 
-    return section_score
+# Reference solution notebook (None: every test gives its expected value).
+# Tests written as [fixture, arguments] expect the reference's answers, which
+# are computed once and stored in EXPECTED_VALUES_FILE until the reference or
+# the spec changes; tests that give a value are checked against it.
+REFERENCE_NOTEBOOK = None
+EXPECTED_VALUES_FILE = "/Users/daniel/Desktop/CS3 Exams/Scripts/Output/expected_values.json"
+
+# Tests shared by the adjacency list and adjacency matrix sections:
+# [fixture, method arguments, expected value]. random_tests adds, per
+# [random fixture, count], tests with arguments drawn from the fixture's seed,
+# answered by a NumPy oracle.
+GRAPH_PROBLEMS = [
+    {'method': 'is_there_an_edge', 'tests': [
+        ['unweighted', [0, 1], True],       # Edge 0->1 exists
+        ['unweighted', [0, 3], True],       # Edge 0->3 exists
+        ['unweighted', [2, 5], True],       # Edge 2->5 exists
+        ['unweighted', [9, 10], True],      # Edge 9->10 exists
+        ['unweighted', [10, 9], False],     # Reverse edge does NOT exist
+        ['unweighted', [0, 11], False],     # 11 is isolated, no edge
+        ['weighted', [0, 1], True],         # Weighted edge 0->1 exists
+        ['weighted', [1, 2], True],         # Weighted edge 1->2 exists
+        ['weighted', [2, 5], False],        # No edge 2->5
+        ['empty_4', [1, 2], False],         # Empty graph -> no edges
+    ], 'random_tests': [['random_directed', 6], ['random_undirected', 4]]},
+    {'method': 'compute_in_degree', 'tests': [
+        ['unweighted', [0], 0],             # No incoming edges
+        ['unweighted', [1], 1],             # One incoming edge (0->1)
+        ['unweighted', [4], 1],             # One incoming (1->4)
+        ['unweighted', [10], 3],            # Incoming from 7, 8, 9
+        ['unweighted', [5], 1],             # Incoming from 2
+        ['unweighted', [8], 1],             # Incoming from 5
+        ['weighted', [0], 0],               # No incoming
+        ['weighted', [3], 1],               # Incoming from 2
+        ['weighted', [5], 1],               # Incoming from 4
+        ['empty_5', [3], 0],                # Empty graph -> in-degree 0
+    ], 'random_tests': [['random_directed', 6], ['random_weighted', 4]]},
+    {'method': 'is_isolated', 'tests': [
+        ['isolated', [4], True],            # No in/out edges
+        ['isolated', [5], True],            # Fully isolated
+        ['isolated', [0], False],           # Outgoing edge exists
+        ['isolated', [1], False],           # Incoming edge exists
+        ['no_edges', [3], True],            # Empty graph -> all isolated
+        ['weighted_isolated', [3], True],   # Isolated in weighted graph
+        ['weighted_isolated', [4], False],  # Incoming edge exists
+        ['weighted_isolated', [2], False],  # Outgoing edge exists
+        ['empty_1', [0], True],             # Single vertex isolated
+        ['empty_3', [2], True],             # Vertex isolated
+    ], 'random_tests': [['random_directed', 5], ['random_sparse', 5]]},
+    {'method': 'highest_out_degree_vertex', 'tests': [
+        ['unweighted', [], 0],
+        ['weighted', [], 0],
+        ['one_edge', [], 5],                # Only 5 has outgoing edges
+        ['empty_3', [], 0],                 # No edges -> 0
+        ['empty_1', [], 0],                 # One vertex -> 0
+        ['empty_0', [], -1],                # Empty graph -> -1
+        ['unweighted', [], 0],
+        ['weighted', [], 0],
+        ['empty_4', [], 0],
+        ['empty_2', [], 0],
+    ], 'random_tests': [['random_directed', 1], ['random_weighted', 1], ['random_sparse', 1]]},
+    {'method': 'sorted_edge_values', 'tests': [
+        ['unweighted', [], [1] * 12],       # 12 edges all weight 1
+        ['weighted', [], [2, 4, 6, 8, 10]], # Sorted weighted edges
+        ['no_edges_weighted', [], []],      # No edges
+        ['empty_0', [], []],                # Empty graph
+        ['empty_1', [], []],
+        ['empty_weighted_2', [], []],
+        ['weighted', [], [2, 4, 6, 8, 10]],
+        ['unweighted', [], [1] * 12],
+        ['one_edge', [], [1]],              # One unweighted edge
+        ['empty_3', [], []],
+    ], 'random_tests': [['random_weighted', 1], ['random_sparse', 1]]},
+    {'method': 'get_adjacent_neighbors', 'tests': [   # OUTGOING neighbors only
+        ['out_of_1', [1], [0, 2, 4]],       # Three outgoing neighbors
+        ['out_of_1', [0], []],              # No outgoing edges
+        ['out_of_0', [0], [2, 3]],          # Two neighbors, sorted
+        ['out_of_0', [3], []],              # No outgoing edges for 3
+        ['undirected', [2], [1, 3]],        # Undirected behaves normally
+        ['undirected', [1], [2]],           # One neighbor
+        ['no_edges_6', [5], []],            # Isolated vertex
+        ['out_of_3', [3], [1, 4, 5]],       # Three outgoing edges
+        ['unweighted', [0], [1, 2, 3]],     # Main exam graph node 0
+        ['unweighted', [10], []],           # Node 10 has no outgoing edges
+    ], 'random_tests': [['random_directed', 6], ['random_undirected', 4]]},
+]
+
+# Optional performance stage (set GRADING_SPEC's 'performance' to this):
+# methods that pass all their tests are timed on random graphs of growing size,
+# and the exponent k of their growth in V (time ~ V^k, with edges_per_vertex * V
+# edges) is scored against a target. Scores, exponents and timings are written
+# to PERFORMANCE_CSV, separately from the grades. Raise EXECUTION_TIMEOUT by up
+# to time_limit seconds per problem when enabling it.
+PERFORMANCE_SPEC = {
+    'sizes': [50, 100, 200, 400, 800],  # vertices
+    'edges_per_vertex': 4,
+    'kwargs': {'directed': True},       # graphs are built as Class(vertices, **kwargs)
+    'repeats': 5,                       # timing rounds per size; the fastest is used
+    'time_limit': 2.0,                  # seconds to measure one problem
+    'tolerance': 0.35,                  # exponents up to target + tolerance score
+    'points': 1.0,                      # per problem
+    # [class, method, vertex arguments, target exponent]
+    'problems': [
+        ['GraphAL', 'is_there_an_edge', 2, 0],
+        ['GraphAL', 'compute_in_degree', 1, 1],
+        ['GraphAL', 'is_isolated', 1, 1],
+        ['GraphAL', 'highest_out_degree_vertex', 0, 1],
+        ['GraphAL', 'sorted_edge_values', 0, 1],
+        ['GraphAL', 'get_adjacent_neighbors', 1, 0],
+        ['GraphAM', 'is_there_an_edge', 2, 0],
+        ['GraphAM', 'compute_in_degree', 1, 1],
+        ['GraphAM', 'is_isolated', 1, 1],
+        ['GraphAM', 'highest_out_degree_vertex', 0, 2],
+        ['GraphAM', 'sorted_edge_values', 0, 2],
+        ['GraphAM', 'get_adjacent_neighbors', 1, 1],
+    ],
+}
+PERFORMANCE_CSV = "/Users/daniel/Desktop/CS3 Exams/Scripts/Output/performance.csv"
+
+GRADING_SPEC = {
+    'points_per_problem': 4.0,
+    # Limits are CPU seconds of the student's process, so a loaded machine
+    # doesn't fail correct code; code that waits rather than computes is
+    # stopped after wall_time_factor times as much wall time. Building a
+    # problem's fixtures counts against its limit, and once it is spent each
+    # remaining test still runs within overtime_test_limit, so keep
+    # grading_spec.grading_budget (problems times problem_time_limit, plus
+    # tests times overtime_test_limit) below EXECUTION_TIMEOUT.
+    'test_time_limit': 1.0,      # seconds per test case
+    'problem_time_limit': 1.5,   # seconds for all tests of one problem
+    'wall_time_factor': 5,
+    'overtime_test_limit': 0.05,  # seconds per test once problem_time_limit is spent
+    'insert_method': 'insert_edge',
+    'performance': None,         # PERFORMANCE_SPEC to also time the graded methods
+    # Built as Class(*args, **kwargs), then insert_edge(*edge) for each edge
+    # (no self-loops)
+    'fixtures': {
+        'unweighted': {'kwargs': {'vertices': 12, 'directed': True}, 'edges': [
+            [0, 1], [0, 2], [0, 3], [1, 4], [2, 5], [3, 6],
+            [4, 7], [5, 8], [6, 9], [7, 10], [8, 10], [9, 10],
+        ]},
+        'weighted': {'kwargs': {'vertices': 6, 'directed': True, 'weighted': True}, 'edges': [
+            [0, 1, 2], [1, 2, 4], [2, 3, 6], [3, 4, 8], [4, 5, 10],
+        ]},
+        'isolated': {'args': [6], 'kwargs': {'directed': True}, 'edges': [[0, 1], [2, 3]]},
+        'weighted_isolated': {'args': [6], 'kwargs': {'directed': True, 'weighted': True},
+                              'edges': [[0, 1, 2], [2, 4, 4]]},
+        'one_edge': {'args': [6], 'kwargs': {'directed': True}, 'edges': [[5, 1]]},
+        'out_of_1': {'args': [6], 'kwargs': {'directed': True}, 'edges': [[1, 0], [1, 2], [1, 4]]},
+        'out_of_0': {'args': [5], 'kwargs': {'directed': True}, 'edges': [[0, 3], [0, 2]]},
+        'out_of_3': {'args': [6], 'kwargs': {'directed': True}, 'edges': [[3, 5], [3, 1], [3, 4]]},
+        'undirected': {'args': [4], 'kwargs': {'directed': False}, 'edges': [[2, 1], [2, 3]]},
+        'no_edges': {'args': [5], 'kwargs': {'directed': True}},
+        'no_edges_6': {'args': [6], 'kwargs': {'directed': True}},
+        'no_edges_weighted': {'args': [5], 'kwargs': {'directed': True, 'weighted': True}},
+        'empty_0': {'args': [0, True]},
+        'empty_1': {'args': [1, True]},
+        'empty_2': {'args': [2, True]},
+        'empty_3': {'args': [3, True]},
+        'empty_4': {'args': [4, True]},
+        'empty_5': {'args': [5, True]},
+        'empty_weighted_2': {'args': [2, True, True]},
+        # Seeded random graphs (no self-loops or repeated edges), with edges
+        # inserted in generation order; failures print the seed. 'time_limit'
+        # is the seconds allowed to build one, within the problem's limit.
+        'random_directed': {'args': [2000], 'kwargs': {'directed': True}, 'time_limit': 1.0,
+                            'random': {'vertices': 2000, 'edges': 8000, 'seed': 3101}},
+        'random_undirected': {'args': [1500], 'kwargs': {'directed': False}, 'time_limit': 1.0,
+                              'random': {'vertices': 1500, 'edges': 4000, 'seed': 3102,
+                                         'directed': False}},
+        'random_weighted': {'args': [1000], 'kwargs': {'directed': True, 'weighted': True},
+                            'time_limit': 1.0,
+                            'random': {'vertices': 1000, 'edges': 3000, 'seed': 3103,
+                                       'max_weight': 9}},
+        'random_sparse': {'args': [3000], 'kwargs': {'directed': True}, 'time_limit': 1.0,
+                          'random': {'vertices': 3000, 'edges': 1500, 'seed': 3104}},
+    },
+    'sections': [
+        {'title': 'Adjacency List Tests', 'class': 'GraphAL',        # Problems 1-6
+         'problems': GRAPH_PROBLEMS},
+        {'title': 'Adjacency Matrix Tests', 'class': 'GraphAM',      # Problems 7-12
+         'fixtures': {
+             'weighted_isolated': {'args': [6], 'kwargs': {'directed': True, 'weighted': True},
+                                   'edges': [[0, 1, 3], [2, 4, 5]]},
+             # Smaller random graphs: a matrix has V^2 cells, and correct
+             # O(V^2) methods must finish well within test_time_limit
+             'random_directed': {'args': [400], 'kwargs': {'directed': True}, 'time_limit': 1.0,
+                                 'random': {'vertices': 400, 'edges': 1600, 'seed': 3101}},
+             'random_undirected': {'args': [300], 'kwargs': {'directed': False},
+                                   'time_limit': 1.0,
+                                   'random': {'vertices': 300, 'edges': 800, 'seed': 3102,
+                                              'directed': False}},
+             'random_weighted': {'args': [300], 'kwargs': {'directed': True, 'weighted': True},
+                                 'time_limit': 1.0,
+                                 'random': {'vertices': 300, 'edges': 900, 'seed': 3103,
+                                            'max_weight': 9}},
+             'random_sparse': {'args': [600], 'kwargs': {'directed': True}, 'time_limit': 1.0,
+                               'random': {'vertices': 600, 'edges': 300, 'seed': 3104}},
+         },
+         'problems': GRAPH_PROBLEMS},
+    ],
+}
 
-# ---------------------------------------------------------------
-# ADJACENCY MATRIX GRADING (Problems 7–12)
-# ---------------------------------------------------------------
-
-def build_graphAM_unweighted():
-    g = GraphAM(vertices=12, directed=True)
-    edges = [
-        (0, 1), (0, 2), (0, 3),
-        (1, 4),
-        (2, 5),
-        (3, 6),
-        (4, 7),
-        (5, 8),
-        (6, 9),
-        (7, 10),
-        (8, 10),
-        (9, 10)
-    ]
-    for u, v in edges:
-        g.insert_edge(u, v)
-    return g
-
-
-def build_graphAM_weighted():
-    g = GraphAM(vertices=6, directed=True, weighted=True)
-    g.insert_edge(0, 1, 2)
-    g.insert_edge(1, 2, 4)
-    g.insert_edge(2, 3, 6)
-    g.insert_edge(3, 4, 8)
-    g.insert_edge(4, 5, 10)
-    return g
-
-
-def test_graphAM():
-    print("=== Adjacency Matrix Tests ===")
-
-    section_score = 0
-    unweighted = build_graphAM_unweighted()
-    weighted = build_graphAM_weighted()
-
-    # -----------------------------
-    # Problem 7 — is_there_an_edge
-    # -----------------------------
-    def P7(graph, u, v):
-        return graph.is_there_an_edge(u, v)
-
-    try:
-        section_score += grade_problem(7, [
-        ((unweighted, 0, 1), True),    # Test 1: Edge 0->1 exists
-        ((unweighted, 0, 3), True),    # Test 2: Edge 0->3 exists
-        ((unweighted, 2, 5), True),    # Test 3: Edge 2->5 exists
-        ((unweighted, 9, 10), True),   # Test 4: Edge 9->10 exists
-        ((unweighted, 10, 9), False),  # Test 5: No reverse edge
-        ((unweighted, 0, 11), False),  # Test 6: No edge to isolated vertex 11
-        ((weighted, 0, 1), True),      # Test 7: Weighted edge 0->1 exists
-        ((weighted, 1, 2), True),       # Test 8: Weighted edge 1->2 exists
-        ((weighted, 2, 5), False),     # Test 9: No edge 2->5
-        ((GraphAM(4, True), 1, 2), False) # Test 10: Empty 4-vertex graph
-    ], P7, POINTS_PER_PROBLEM)
-    except Exception as e:
-        print(f"Problem 7 CRASHED: {e}")
-        points_by_problem.append(0.0)
-        print("Problem 7 Score: 0.0 /", POINTS_PER_PROBLEM)
-
-    # -----------------------------
-    # Problem 8 — compute_in_degree
-    # -----------------------------
-    def P8(graph, v):
-        return graph.compute_in_degree(v)
-
-    try:
-        section_score += grade_problem(8, [
-        ((unweighted, 0), 0),  # Test 1: No incoming edges
-        ((unweighted, 1), 1),  # Test 2: Incoming from 0
-        ((unweighted, 4), 1),  # Test 3: Incoming from 1
-        ((unweighted, 10), 3), # Test 4: Incoming from 7,8,9
-        ((unweighted, 5), 1),  # Test 5: Incoming from 2
-        ((unweighted, 8), 1),  # Test 6: Incoming from 5
-
-        ((weighted, 0), 0),    # Test 7: No incoming
-        ((weighted, 3), 1),    # Test 8: Incoming from 2
-        ((weighted, 5), 1),    # Test 9: Incoming from 4
-        ((GraphAM(5, True), 3), 0) # Test 10: Empty matrix graph
-    ], P8, POINTS_PER_PROBLEM)
-    except Exception as e:
-        print(f"Problem 8 CRASHED: {e}")
-        points_by_problem.append(0.0)
-        print("Problem 8 Score: 0.0 /", POINTS_PER_PROBLEM)
-
-    # -----------------------------
-    # Problem 9 — is_isolated
-    # -----------------------------
-    def P9(graph, v):
-        return graph.is_isolated(v)
-
-    iso = GraphAM(6, directed=True)
-    iso.insert_edge(0, 1)
-    iso.insert_edge(2, 3)
-
-    wiso = GraphAM(6, directed=True, weighted=True)
-    wiso.insert_edge(0, 1, 3)
-    wiso.insert_edge(2, 4, 5)
-
-    empty = GraphAM(5, directed=True)
-
-    try:
-        section_score += grade_problem(9, [
-        ((iso, 4), True),     # Test 1: No in/out edges
-        ((iso, 5), True),     # Test 2: Fully isolated
-        ((iso, 0), False),    # Test 3: Outgoing edge exists
-        ((iso, 1), False),    # Test 4: Incoming edge exists
-        ((empty, 3), True),   # Test 5: Empty → all isolated
-
-        ((wiso, 3), True),    # Test 6: Isolated in weighted graph
-        ((wiso, 4), False),   # Test 7: Has incoming
-        ((wiso, 2), False),   # Test 8: Has outgoing
-        ((GraphAM(1, True), 0), True), # Test 9: Single isolated vertex
-        ((GraphAM(3, True), 2), True)  # Test 10: Isolated in empty graph
-    ], P9, POINTS_PER_PROBLEM)
-    except Exception as e:
-        print(f"Problem 9 CRASHED: {e}")
-        points_by_problem.append(0.0)
-        print("Problem 9 Score: 0.0 /", POINTS_PER_PROBLEM)
-
-    # -----------------------------
-    # Problem 10 — highest_out_degree_vertex
-    # -----------------------------
-    def P10(graph):
-        return graph.highest_out_degree_vertex()
-
-    cg = GraphAM(6, directed=True)
-    cg.insert_edge(5, 1)
-
-    try:
-        section_score += grade_problem(10, [
-        ((unweighted,), 0),  # Test 1: Node 0 highest
-        ((weighted,), 0),    # Test 2: Node 0 highest
-        ((cg,), 5),          # Test 3: Only node 5 has outgoing edges
-        ((GraphAM(3, True),), 0), # Test 4: No edges → 0
-        ((GraphAM(1, True),), 0), # Test 5: One vertex → 0
-        ((GraphAM(0, True),), -1),# Test 6: Empty graph → -1
-        ((build_graphAM_unweighted(),), 0), # Test 7
-        ((build_graphAM_weighted(),), 0),   # Test 8
-        ((GraphAM(4, True),), 0), # Test 9
-        ((GraphAM(2, True),), 0)  # Test 10
-    ], P10, POINTS_PER_PROBLEM)
-    except Exception as e:
-        print(f"Problem 10 CRASHED: {e}")
-        points_by_problem.append(0.0)
-        print("Problem 10 Score: 0.0 /", POINTS_PER_PROBLEM)
-
-    # -----------------------------
-    # Problem 11 — sorted_edge_values
-    # -----------------------------
-    def P11(graph):
-        return graph.sorted_edge_values()
-
-    emptyW = GraphAM(5, directed=True, weighted=True)
-
-    try:
-        section_score += grade_problem(11, [
-        ((unweighted,), [1]*12),       # Test 1: 12 edges all weight 1
-        ((weighted,), [2,4,6,8,10]),   # Test 2: Sorted weighted edges
-        ((emptyW,), []),               # Test 3: No edges
-        ((GraphAM(0, True),), []),     # Test 4: Empty graph
-        ((GraphAM(1, True),), []),     # Test 5: No edges
-        ((GraphAM(2, True, True),), []), # Test 6
-        ((build_graphAM_weighted(),), [2,4,6,8,10]), # Test 7
-        ((build_graphAM_unweighted(),), [1]*12),     # Test 8
-        ((cg,), [1]),                  # Test 9: One unweighted edge
-        ((GraphAM(3, True),), [])      # Test 10: No edges
-    ], P11, POINTS_PER_PROBLEM)
-    except Exception as e:
-        print(f"Problem 11 CRASHED: {e}")
-        points_by_problem.append(0.0)
-        print("Problem 11 Score: 0.0 /", POINTS_PER_PROBLEM)
-
-    # -----------------------------
-    # Problem 12 — get_adjacent_neighbors
-    # OUTGOING neighbors only
-    # -----------------------------
-    def P12(graph, v):
-        return graph.get_adjacent_neighbors(v)
-
-    # Custom AM graphs for testing
-    AM1 = GraphAM(6, directed=True)
-    AM1.insert_edge(1, 0)
-    AM1.insert_edge(1, 2)
-    AM1.insert_edge(1, 4)
-
-    AM2 = GraphAM(5, directed=True)
-    AM2.insert_edge(0, 3)
-    AM2.insert_edge(0, 2)
-
-    AM3 = GraphAM(4, directed=False)
-    AM3.insert_edge(2, 1)
-    AM3.insert_edge(2, 3)
-
-    AM4 = GraphAM(6, directed=True)
-    # 5 isolated
-
-    AM5 = GraphAM(6, directed=True)
-    AM5.insert_edge(3, 5)
-    AM5.insert_edge(3, 1)
-    AM5.insert_edge(3, 4)
-
-    try:
-        section_score += grade_problem(12, [
-        ((AM1, 1), [0,2,4]),           # Test 1: Three outgoing neighbors
-        ((AM1, 0), []),                # Test 2: No outgoing neighbors
-        ((AM2, 0), [2,3]),             # Test 3: Two neighbors sorted
-        ((AM2, 3), []),                # Test 4: No outgoing neighbors
-        ((AM3, 2), [1,3]),             # Test 5: Undirected behaves normally
-        ((AM3, 1), [2]),               # Test 6: One outgoing (undirected)
-        ((AM4, 5), []),                # Test 7: Isolated vertex
-        ((AM5, 3), [1,4,5]),           # Test 8: Multiple outgoing edges
-        ((unweighted, 0), [1,2,3]),    # Test 9: Main exam graph
-        ((unweighted, 10), [])         # Test 10: No outgoing from 10
-    ], P12, POINTS_PER_PROBLEM)
-    except Exception as e:
-        print(f"Problem 12 CRASHED: {e}")
-        points_by_problem.append(0.0)
-        print("Problem 12 Score: 0.0 /", POINTS_PER_PROBLEM)
-
-    return section_score
-
-
-# ---------------------------------------------------------------
-# RUN BOTH SECTIONS AND PRINT CSV RESULT
-# ---------------------------------------------------------------
-
-try:
-    # Ensure we have student info, with fallback values
-    try:
-        student_first = str(first_name)
-        student_last = str(last_name)
-        student_id_val = str(student_id)
-    except:
-        student_first = "Unknown"
-        student_last = "Unknown"
-        student_id_val = "Unknown"
-    
-    # Run both test sections, each wrapped in try-except for safety
-    try:
-        al_score = test_graphAL()
-    except Exception as e:
-        print(f"ERROR in test_graphAL: {e}")
-        al_score = 0
-        # Ensure we have 6 entries for AL problems
-        while len(points_by_problem) < 6:
-            points_by_problem.append(0.0)
-    
-    try:
-        am_score = test_graphAM()
-    except Exception as e:
-        print(f"ERROR in test_graphAM: {e}")
-        am_score = 0
-        # Ensure we have 12 entries total
-        while len(points_by_problem) < 12:
-            points_by_problem.append(0.0)
-    
-    # Ensure we have exactly 12 problem scores
-    while len(points_by_problem) < 12:
-        points_by_problem.append(0.0)
-    # Truncate if somehow we have more
-    points_by_problem = points_by_problem[:12]
-    
-    final_score = al_score + am_score
-
-    # CSV format: first_name,last_name,student_id,score1,...,score12,total
-    csv_line = (
-        student_first + "," +
-        student_last + "," +
-        student_id_val + "," +
-        ",".join(str(int(score)) for score in points_by_problem) +
-        "," + "{:.2f}".format(final_score)
-    )
-
-    print(csv_line)
-except Exception as e:
-    # If there's an error, output zeros for all problems
-    try:
-        student_first = str(first_name)
-        student_last = str(last_name)
-        student_id_val = str(student_id)
-    except:
-        student_first = "Unknown"
-        student_last = "Unknown"
-        student_id_val = "Unknown"
-    
-    num_problems = 12
-    csv_line = (
-        student_first + "," +
-        student_last + "," +
-        student_id_val + "," +
-        ",".join(["0"] * num_problems) +
-        ",0.00"
-    )
-    print(f"ERROR: {e}")
-    print(csv_line)
-#******************************************************************************
-#DO NOT MODIFY THE CODE ABOVE
-#******************************************************************************
-
-'''
+# ============================================================================
+# AUTOGRADER CODE
+# This code will be injected into each student's notebook. None compiles it
+# from GRADING_SPEC, once, when grading starts (see
+# run_autograder.autograder_code); a hand-written grader can be assigned here
+# instead (then also set GRADED_CLASSES by hand).
+# ============================================================================
+AUTOGRADER_CODE = None
 
+# Classes AUTOGRADER_CODE tests: "setup" methods every problem needs to build
+# its fixtures, and the "graded" methods it scores (used by the pre-screen)
+GRADED_CLASSES = graded_classes(GRADING_SPEC)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Fork-server execution backend for the CS3 Autograder
+Imports the grader runtime and compiles the autograder code once, then
+fork()s a copy-on-write child for every student notebook
+"""
+
+import importlib
+import os
+import signal
+import sys
+import textwrap
+import time
+
+import cell_runner
+
+
+class ForkServer:
+    """
+    Runs student code cells plus the autograder in forked child processes.
+
+    The parent (the grading worker) stays alive for the whole run, so library
+    imports and the compiled autograder are paid for once instead of once per
+    student. Each child runs a single notebook and streams one JSON line per
+    cell back to the parent over a pipe.
+    """
+
+    def __init__(self, autograder_code, timeout, preload=(), resource_limits=None):
+        if not hasattr(os, 'fork'):
+            raise RuntimeError("The fork backend requires a POSIX system")
+        self.timeout = timeout
+        self.resource_limits = resource_limits
+        self.grader = cell_runner.compile_cell(
+            textwrap.dedent(autograder_code), '<autograder>'
+        )
+        for module in preload:
+            try:
+                importlib.import_module(module)
+            except ImportError:
+                pass
+
+    def run(self, sources, grader_index=None, limiter=None, timings=None, monitor=None):
+        """
+        Runs a notebook's code cells in a forked child.
+
+        Args:
+            sources: List of code cell sources, in notebook order
+            grader_index: Index in `sources` of the autograder cell, which is
+                replaced by the precompiled autograder code
+            limiter: Optional OutputLimiter capping the child's stream output
+            timings: Optional list the (wall, CPU) seconds of each cell, as
+                measured in the child, are appended to
+            monitor: Optional UsageMonitor, attached to the child and given
+                its rusage once it is reaped
+
+        Returns:
+            tuple: (list of per-cell output lists, status) where status is
+            'ok', 'error', 'timeout' or, if the child broke one of its
+            resource limits, a key of resource_limits.BREACH_MESSAGES.
+            Cells after a failing cell are not run and have no entry.
+        """
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            self._child(sources, grader_index, write_fd, limiter)
+
+        os.close(write_fd)
+        try:
+            # Also set in the child; doing it here too avoids a race with killpg
+            os.setpgid(pid, pid)
+        except OSError:
+            pass
+        if monitor is not None:
+            monitor.attach(pid)
+        try:
+            cells, status = cell_runner.collect_cells(read_fd, pid, self.timeout, timings)
+        finally:
+            os.close(read_fd)
+            if monitor is not None:
+                monitor.stop()
+            _, wait_status, rusage = os.wait4(pid, 0)
+            if monitor is not None:
+                monitor.set_rusage(rusage)
+
+        exit_code = os.waitstatus_to_exitcode(wait_status)
+        status = cell_runner.final_status(
+            cells, status, len(sources), exit_code, self.resource_limits, pid
+        )
+        return cells, status
+
+    def _child(self, sources, grader_index, write_fd, limiter):
+        """Runs in the forked child. Never returns."""
+        try:
+            os.setpgid(0, 0)
+            if self.resource_limits is not None:
+                self.resource_limits.apply()
+            # Anything written straight to the file descriptors (C extensions,
+            # subprocesses) must not end up on the grader's console
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, 1)
+            os.dup2(devnull, 2)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+            with os.fdopen(write_fd, 'w', encoding='utf-8') as pipe:
+                cell_runner.run_cells(sources, self.grader, grader_index, pipe, limiter)
+        finally:
+            if limiter is not None:
+                limiter.close()
+            os._exit(0)
+
+
+def compare_backends(notebooks):
+    """
+    Grades every notebook with both the kernel and the fork backend and
+    reports differences in the CSV output and the time taken.
+    """
+    import run_autograder
+
+    mismatches = 0
+    totals = {'kernel': 0.0, 'fork': 0.0}
+    for notebook in notebooks:
+        lines = {}
+        for backend in ('kernel', 'fork'):
+            run_autograder.execution_backend = backend
+            start = time.perf_counter()
+            _, csv_line, _ = run_autograder.process_student_notebook(notebook)
+            totals[backend] += time.perf_counter() - start
+            lines[backend] = csv_line
+        if lines['kernel'] != lines['fork']:
+            mismatches += 1
+            print(f"MISMATCH: {notebook}")
+            print(f"  kernel: {lines['kernel']}")
+            print(f"  fork:   {lines['fork']}")
+
+    print("=" * 70)
+    print(f"Notebooks compared: {len(notebooks)}")
+    print(f"Mismatched results: {mismatches}")
+    for backend, total in totals.items():
+        print(f"{backend:>6} backend: {total:.2f}s total, "
+              f"{total / max(len(notebooks), 1):.2f}s per notebook")
+    print("=" * 70)
+    return mismatches
+
+
+def main():
+    """Compares the kernel and fork backends on the notebooks in INPUT_DIR."""
+    from config import INPUT_DIR
+
+    notebooks = sorted(f for f in os.listdir(INPUT_DIR) if f.endswith('.ipynb'))
+    if not notebooks:
+        print(f"No .ipynb files found in {INPUT_DIR}")
+        sys.exit(1)
+    sys.exit(1 if compare_backends(notebooks) else 0)
+
+
+if __name__ == "__main__":
+    main()
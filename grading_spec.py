@@ -0,0 +1,932 @@
+#!/usr/bin/env python3
+"""
+Declarative grading specs for the CS3 Autograder
+Compiles a data description of an exam (fixtures, methods under test,
+arguments and expected values) into the autograder code injected into each
+student's notebook
+
+A spec is a dictionary of plain data (it can also be loaded from JSON):
+
+    {
+        'points_per_problem': 4.0,
+        'test_time_limit': 1.0,        # CPU seconds per test case
+        'problem_time_limit': 1.5,     # CPU seconds for one problem, fixtures included
+        'wall_time_factor': 5,         # optional: wall time allowed, times the CPU limits
+        'overtime_test_limit': 0.05,   # optional: CPU seconds per test once a problem's limit is spent
+        'insert_method': 'insert_edge',
+        'fixtures': {
+            # Built as Class(*args, **kwargs), then insert_method(*edge) per edge
+            'path': {'args': [3], 'kwargs': {'directed': True}, 'edges': [[0, 1], [1, 2]]},
+            # Edges generated from a seed instead (see RANDOM_EDGES)
+            'big': {'args': [2000], 'kwargs': {'directed': True}, 'time_limit': 1.0,
+                    'random': {'vertices': 2000, 'edges': 8000, 'seed': 1}},
+        },
+        'sections': [
+            {'title': 'Adjacency List Tests', 'class': 'GraphAL',
+             'fixtures': {...},        # optional, overrides fixtures for this class
+             'problems': [
+                 # Tests are [fixture, method arguments, expected value]
+                 {'method': 'is_there_an_edge', 'tests': [['path', [0, 1], True]],
+                  # [random fixture, count]: tests answered by NumpyOracle
+                  'random_tests': [['big', 10]]},
+             ]},
+        ],
+    }
+
+Problems are numbered in order across sections. Each fixture is built at
+most once per class, when a test first uses it, and building it counts
+against that problem's time limit; a fixture that cannot be built fails
+only the tests that use it.
+
+A test written as [fixture, arguments] takes its expected value from a
+reference solution notebook: expected_values() runs the reference once,
+answers every test with its classes and stores the table, which
+compile_spec() then writes into the grader, so students are only compared
+against precomputed answers.
+
+An optional 'performance' entry adds a stage that times the methods on
+random graphs of growing size and scores the fitted growth exponent against
+a target per method; see PERFORMANCE_SPEC in config.py.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import pprint
+import random
+import sys
+
+from result_cache import notebook_code_cells
+
+# Starts the line of JSON results the performance stage prints
+PERFORMANCE_MARKER = 'PERFORMANCE: '
+
+# Seconds a reference solution notebook may take to answer every test
+REFERENCE_TIMEOUT = 300
+
+GRADER_MARKER_TOP = '''
+#******************************************************************************
+#DO NOT MODIFY THE CODE BELOW
+#******************************************************************************
+'''
+
+GRADER_MARKER_BOTTOM = '''
+#******************************************************************************
+#DO NOT MODIFY THE CODE ABOVE
+#******************************************************************************
+'''
+
+# Generates the edges of a random fixture from its seed. Run by the grader,
+# the oracle and (through exec) random_edges(), so all three see one graph.
+RANDOM_EDGES = '''
+def _random_edges(params):
+    """The edges of a seeded random graph, without self-loops or repeated edges."""
+    rng = _random.Random(params['seed'])
+    vertices = params['vertices']
+    directed = params.get('directed', True)
+    max_weight = params.get('max_weight')
+    possible = vertices * (vertices - 1) // (1 if directed else 2)
+    edges = []
+    seen = set()
+    while len(edges) < min(params['edges'], possible):
+        u, v = rng.randrange(vertices), rng.randrange(vertices)
+        key = (u, v) if directed else (min(u, v), max(u, v))
+        if u == v or key in seen:
+            continue
+        seen.add(key)
+        edges.append((u, v, rng.randint(1, max_weight)) if max_weight else (u, v))
+    return edges
+
+'''
+
+# Builds a fixture with a class; shared by the grader and the oracle
+BUILD_GRAPH = RANDOM_EDGES + '''
+def _build_graph(cls, fixture):
+    graph = cls(*fixture.get('args', []), **fixture.get('kwargs', {}))
+    edges = _random_edges(fixture['random']) if 'random' in fixture else fixture.get('edges')
+    if edges:
+        insert = getattr(graph, GRADING_SPEC['insert_method'])
+        for edge in edges:
+            insert(*edge)
+    return graph
+
+'''
+
+# The grading engine injected with every compiled spec. GRADING_SPEC and
+# _CLASSES are defined above it.
+GRADER_RUNTIME = '''
+POINTS_PER_PROBLEM = GRADING_SPEC['points_per_problem']
+TEST_TIME_LIMIT = GRADING_SPEC['test_time_limit']
+PROBLEM_TIME_LIMIT = GRADING_SPEC['problem_time_limit']
+WALL_TIME_FACTOR = GRADING_SPEC.get('wall_time_factor', 5)
+OVERTIME_TEST_LIMIT = GRADING_SPEC.get('overtime_test_limit', 0.05)
+NUM_PROBLEMS = sum(len(section['problems']) for section in GRADING_SPEC['sections'])
+points_by_problem = []
+passed_methods = set()   # (class, method) of problems that passed every test
+_fixtures = {}
+
+
+class GradingTimeout(BaseException):
+    # Not an Exception, so `except Exception` in student code can't swallow it
+    pass
+
+
+def _raise_grading_timeout(signum, frame):
+    raise GradingTimeout()
+
+
+def run_with_time_limit(func, args, seconds):
+    """
+    Calls func(*args), raising GradingTimeout after `seconds` of this
+    process's CPU time, so a loaded machine doesn't fail correct code. Code
+    that waits instead of computing is stopped after WALL_TIME_FACTOR times
+    as much wall time.
+    """
+    if (not hasattr(_signal, "setitimer")
+            or _threading.current_thread() is not _threading.main_thread()):
+        return func(*args)
+    previous = [(signum, _signal.signal(signum, _raise_grading_timeout))
+                for signum in (_signal.SIGPROF, _signal.SIGALRM)]
+    # Keep firing every 0.1s in case student code catches the first one
+    _signal.setitimer(_signal.ITIMER_PROF, seconds, 0.1)
+    _signal.setitimer(_signal.ITIMER_REAL, seconds * WALL_TIME_FACTOR, 0.1)
+    try:
+        return func(*args)
+    finally:
+        _signal.setitimer(_signal.ITIMER_REAL, 0)
+        _signal.setitimer(_signal.ITIMER_PROF, 0)
+        for signum, handler in previous:
+            _signal.signal(signum, handler if handler is not None else _signal.SIG_DFL)
+
+
+class _Budget:
+    """
+    The CPU time left of one problem's PROBLEM_TIME_LIMIT. Work is charged
+    the CPU time it used, and work stopped for taking too long is charged
+    its whole limit, whether the CPU timer or the wall time fallback stopped
+    it, so what is left doesn't depend on how loaded the machine is.
+    """
+
+    def __init__(self):
+        self.left = PROBLEM_TIME_LIMIT
+
+    def limit(self, most):
+        """
+        CPU seconds the next test or fixture may use: up to `most`, within
+        what is left, and OVERTIME_TEST_LIMIT once the problem's time is spent.
+        """
+        return max(min(most, self.left), OVERTIME_TEST_LIMIT)
+
+    def run(self, func, args, seconds):
+        """Calls run_with_time_limit(func, args, seconds), charging the time it takes."""
+        start = _time.process_time()
+        used = None
+        try:
+            return run_with_time_limit(func, args, seconds)
+        except GradingTimeout:
+            used = seconds
+            raise
+        finally:
+            if used is None:
+                used = _time.process_time() - start
+            self.left -= used
+
+''' + BUILD_GRAPH + '''
+def get_fixture(class_name, name, fixture, budget):
+    """
+    Builds a fixture with the student's class the first time a test uses it,
+    within its time_limit and what is left of `budget` (the problem's _Budget),
+    raising RuntimeError if it can't be built. A build cut short by the
+    budget is tried again by the next test or problem that uses the fixture.
+    """
+    key = (class_name, name)
+    if key not in _fixtures:
+        limit = fixture.get('time_limit', TEST_TIME_LIMIT)
+        seconds = budget.limit(limit)
+        try:
+            graph = budget.run(_build_graph, (_CLASSES[class_name](), fixture), seconds)
+            _fixtures[key] = (graph, None)
+        except GradingTimeout:
+            if seconds < limit:
+                raise RuntimeError("building " + name + " ran out of the problem time limit")
+            _fixtures[key] = (None, "building " + name + " took too long")
+        except Exception as ex:
+            _fixtures[key] = (None, "building " + name + " failed: " + str(ex))
+    graph, error = _fixtures[key]
+    if error is not None:
+        raise RuntimeError(error)
+    return graph
+
+
+def _call_method(graph, method, args):
+    return getattr(graph, method)(*args)
+
+
+def _short(value, limit=200):
+    """repr() of a value, cut short for the long answers of random tests."""
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + "... (" + str(len(text)) + " characters)"
+
+
+def grade_problem(problem_num, class_name, fixtures, method, tests, max_points):
+    """
+    Grades a single problem with test cases. Building a fixture counts
+    against the problem's time limit, and a fixture that can't be built
+    only fails the tests that use it. Once the time limit is spent, the
+    remaining tests still run, each within OVERTIME_TEST_LIMIT, so the tests
+    a student is credited with depend only on their code.
+    """
+    passed_tests = 0
+    num_tests = len(tests)
+    budget = _Budget()
+
+    for i, (fixture, args, expected) in enumerate(tests):
+        try:
+            graph = get_fixture(class_name, fixture, fixtures[fixture], budget)
+        except RuntimeError as ex:
+            print("Problem", problem_num, "- Test", (i+1), "FAILED:", ex)
+            continue
+        try:
+            output = budget.run(_call_method, (graph, method, args),
+                                budget.limit(TEST_TIME_LIMIT))
+            if output == expected:
+                passed_tests += 1
+            elif 'random' in fixtures[fixture]:
+                print("Problem", problem_num, "- Test", (i+1), "FAILED on", fixture,
+                      "(seed " + str(fixtures[fixture]['random']['seed']) + ") with arguments", args,
+                      "Output:", _short(output), "Expected:", _short(expected))
+            else:
+                print("Problem", problem_num, "- Test", (i+1), "FAILED. Output:", output, "Expected:", expected)
+        except GradingTimeout:
+            print("Problem", problem_num, "- Test", (i+1), "TIMEOUT: took too long")
+        except Exception as ex:
+            print("Problem", problem_num, "- Test", (i+1), "EXCEPTION:", ex)
+
+    score = (passed_tests / num_tests) * max_points
+    if passed_tests == num_tests:
+        passed_methods.add((class_name, method))
+    points_by_problem.append(score)
+    print("Problem", problem_num, "Score:", score, "/", max_points)
+    return score
+
+
+def grade_all():
+    """Grades every problem of GRADING_SPEC, returning the total score."""
+    total = 0
+    problem_num = 0
+    for section in GRADING_SPEC['sections']:
+        print("===", section['title'], "===")
+        fixtures = dict(GRADING_SPEC['fixtures'], **section.get('fixtures', {}))
+        for problem in section['problems']:
+            problem_num += 1
+            try:
+                total += grade_problem(problem_num, section['class'], fixtures,
+                                       problem['method'], problem['tests'], POINTS_PER_PROBLEM)
+            except Exception as e:
+                print(f"Problem {problem_num} CRASHED: {e}")
+                points_by_problem.append(0.0)
+                print(f"Problem {problem_num} Score: 0.0 /", POINTS_PER_PROBLEM)
+    return total
+'''
+
+# Runs every problem and prints the student's CSV line, always last
+GRADER_MAIN = '''
+
+# ---------------------------------------------------------------
+# RUN ALL PROBLEMS AND PRINT CSV RESULT
+# ---------------------------------------------------------------
+
+try:
+    # Ensure we have student info, with fallback values
+    try:
+        student_first = str(first_name)
+        student_last = str(last_name)
+        student_id_val = str(student_id)
+    except:
+        student_first = "Unknown"
+        student_last = "Unknown"
+        student_id_val = "Unknown"
+
+    try:
+        final_score = grade_all()
+    except Exception as e:
+        print(f"ERROR in grade_all: {e}")
+        final_score = 0
+
+    # Ensure we have exactly NUM_PROBLEMS problem scores
+    while len(points_by_problem) < NUM_PROBLEMS:
+        points_by_problem.append(0.0)
+    points_by_problem = points_by_problem[:NUM_PROBLEMS]
+
+    if GRADING_SPEC.get('performance'):
+        try:
+            measure_performance()
+        except Exception as e:
+            print(f"ERROR in measure_performance: {e}")
+
+    # CSV format: first_name,last_name,student_id,score1,...,scoreN,total
+    csv_line = (
+        student_first + "," +
+        student_last + "," +
+        student_id_val + "," +
+        ",".join(str(int(score)) for score in points_by_problem) +
+        "," + "{:.2f}".format(final_score)
+    )
+
+    print(csv_line)
+except Exception as e:
+    # If there's an error, output zeros for all problems
+    try:
+        student_first = str(first_name)
+        student_last = str(last_name)
+        student_id_val = str(student_id)
+    except:
+        student_first = "Unknown"
+        student_last = "Unknown"
+        student_id_val = "Unknown"
+
+    csv_line = (
+        student_first + "," +
+        student_last + "," +
+        student_id_val + "," +
+        ",".join(["0"] * NUM_PROBLEMS) +
+        ",0.00"
+    )
+    print(f"ERROR: {e}")
+    print(csv_line)
+'''
+
+# Runs after the cells of a reference solution notebook and evaluates to the
+# repr of its answer to every test, problem by problem
+ORACLE_RUNTIME = BUILD_GRAPH + '''
+def _expected_table():
+    graphs = {}
+    table = []
+    for section in GRADING_SPEC['sections']:
+        fixtures = dict(GRADING_SPEC['fixtures'], **section.get('fixtures', {}))
+        for problem in section['problems']:
+            answers = []
+            for test in problem['tests']:
+                name, args = test[0], test[1]
+                key = (section['class'], name)
+                try:
+                    if key not in graphs:
+                        graphs[key] = _build_graph(_CLASSES[section['class']](), fixtures[name])
+                    answers.append(repr(getattr(graphs[key], problem['method'])(*args)))
+                except Exception as ex:
+                    raise RuntimeError(
+                        f"{section['class']}.{problem['method']}{tuple(args)} on {name}: {ex!r}"
+                    )
+            table.append(answers)
+    return table
+
+
+_expected_table()
+'''
+
+# The optional performance stage: times graded methods on random graphs of
+# growing size and fits how their running time grows with the vertex count
+PERFORMANCE_RUNTIME = '''
+import json as _json
+import math as _math
+
+_PERFORMANCE_MARKER = ''' + repr(PERFORMANCE_MARKER) + '''
+_scaled_graphs = {}
+
+
+def _scaled_graph(class_name, vertices):
+    """Builds a random graph with edges_per_vertex edges per vertex, once per class and size."""
+    key = (class_name, vertices)
+    if key not in _scaled_graphs:
+        performance = GRADING_SPEC['performance']
+        rng = _random.Random(vertices)
+        graph = _CLASSES[class_name]()(vertices, **performance.get('kwargs', {}))
+        insert = getattr(graph, GRADING_SPEC['insert_method'])
+        num_edges = min(performance['edges_per_vertex'] * vertices, vertices * (vertices - 1))
+        edges = set()
+        while len(edges) < num_edges:
+            edge = (rng.randrange(vertices), rng.randrange(vertices))
+            if edge[0] != edge[1] and edge not in edges:
+                edges.add(edge)
+                insert(*edge)
+        _scaled_graphs[key] = graph
+    return _scaled_graphs[key]
+
+
+def _seconds_per_call(func, arg_sets, repeats):
+    """Times func over arg_sets, calling it often enough to time reliably; the fastest round wins."""
+    number = 1
+    while True:
+        start = _time.perf_counter()
+        for i in range(number):
+            func(*arg_sets[i % len(arg_sets)])
+        elapsed = _time.perf_counter() - start
+        if elapsed >= 0.002:
+            break
+        number *= 2
+    best = elapsed
+    for _ in range(repeats - 1):
+        start = _time.perf_counter()
+        for i in range(number):
+            func(*arg_sets[i % len(arg_sets)])
+        best = min(best, _time.perf_counter() - start)
+    return best / number
+
+
+def _measure(class_name, method, vertex_args, timings):
+    """Appends [vertices, seconds per call] to timings for each size."""
+    performance = GRADING_SPEC['performance']
+    for vertices in performance['sizes']:
+        func = getattr(_scaled_graph(class_name, vertices), method)
+        rng = _random.Random(vertices + 1)
+        arg_sets = [tuple(rng.randrange(vertices) for _ in range(vertex_args)) for _ in range(16)]
+        timings.append([vertices, _seconds_per_call(func, arg_sets, performance['repeats'])])
+
+
+def growth_exponent(timings):
+    """The slope of a least-squares line through log(seconds) against log(vertices)."""
+    xs = [_math.log(vertices) for vertices, _ in timings]
+    ys = [_math.log(max(seconds, 1e-9)) for _, seconds in timings]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    return (sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+            / sum((x - mean_x) ** 2 for x in xs))
+
+
+def measure_performance():
+    """Scores how the running time of each method grows, printing a PERFORMANCE line."""
+    performance = GRADING_SPEC['performance']
+    print("=== Performance ===")
+    results = []
+    for class_name, method, vertex_args, target in performance['problems']:
+        timings = []
+        error = None
+        if (class_name, method) not in passed_methods:
+            error = "not all correctness tests passed"
+        else:
+            try:
+                run_with_time_limit(_measure, (class_name, method, vertex_args, timings),
+                                    performance['time_limit'])
+            except GradingTimeout:
+                error = "time limit reached"
+            except Exception as ex:
+                error = str(ex)
+        exponent = growth_exponent(timings) if len(timings) >= 2 else None
+        points = 0.0
+        if error is None and exponent <= target + performance['tolerance']:
+            points = performance['points']
+        results.append({
+            'class': class_name, 'method': method, 'target': target,
+            'exponent': None if exponent is None else round(exponent, 3), 'points': points,
+            'timings': [[vertices, float("{:.4g}".format(seconds))] for vertices, seconds in timings],
+            'error': error,
+        })
+        growth = "n/a" if exponent is None else "{:.2f}".format(exponent)
+        print(class_name + "." + method, "growth exponent:", growth, "target:", target,
+              "Score:", points, "/", performance['points'], "" if error is None else "(" + error + ")")
+        for vertices, seconds in timings:
+            print("    V =", vertices, "{:.3g}s per call".format(seconds))
+    # Printed just before the CSV line, so it survives output truncation
+    print(_PERFORMANCE_MARKER + _json.dumps(results, separators=(",", ":")))
+'''
+
+
+def load_spec(path):
+    """Reads a spec from a JSON file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def section_fixtures(spec, section):
+    """Returns the fixtures a section's problems can use."""
+    return dict(spec['fixtures'], **section.get('fixtures', {}))
+
+
+def problem_count(spec):
+    """Returns the number of problems (CSV score columns) of a spec."""
+    return sum(len(section['problems']) for section in spec['sections'])
+
+
+def grading_budget(spec):
+    """
+    Returns the most CPU seconds the compiled grader can spend: each
+    problem's time limit, which also covers building its fixtures, the
+    overtime limit of every test, plus the performance stage's limit per
+    method.
+    """
+    seconds = problem_count(spec) * spec['problem_time_limit']
+    tests = sum(len(problem['tests']) + sum(count for _, count in problem.get('random_tests', []))
+                for section in spec['sections'] for problem in section['problems'])
+    seconds += tests * spec.get('overtime_test_limit', 0.05)
+    if spec.get('performance'):
+        seconds += len(spec['performance']['problems']) * spec['performance']['time_limit']
+    return seconds
+
+
+def validate_spec(spec):
+    """
+    Checks that a spec is complete and consistent.
+
+    Raises:
+        ValueError: Describing the first problem found
+    """
+    for key in ('points_per_problem', 'test_time_limit', 'problem_time_limit',
+                'insert_method', 'fixtures', 'sections'):
+        if key not in spec:
+            raise ValueError(f"grading spec has no '{key}'")
+    overrides = {}
+    for section in spec['sections']:
+        class_name = section.get('class', '')
+        if not class_name.isidentifier():
+            raise ValueError(f"section {section.get('title')!r} has no valid 'class'")
+        # Fixtures are built once per class, so a class must see one definition of each
+        for name, fixture in section.get('fixtures', {}).items():
+            if overrides.setdefault((class_name, name), fixture) != fixture:
+                raise ValueError(f"fixture {name!r} is overridden differently for {class_name}")
+        fixtures = section_fixtures(spec, section)
+        for problem in section.get('problems', []):
+            if not problem.get('tests'):
+                raise ValueError(f"{class_name}.{problem.get('method')} has no tests")
+            for test in problem['tests']:
+                if len(test) not in (2, 3) or not isinstance(test[1], (list, tuple)):
+                    raise ValueError(
+                        f"{class_name}.{problem['method']}: test {test!r} is not "
+                        "[fixture, arguments, expected] or [fixture, arguments]"
+                    )
+                if test[0] not in fixtures:
+                    raise ValueError(
+                        f"{class_name}.{problem['method']}: unknown fixture {test[0]!r}"
+                    )
+            for name, count in problem.get('random_tests', []):
+                if 'random' not in fixtures.get(name, {}):
+                    raise ValueError(
+                        f"{class_name}.{problem['method']}: {name!r} is not a random fixture"
+                    )
+                if problem['method'] not in NumpyOracle.ARITY:
+                    raise ValueError(f"no NumPy oracle answers {problem['method']}")
+    for name, fixture in spec['fixtures'].items():
+        params = fixture.get('random')
+        if params is not None and not all(key in params for key in ('vertices', 'edges', 'seed')):
+            raise ValueError(f"random fixture {name!r} needs 'vertices', 'edges' and 'seed'")
+    if spec.get('performance'):
+        _validate_performance(spec)
+
+
+def _validate_performance(spec):
+    """Checks the optional performance stage of a spec."""
+    performance = spec['performance']
+    for key in ('sizes', 'edges_per_vertex', 'repeats', 'time_limit', 'tolerance',
+                'points', 'problems'):
+        if key not in performance:
+            raise ValueError(f"performance spec has no '{key}'")
+    sizes = performance['sizes']
+    if len(sizes) < 2 or any(a >= b for a, b in zip(sizes, sizes[1:])):
+        raise ValueError("performance sizes must be at least two increasing vertex counts")
+    class_names = {section['class'] for section in spec['sections']}
+    for problem in performance['problems']:
+        if len(problem) != 4 or problem[0] not in class_names:
+            raise ValueError(
+                f"performance problem {problem!r} is not [class, method, "
+                "vertex arguments, target exponent] for a class the spec tests"
+            )
+
+
+def _literal(value, indent):
+    """pprint of a value whose first line starts `indent` columns in."""
+    text = pprint.pformat(value, width=max(100 - indent, 40), sort_dicts=False, compact=True)
+    return text.replace('\n', '\n' + ' ' * indent)
+
+
+def _dict_code(items, indent):
+    """A dict literal with one (key, value code) pair of `items` per line."""
+    pad = ' ' * (indent + 4)
+    return "{\n" + "".join(f"{pad}{key!r}: {code},\n" for key, code in items) + ' ' * indent + "}"
+
+
+def _list_code(codes, indent):
+    """A list literal with one item code of `codes` per line."""
+    pad = ' ' * (indent + 4)
+    return "[\n" + "".join(f"{pad}{code},\n" for code in codes) + ' ' * indent + "]"
+
+
+def _value_items(mapping, indent, skip=()):
+    """(key, code) pairs of a dict's plain values, for _dict_code()."""
+    return [(key, _literal(value, indent + 4 + len(repr(key)) + 2))
+            for key, value in mapping.items() if key not in skip]
+
+
+def _spec_code(spec):
+    """
+    The imports and the GRADING_SPEC, _TESTS and _CLASSES definitions compiled
+    code starts with. Each problem's tests are a table in _TESTS, one
+    (fixture, arguments[, expected value]) tuple per line, and problems with
+    the same tests (as the sections of a shared problem list have) share
+    one table.
+    """
+    tables = {}
+    sections = []
+    for section in spec['sections']:
+        problems = []
+        for problem in section['problems']:
+            table = _list_code([repr(tuple(test)) for test in problem['tests']], 4)
+            index = tables.setdefault(table, len(tables))
+            problems.append("{" + ", ".join(
+                [f"{key!r}: {value!r}" for key, value in problem.items() if key != 'tests']
+                + [f"'tests': _TESTS[{index}]"]
+            ) + "}")
+        items = _value_items(section, 8, skip=('fixtures', 'problems'))
+        if 'fixtures' in section:
+            items.append(('fixtures', _dict_code(_value_items(section['fixtures'], 12), 12)))
+        items.append(('problems', _list_code(problems, 12)))
+        sections.append(_dict_code(items, 8))
+
+    items = []
+    for key, value in spec.items():
+        if key == 'fixtures':
+            items.append((key, _dict_code(_value_items(value, 4), 4)))
+        elif key == 'sections':
+            items.append((key, _list_code(sections, 4)))
+        else:
+            items += _value_items({key: value}, 0)
+
+    class_names = list(dict.fromkeys(section['class'] for section in spec['sections']))
+    # Looked up when a problem runs, so a missing class only fails its own problems
+    classes = ', '.join(f"{name!r}: lambda: {name}" for name in class_names)
+    return (
+        "\nimport random as _random\nimport signal as _signal\nimport threading as _threading\n"
+        "import time as _time\n\n"
+        + "# (fixture, arguments, expected value) of the tests of each problem\n"
+        + "_TESTS = " + _list_code(list(tables), 0) + "\n\n"
+        + "GRADING_SPEC = " + _dict_code(items, 0) + "\n"
+        + "_CLASSES = {" + classes + "}\n"
+    )
+
+
+def _run_reference(spec, sources, cwd, timeout):
+    """
+    Runs a reference solution's code cells, then answers every test of a
+    spec with its classes, in a fresh Python process.
+
+    Returns:
+        list: Per problem, in order, the repr of the answer to each test
+
+    Raises:
+        ValueError: If the notebook fails or cannot answer a test
+    """
+    from subprocess_runner import SubprocessRunner
+
+    runner = SubprocessRunner(_spec_code(spec) + ORACLE_RUNTIME, timeout, cwd=cwd)
+    cells, status = runner.run(sources + [''], grader_index=len(sources))
+    if status != 'ok':
+        errors = [f"{output['ename']}: {output['evalue']}" for outputs in cells
+                  for output in outputs if output['output_type'] == 'error']
+        raise ValueError(f"reference solution failed ({errors[-1] if errors else status})")
+    result = [output for output in cells[-1] if output['output_type'] == 'execute_result']
+    return ast.literal_eval(result[0]['data']['text/plain'])
+
+
+def expected_values(spec, notebook_path, table_path=None, timeout=REFERENCE_TIMEOUT):
+    """
+    Computes a reference solution notebook's answer to every test of a spec.
+    The table is computed once and stored in `table_path`, then reused until
+    the notebook's code or the spec's tests change.
+
+    Args:
+        spec: The grading spec
+        notebook_path: The reference solution notebook, or None
+        table_path: JSON file the table is stored in, or None to not store it
+        timeout: Seconds the reference may take
+
+    Returns:
+        list: Per problem, in order, the expected value of each test, or None
+        if notebook_path is None
+
+    Raises:
+        ValueError: If the reference fails or gives an answer that is not a literal
+    """
+    if notebook_path is None:
+        return None
+    validate_spec(spec)
+    with open(notebook_path, 'r', encoding='utf-8') as f:
+        sources = [source for source, _ in notebook_code_cells(json.load(f))]
+    key = hashlib.sha256(json.dumps({
+        'cells': sources,
+        'fixtures': spec['fixtures'],
+        'sections': spec['sections'],
+        'insert_method': spec['insert_method'],
+        'python': sys.version,
+    }, sort_keys=True).encode('utf-8')).hexdigest()
+
+    table = None
+    if table_path is not None and os.path.exists(table_path):
+        try:
+            with open(table_path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            if stored.get('key') == key:
+                table = stored['expected']
+        except (OSError, ValueError):
+            pass
+    if table is None:
+        table = _run_reference(
+            spec, sources, os.path.dirname(os.path.abspath(notebook_path)), timeout
+        )
+        print(f"Computed {sum(len(answers) for answers in table)} expected values "
+              f"from {os.path.basename(notebook_path)}")
+        if table_path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(table_path)), exist_ok=True)
+            staging = f"{table_path}.tmp-{os.getpid()}"
+            with open(staging, 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'expected': table}, f)
+            os.replace(staging, table_path)
+
+    expected = []
+    for answers in table:
+        try:
+            expected.append([ast.literal_eval(answer) for answer in answers])
+        except (ValueError, SyntaxError):
+            raise ValueError(
+                f"reference answers {answers!r} to problem {len(expected) + 1} "
+                "are not all literals"
+            )
+    return expected
+
+
+def random_edges(params):
+    """Returns the edges of a random fixture, exactly as the grader generates them."""
+    namespace = {'_random': random}
+    exec(RANDOM_EDGES, namespace)
+    return namespace['_random_edges'](params)
+
+
+class NumpyOracle:
+    """
+    Answers the graded methods for a random fixture from its adjacency
+    matrix, with vectorized NumPy operations: in-degrees are column sums,
+    out-degrees and neighbors come from the rows' nonzeros.
+    """
+
+    # Graded methods the oracle answers -> number of vertex arguments
+    ARITY = {
+        'is_there_an_edge': 2,
+        'compute_in_degree': 1,
+        'is_isolated': 1,
+        'highest_out_degree_vertex': 0,
+        'sorted_edge_values': 0,
+        'get_adjacent_neighbors': 1,
+    }
+
+    def __init__(self, params):
+        try:
+            import numpy as np
+        except ImportError:
+            raise ValueError("random tests need NumPy (pip install numpy)")
+        self.np = np
+        self.vertices = params['vertices']
+        self.edges = random_edges(params)
+        edges = np.array(self.edges, dtype=np.int64).reshape(len(self.edges), -1)
+        weights = edges[:, 2] if params.get('max_weight') else 1
+        matrix = np.zeros((self.vertices, self.vertices), dtype=np.int64)
+        if len(edges):
+            matrix[edges[:, 0], edges[:, 1]] = weights
+            if not params.get('directed', True):
+                matrix[edges[:, 1], edges[:, 0]] = weights
+        self.matrix = matrix
+        self.nonzero = matrix != 0
+        self.in_degree = self.nonzero.sum(axis=0)
+        self.out_degree = self.nonzero.sum(axis=1)
+
+    def answer(self, method, args):
+        return getattr(self, method)(*args)
+
+    def sample_arguments(self, method, count, rng):
+        """Draws `count` argument lists for a method; half the vertex pairs are edges."""
+        arity = self.ARITY[method]
+        if arity == 0:
+            return [[]]
+        samples = []
+        for _ in range(count):
+            if arity == 2 and self.edges and rng.random() < 0.5:
+                samples.append(list(rng.choice(self.edges)[:2]))
+            else:
+                samples.append([rng.randrange(self.vertices) for _ in range(arity)])
+        return samples
+
+    def is_there_an_edge(self, u, v):
+        return bool(self.nonzero[u, v])
+
+    def compute_in_degree(self, v):
+        return int(self.in_degree[v])
+
+    def is_isolated(self, v):
+        return bool(self.in_degree[v] == 0 and self.out_degree[v] == 0)
+
+    def highest_out_degree_vertex(self):
+        return int(self.np.argmax(self.out_degree)) if self.vertices else -1
+
+    def sorted_edge_values(self):
+        return self.np.sort(self.matrix[self.nonzero]).tolist()
+
+    def get_adjacent_neighbors(self, v):
+        return self.np.flatnonzero(self.nonzero[v]).tolist()
+
+
+def _add_random_tests(spec, sections):
+    """
+    Expands every problem's random_tests, [fixture, count], into ordinary
+    tests answered by a NumPy oracle. Arguments are drawn from a generator
+    seeded with the fixture's seed and the method, so the tests are the same
+    on every compile.
+    """
+    oracles = {}
+    for section in sections:
+        fixtures = section_fixtures(spec, section)
+        for problem in section['problems']:
+            for name, count in problem.pop('random_tests', []):
+                params = fixtures[name]['random']
+                key = json.dumps(params, sort_keys=True)
+                if key not in oracles:
+                    oracles[key] = NumpyOracle(params)
+                oracle = oracles[key]
+                rng = random.Random(f"{params['seed']}:{problem['method']}")
+                for args in oracle.sample_arguments(problem['method'], count, rng):
+                    problem['tests'].append([name, args, oracle.answer(problem['method'], args)])
+    return sections
+
+
+def _fill_expected(spec, expected):
+    """
+    Returns a copy of a spec's sections with every test's expected value,
+    taken from `expected` where the test gives none.
+    """
+    sections = []
+    problem_num = 0
+    for section in spec['sections']:
+        problems = []
+        for problem in section['problems']:
+            tests = []
+            for index, test in enumerate(problem['tests']):
+                where = f"{section['class']}.{problem['method']} test {index + 1}"
+                answer = expected[problem_num][index] if expected is not None else None
+                if len(test) == 3:
+                    if expected is not None and answer != test[2]:
+                        print(f"Warning: {where} expects {test[2]!r}, "
+                              f"the reference solution gives {answer!r}")
+                    tests.append(list(test))
+                elif expected is None:
+                    raise ValueError(f"{where} has no expected value and there is "
+                                     "no reference solution")
+                else:
+                    tests.append([test[0], test[1], answer])
+            problems.append(dict(problem, tests=tests))
+            problem_num += 1
+        sections.append(dict(section, problems=problems))
+    return sections
+
+
+def compile_spec(spec, expected=None):
+    """
+    Compiles a spec into autograder code for AUTOGRADER_CODE.
+
+    Args:
+        spec: The grading spec
+        expected: Optional reference answers from expected_values(), used for
+            tests written without an expected value
+
+    Returns:
+        str: The code, between the DO NOT MODIFY markers
+    """
+    validate_spec(spec)
+    spec = dict(spec, sections=_add_random_tests(spec, _fill_expected(spec, expected)))
+    code = _spec_code(spec) + GRADER_RUNTIME
+    if spec.get('performance'):
+        code += PERFORMANCE_RUNTIME
+    return GRADER_MARKER_TOP + code + GRADER_MAIN + GRADER_MARKER_BOTTOM
+
+
+def graded_classes(spec):
+    """
+    Describes the classes a spec tests, for the pre-screen.
+
+    Returns:
+        dict: Class name -> {'setup': methods every problem of the class
+        needs to build its fixtures, 'graded': methods under test}
+    """
+    result = {}
+    for section in spec['sections']:
+        fixtures = section_fixtures(spec, section)
+        entry = result.setdefault(section['class'], {'setup': None, 'graded': []})
+        for problem in section['problems']:
+            needs = set()
+            for name, *_ in problem['tests']:
+                if fixtures[name].get('args') or fixtures[name].get('kwargs'):
+                    needs.add('__init__')
+                if fixtures[name].get('edges') or fixtures[name].get('random'):
+                    needs.add(spec['insert_method'])
+            entry['setup'] = needs if entry['setup'] is None else entry['setup'] & needs
+            if problem['method'] not in entry['graded']:
+                entry['graded'].append(problem['method'])
+    return {
+        name: {'setup': tuple(sorted(entry['setup'] or ())), 'graded': tuple(entry['graded'])}
+        for name, entry in result.items()
+    }
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Warm Jupyter kernel pool for the CS3 Autograder
+Keeps pre-started kernels alive and reuses them across student notebooks, and
+provides the kernel managers that start kernels under resource limits
+"""
+
+import queue
+import threading
+from contextlib import contextmanager
+
+from jupyter_client import AsyncKernelManager, BlockingKernelClient, KernelManager
+from jupyter_core.utils import run_sync
+from nbclient.exceptions import CellExecutionError
+
+
+# Runs once in every new kernel: remembers the clean interpreter state so the
+# kernel can be put back into it between students.
+SNAPSHOT_CODE = '''
+import builtins as _builtins, os as _os, signal as _signal, sys as _sys, threading as _threading
+_sys._autograder_baseline = dict(
+    modules=set(_sys.modules),
+    path=list(_sys.path),
+    cwd=_os.getcwd(),
+    environ=dict(_os.environ),
+    builtins=dict(vars(_builtins)),
+    stdlib={
+        _name: (_module, {_k: _v for _k, _v in vars(_module).items() if not _k.startswith('_')})
+        for _name, _module in _sys.modules.items()
+        if _module is not None and _name.partition('.')[0] in _sys.stdlib_module_names
+    },
+    signals={_s: _signal.getsignal(_s) for _s in _signal.valid_signals()
+             if _signal.getsignal(_s) is not None},
+    recursion_limit=_sys.getrecursionlimit(),
+    trace=(_sys.gettrace(), _sys.getprofile()),
+    threads=set(_threading.enumerate()),
+)
+del _builtins, _os, _signal, _sys, _threading
+'''
+
+# Runs between students: refuses kernels the student left threads running in
+# (the kernel is restarted instead), then clears the user namespace and
+# history, drops any modules the student imported and undoes changes to
+# builtins, standard library modules, signal handlers, the recursion limit,
+# tracing, the environment, sys.path and the working directory.
+RESET_CODE = '''
+import builtins as _builtins, os as _os, random as _random, signal as _signal, sys as _sys, threading as _threading
+_base = _sys._autograder_baseline
+if any(_t.is_alive() for _t in set(_threading.enumerate()) - _base['threads']):
+    raise RuntimeError("Student code left threads running")
+for _name in set(_sys.modules) - _base['modules']:
+    if not _name.startswith('multiprocessing'):
+        del _sys.modules[_name]
+def _restore(namespace, saved, public_only):
+    for name in [name for name in namespace if name not in saved]:
+        if not (public_only and name.startswith('_')):
+            del namespace[name]
+    for name, value in saved.items():
+        if namespace.get(name, saved) is not value:
+            namespace[name] = value
+_restore(vars(_builtins), _base['builtins'], False)
+for _module, _attrs in _base['stdlib'].values():
+    _restore(vars(_module), _attrs, True)
+for _s, _handler in _base['signals'].items():
+    if _signal.getsignal(_s) != _handler:
+        _signal.signal(_s, _handler)
+_sys.setrecursionlimit(_base['recursion_limit'])
+_sys.settrace(_base['trace'][0])
+_sys.setprofile(_base['trace'][1])
+_threading.settrace(None)
+_threading.setprofile(None)
+_os.environ.clear()
+_os.environ.update(_base['environ'])
+_sys.path[:] = _base['path']
+_os.chdir(_base['cwd'])
+_random.seed()
+__import__('IPython').get_ipython().reset(new_session=True)
+'''
+
+
+class ResourceLimitedKernelMixin:
+    """
+    Starts the kernel under `resource_limits` (a ResourceLimits) and keeps
+    hold of the kernel process, so that after the kernel died it can still
+    be told whether a limit killed it.
+    """
+
+    resource_limits = None
+    kernel_process = None
+    oom_killed = False
+
+    def format_kernel_cmd(self, extra_arguments=None):
+        cmd = super().format_kernel_cmd(extra_arguments)
+        if self.resource_limits is not None:
+            cmd = self.resource_limits.wrap(cmd)
+        return cmd
+
+    async def _async_launch_kernel(self, kernel_cmd, **kw):
+        await super()._async_launch_kernel(kernel_cmd, **kw)
+        self.kernel_process = getattr(self.provisioner, 'process', None)
+
+    def _release_limits(self):
+        if self.resource_limits is not None and self.kernel_process is not None:
+            if self.resource_limits.release(self.kernel_process.pid):
+                self.oom_killed = True
+
+    def renew_limits(self):
+        """Renews the CPU time allowance before the kernel runs another notebook."""
+        if self.resource_limits is None or self.kernel_process is None:
+            return True
+        return self.resource_limits.renew_cpu(self.kernel_process.pid)
+
+    def limit_breach(self, error_name=None, error_value=None):
+        """
+        Returns the limit (a key of BREACH_MESSAGES) the kernel broke, given
+        the error the notebook failed with, or None.
+        """
+        if self.resource_limits is None:
+            return None
+        exit_code = self.kernel_process.poll() if self.kernel_process is not None else None
+        if exit_code is not None:
+            self._release_limits()
+        return self.resource_limits.breach(error_name, error_value, exit_code, self.oom_killed)
+
+    async def _async_cleanup_resources(self, restart=False):
+        self._release_limits()
+        await super()._async_cleanup_resources(restart)
+
+
+class LimitedKernelManager(ResourceLimitedKernelMixin, KernelManager):
+    """KernelManager that runs its kernel under resource limits."""
+
+    cleanup_resources = run_sync(ResourceLimitedKernelMixin._async_cleanup_resources)
+
+
+class AsyncLimitedKernelManager(ResourceLimitedKernelMixin, AsyncKernelManager):
+    """AsyncKernelManager that runs its kernel under resource limits."""
+
+    cleanup_resources = ResourceLimitedKernelMixin._async_cleanup_resources
+
+
+class ResourceLimitedClientMixin:
+    """
+    Makes an nbclient NotebookClient (or ExecutePreprocessor) start its
+    kernels under `resource_limits`. The kernel manager of the last kernel
+    it started stays available as `limited_km` after execution.
+    """
+
+    resource_limits = None
+    limited_km = None
+
+    def create_kernel_manager(self):
+        if self.resource_limits is not None and self.km is None:
+            self.kernel_manager_class = AsyncLimitedKernelManager
+        km = super().create_kernel_manager()
+        if isinstance(km, ResourceLimitedKernelMixin):
+            km.resource_limits = self.resource_limits
+            self.limited_km = km
+        return km
+
+
+class PooledKernel:
+    """A running kernel owned by a KernelPool."""
+
+    def __init__(self, km):
+        self.km = km
+        self.uses = 0
+        # Set to False by the user of the kernel if it crashed or timed out
+        self.healthy = True
+
+
+class KernelPool:
+    """
+    Keeps `size` kernels, plus `spares` warm spares, started and hands them
+    out one notebook at a time.
+
+    After a notebook, a kernel is replaced by a fresh one in the background
+    (or, with `reset_mode='reset'`, put back into a clean state), while the
+    next notebook runs on a spare. A kernel that crashed, timed out, failed
+    its health check, could not be reset or has been used `max_uses` times
+    is always replaced.
+
+    With `resource_limits`, kernels run under those limits and get a fresh
+    CPU time allowance for every notebook.
+    """
+
+    def __init__(self, size, kernel_name='python3', cwd=None, reset_mode='restart',
+                 spares=1, max_uses=50, startup_timeout=60, resource_limits=None):
+        self.size = size
+        self.spares = spares
+        self.kernel_name = kernel_name
+        self.cwd = cwd
+        self.reset_mode = reset_mode
+        self.max_uses = max_uses
+        self.startup_timeout = startup_timeout
+        self.resource_limits = resource_limits
+        if (resource_limits is not None and resource_limits.cpu_seconds is not None
+                and not resource_limits.can_renew_cpu()):
+            # The CPU time limit counts the kernel's whole life, so a kernel
+            # whose allowance can't be renewed is only used once
+            self.max_uses = 1
+        self._idle = queue.Queue()
+        self._kernels = []
+        self._recycling = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self):
+        """Starts all kernels in the pool."""
+        for _ in range(self.size + self.spares):
+            self._idle.put(self._start_kernel())
+        return self
+
+    def _start_kernel(self):
+        # nbclient drives kernels from an event loop, so the clients it gets
+        # from km.client() must be asynchronous
+        km = LimitedKernelManager(
+            kernel_name=self.kernel_name,
+            client_class='jupyter_client.asynchronous.AsyncKernelClient'
+        )
+        km.resource_limits = self.resource_limits
+        km.start_kernel(
+            cwd=self.cwd,
+            extra_arguments=['--HistoryManager.hist_file=:memory:']
+        )
+        kernel = PooledKernel(km)
+        if not self._run(kernel, SNAPSHOT_CODE, self.startup_timeout):
+            km.shutdown_kernel(now=True)
+            raise RuntimeError(f"Kernel '{self.kernel_name}' failed to start")
+        with self._lock:
+            self._kernels.append(kernel)
+        return kernel
+
+    def _run(self, kernel, code, timeout):
+        """Runs setup code in a kernel. Returns True if it succeeded."""
+        # With the manager as parent, liveness is checked on the kernel process
+        # rather than the heartbeat, which may not be beating yet at startup
+        kc = BlockingKernelClient(parent=kernel.km)
+        kc.load_connection_info(kernel.km.get_connection_info())
+        try:
+            kc.start_channels()
+            kc.wait_for_ready(timeout=timeout)
+            reply = kc.execute_interactive(
+                code, store_history=False, timeout=timeout,
+                output_hook=lambda msg: None
+            )
+            return reply['content']['status'] == 'ok'
+        except Exception:
+            return False
+        finally:
+            kc.stop_channels()
+
+    def _shutdown_kernel(self, kernel):
+        with self._lock:
+            if kernel in self._kernels:
+                self._kernels.remove(kernel)
+        try:
+            kernel.km.shutdown_kernel(now=True)
+        except Exception:
+            pass
+
+    def _recycle(self, kernel):
+        """Returns a clean, healthy kernel to replace `kernel` after a notebook."""
+        reusable = (
+            kernel.healthy
+            and self.reset_mode == 'reset'
+            and kernel.uses < self.max_uses
+            and kernel.km.is_alive()
+        )
+        if reusable and self._run(kernel, RESET_CODE, self.startup_timeout):
+            return kernel
+
+        self._shutdown_kernel(kernel)
+        return self._start_kernel()
+
+    def _replenish(self, kernel):
+        """Recycles a returned kernel and puts the result back into the pool."""
+        try:
+            kernel = self._recycle(kernel)
+        except Exception:
+            # acquire() starts the replacement (and reports the failure)
+            kernel = None
+        if self._closed and kernel is not None:
+            self._shutdown_kernel(kernel)
+        else:
+            self._idle.put(kernel)
+
+    def acquire(self, timeout=None):
+        """Takes an idle kernel from the pool, waiting for one if necessary."""
+        if self._closed:
+            raise RuntimeError("Kernel pool is closed")
+        kernel = self._idle.get(timeout=timeout)
+        if kernel is None:
+            kernel = self._start_kernel()
+        elif kernel.uses and not kernel.km.renew_limits():
+            self._shutdown_kernel(kernel)
+            kernel = self._start_kernel()
+        kernel.uses += 1
+        kernel.healthy = True
+        return kernel
+
+    def release(self, kernel):
+        """
+        Returns a kernel to the pool. It is reset or replaced on a background
+        thread, so the next notebook doesn't wait for it.
+        """
+        if self._closed:
+            self._shutdown_kernel(kernel)
+            return
+        thread = threading.Thread(target=self._replenish, args=(kernel,), daemon=True)
+        with self._lock:
+            self._recycling = [t for t in self._recycling if t.is_alive()] + [thread]
+        thread.start()
+
+    @contextmanager
+    def kernel(self, timeout=None):
+        """
+        Context manager that lends out a kernel for one notebook.
+
+        Any exception other than an ordinary cell error marks the kernel as
+        unhealthy so that it is replaced instead of reused.
+        """
+        kernel = self.acquire(timeout)
+        try:
+            yield kernel
+        except Exception as e:
+            if not isinstance(e, CellExecutionError):
+                kernel.healthy = False
+            raise
+        finally:
+            self.release(kernel)
+
+    def close(self):
+        """Shuts down every kernel in the pool."""
+        self._closed = True
+        with self._lock:
+            recycling = list(self._recycling)
+        for thread in recycling:
+            thread.join()
+        with self._lock:
+            kernels = list(self._kernels)
+        for kernel in kernels:
+            self._shutdown_kernel(kernel)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Live metrics for the CS3 Autograder
+Exposes the progress of a grading run in Prometheus text format, over HTTP
+and/or in a file rewritten every few seconds
+"""
+
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from phase_timing import PHASES
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """A Prometheus histogram: cumulative bucket counts, sum and count."""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels=''):
+        """Returns the exposition lines of this histogram."""
+        sep = ',' if labels else ''
+        lines = [f'{name}_bucket{{{labels}{sep}le="{bound}"}} {count}'
+                 for bound, count in zip(BUCKETS, self.counts)]
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}')
+        braces = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_sum{braces} {self.sum}')
+        lines.append(f'{name}_count{braces} {self.count}')
+        return lines
+
+
+class GradingMetrics:
+    """
+    Counters and histograms of one grading run, safe to update from the
+    grading loop while the HTTP server and file writer read them.
+
+    Workers do not report when they pick up a notebook, so the number of
+    busy workers is the number of notebooks not yet finished, capped at
+    `slots` (workers, or the async backend's concurrency), and the rest are
+    counted as queued.
+    """
+
+    def __init__(self, total, pending, slots):
+        self.total = total
+        self.pending = pending
+        self.slots = slots
+        self.resumed = total - pending
+        self.started = time.time()
+        self.finished = None
+        self.statuses = {}
+        self.cache = {'hit': 0, 'miss': 0}
+        self.notebook_seconds = Histogram()
+        self.phase_seconds = {}
+        self._lock = threading.Lock()
+
+    def observe(self, status, seconds=None, timing=None, cache=None):
+        """Records one graded notebook."""
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if cache in self.cache:
+                self.cache[cache] += 1
+            if seconds is not None:
+                self.notebook_seconds.observe(seconds)
+            for name, phase in (timing or {}).get('phases', {}).items():
+                self.phase_seconds.setdefault(name, Histogram()).observe(phase['wall'])
+
+    def finish(self):
+        """Marks the run as finished, freezing elapsed time and ETA."""
+        with self._lock:
+            self.finished = time.time()
+
+    def render(self):
+        """
+        Returns:
+            str: The metrics in Prometheus text exposition format
+        """
+        with self._lock:
+            graded = sum(self.statuses.values())
+            in_flight = self.pending - graded
+            busy = min(in_flight, self.slots)
+            elapsed = (self.finished or time.time()) - self.started
+            rate = graded / elapsed if elapsed > 0 else 0.0
+            eta = in_flight / rate if rate > 0 else None
+            lookups = self.cache['hit'] + self.cache['miss']
+            hit_ratio = self.cache['hit'] / lookups if lookups else 0.0
+
+            lines = []
+
+            def metric(name, kind, help_text, samples):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                lines.extend(samples)
+
+            metric('autograder_notebooks', 'gauge', "Notebooks in this run",
+                   [f'autograder_notebooks {self.total}'])
+            metric('autograder_notebooks_resumed', 'gauge',
+                   "Notebooks restored from the progress journal",
+                   [f'autograder_notebooks_resumed {self.resumed}'])
+            metric('autograder_notebooks_graded_total', 'counter',
+                   "Notebooks graded, by CSV status (ok, timeout, error, ...)",
+                   [f'autograder_notebooks_graded_total{{status="{status}"}} {count}'
+                    for status, count in sorted(self.statuses.items())])
+            metric('autograder_notebooks_failed_total', 'counter',
+                   "Notebooks graded with zeros",
+                   [f'autograder_notebooks_failed_total {graded - self.statuses.get("ok", 0)}'])
+            metric('autograder_notebooks_timed_out_total', 'counter',
+                   "Notebooks that timed out",
+                   [f'autograder_notebooks_timed_out_total {self.statuses.get("timeout", 0)}'])
+            metric('autograder_notebooks_remaining', 'gauge', "Notebooks not graded yet",
+                   [f'autograder_notebooks_remaining {in_flight}'])
+            metric('autograder_workers', 'gauge', "Notebooks that can be graded at once",
+                   [f'autograder_workers {self.slots}'])
+            metric('autograder_busy_workers', 'gauge', "Workers grading a notebook",
+                   [f'autograder_busy_workers {busy}'])
+            metric('autograder_queue_depth', 'gauge', "Notebooks waiting for a worker",
+                   [f'autograder_queue_depth {in_flight - busy}'])
+            metric('autograder_cache_hits_total', 'counter', "Result cache hits",
+                   [f'autograder_cache_hits_total {self.cache["hit"]}'])
+            metric('autograder_cache_misses_total', 'counter', "Result cache misses",
+                   [f'autograder_cache_misses_total {self.cache["miss"]}'])
+            metric('autograder_cache_hit_ratio', 'gauge', "Result cache hits per lookup",
+                   [f'autograder_cache_hit_ratio {hit_ratio}'])
+            metric('autograder_elapsed_seconds', 'gauge', "Seconds since the run started",
+                   [f'autograder_elapsed_seconds {elapsed}'])
+            metric('autograder_notebooks_per_second', 'gauge', "Notebooks graded per second",
+                   [f'autograder_notebooks_per_second {rate}'])
+            metric('autograder_eta_seconds', 'gauge',
+                   "Estimated seconds until the run finishes (NaN before the first result)",
+                   [f'autograder_eta_seconds {"NaN" if eta is None else eta}'])
+            metric('autograder_notebook_seconds', 'histogram', "Seconds grading one notebook",
+                   self.notebook_seconds.lines('autograder_notebook_seconds'))
+            names = [name for name in PHASES if name in self.phase_seconds]
+            names += sorted(set(self.phase_seconds) - set(PHASES))
+            samples = []
+            for name in names:
+                samples += self.phase_seconds[name].lines('autograder_phase_seconds',
+                                                          f'phase="{name}"')
+            metric('autograder_phase_seconds', 'histogram',
+                   "Seconds spent in each grading phase", samples)
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsExporter:
+    """
+    Publishes a GradingMetrics while a run is in progress: served at
+    http://<address>:<port>/metrics if `port` is set, and written to `path`
+    every `interval` seconds (and once more when stopped) if `path` is set.
+    """
+
+    def __init__(self, metrics, port=None, address='127.0.0.1', path=None, interval=10):
+        self.metrics = metrics
+        self.port = port
+        self.address = address
+        self.path = path
+        self.interval = interval
+        self._server = None
+        self._stop = threading.Event()
+        self._writer = None
+
+    def start(self):
+        """Starts the HTTP server and the file writer in background threads."""
+        if self.port is not None:
+            metrics = self.metrics
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split('?')[0] not in ('/', '/metrics'):
+                        self.send_error(404)
+                        return
+                    body = metrics.render().encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', CONTENT_TYPE)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((self.address, self.port), Handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        if self.path is not None:
+            self._writer = threading.Thread(target=self._write_periodically, daemon=True)
+            self._writer.start()
+        return self
+
+    def write(self):
+        """Rewrites the metrics file atomically, so readers never see half of it."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        partial = self.path + '.tmp'
+        with open(partial, 'w', encoding='utf-8') as f:
+            f.write(self.metrics.render())
+        os.replace(partial, self.path)
+
+    def _write_periodically(self):
+        while True:
+            try:
+                self.write()
+            except OSError:
+                pass
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self):
+        """Stops serving and writes the final metrics file."""
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join()
+            self.write()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Output flood protection for the CS3 Autograder
+Caps the stream output kept per cell and per notebook, spilling the excess
+to a side file so a `while True: print(...)` cannot exhaust memory or bloat
+the executed notebook
+"""
+
+import io
+import os
+
+SPILL_BATCH_SIZE = 1 << 20   # characters of overflow buffered per spill file write
+
+
+class OutputLimiter:
+    """
+    Tracks the stream output (stdout/stderr) of one notebook.
+
+    The first `cell_limit` characters of each cell are kept, up to
+    `notebook_limit` characters for the whole notebook. Past either limit,
+    output is appended to `spill_path` instead, and only the last
+    `tail_size` characters of each stream are held in memory. When the cell
+    finishes, a truncation marker and that tail are added to its outputs, so
+    the last lines a cell printed (such as the autograder's CSV line) are
+    always kept.
+    """
+
+    def __init__(self, cell_limit, notebook_limit, tail_size, spill_path=None):
+        self.cell_limit = cell_limit
+        self.notebook_limit = notebook_limit
+        self.tail_size = tail_size
+        self.spill_path = spill_path
+        self.notebook_chars = 0
+        self.truncated_chars = 0
+        self._spill = None
+        self._pending = []
+        self._pending_chars = 0
+        self.start_cell(None)
+        # Don't leave the overflow of an earlier run next to this one
+        if spill_path and os.path.exists(spill_path):
+            os.remove(spill_path)
+
+    def start_cell(self, cell_index):
+        """Starts counting the output of a new cell."""
+        self.cell_index = cell_index
+        self.cell_chars = 0
+        self._tails = {}
+        self._tail_chars = {}
+        self._dropped = {}
+
+    def write(self, name, text):
+        """
+        Accounts for `text` written to stream `name` by the current cell.
+
+        Returns:
+            str: The part of `text` to keep in the notebook (may be empty)
+        """
+        if self._dropped:
+            # Already over a limit: nothing more is kept, so only buffer it
+            self._overflow(name, text)
+            return ''
+
+        room = min(self.cell_limit - self.cell_chars,
+                   self.notebook_limit - self.notebook_chars)
+        if len(text) <= room:
+            self.cell_chars += len(text)
+            self.notebook_chars += len(text)
+            return text
+
+        # Keep what still fits (only until the first truncation in the cell)
+        keep = text[:max(room, 0)]
+        self.cell_chars += len(keep)
+        self.notebook_chars += len(keep)
+        self._overflow(name, text[len(keep):])
+        return keep
+
+    def end_cell(self):
+        """
+        Finishes the current cell.
+
+        Returns:
+            list: Stream output dicts (marker and tail) to append to the
+            cell's outputs, empty if nothing was truncated
+        """
+        self._flush_spill()
+        outputs = []
+        where = f"; full output in {os.path.basename(self.spill_path)}" if self.spill_path else ""
+        for name, dropped in self._dropped.items():
+            tail = ''.join(self._tails[name])[-self.tail_size:]
+            # Drop the partial line at the start of a cut tail
+            if len(tail) >= self.tail_size and '\n' in tail:
+                tail = tail[tail.index('\n') + 1:]
+            outputs.append({
+                'output_type': 'stream',
+                'name': name,
+                'text': f"\n[... {dropped} characters of output truncated{where} ...]\n" + tail,
+            })
+        self.start_cell(None)
+        return outputs
+
+    def _overflow(self, name, text):
+        """
+        Counts `text` as dropped from stream `name`, keeping it for the spill
+        file and the tail. A flooding cell sends thousands of these, so the
+        chunks are only joined when the tail grows long and written to the
+        spill file in batches of SPILL_BATCH_SIZE characters.
+        """
+        if name not in self._dropped:
+            self._dropped[name] = 0
+            self._tails[name] = []
+            self._tail_chars[name] = 0
+            self._queue_spill(f"\n===== cell {self.cell_index} ({name}) =====\n")
+        self._dropped[name] += len(text)
+        self.truncated_chars += len(text)
+        tail = self._tails[name]
+        tail.append(text)
+        self._tail_chars[name] += len(text)
+        if self._tail_chars[name] > 2 * self.tail_size:
+            joined = ''.join(tail)[-self.tail_size:]
+            self._tails[name] = [joined]
+            self._tail_chars[name] = len(joined)
+        self._queue_spill(text)
+
+    def _queue_spill(self, text):
+        if not self.spill_path or not text:
+            return
+        self._pending.append(text)
+        self._pending_chars += len(text)
+        if self._pending_chars >= SPILL_BATCH_SIZE:
+            self._flush_spill()
+
+    def _flush_spill(self):
+        if not self._pending:
+            return
+        if self._spill is None:
+            self._spill = open(self.spill_path, 'a', encoding='utf-8')
+        self._spill.write(''.join(self._pending))
+        self._pending = []
+        self._pending_chars = 0
+
+    @property
+    def spilled(self):
+        """True if any output was written to the spill file."""
+        return bool(self.spill_path) and os.path.exists(self.spill_path)
+
+    def close(self):
+        """Closes the spill file."""
+        self._flush_spill()
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+
+class LimitedWriter(io.TextIOBase):
+    """A stdout/stderr replacement that keeps only what an OutputLimiter allows."""
+
+    def __init__(self, limiter, name):
+        self.limiter = limiter
+        self.name = name
+        self._kept = io.StringIO()
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self._kept.write(self.limiter.write(self.name, text))
+        return len(text)
+
+    def getvalue(self):
+        return self._kept.getvalue()
+
+
+class OutputLimitMixin:
+    """
+    Applies an OutputLimiter to the cells run by an nbclient NotebookClient
+    (or nbconvert ExecutePreprocessor). Mix it in before the client class and
+    set `output_limiter` before executing.
+    """
+
+    output_limiter = None
+
+    def output(self, outs, msg, display_id, cell_index):
+        limiter = self.output_limiter
+        if limiter is not None and msg['msg_type'] == 'stream':
+            text = msg['content'].get('text', '')
+            keep = limiter.write(msg['content'].get('name', 'stdout'), text)
+            if not keep:
+                return None
+            if keep != text:
+                msg = dict(msg, content=dict(msg['content'], text=keep))
+        return super().output(outs, msg, display_id, cell_index)
+
+    async def async_execute_cell(self, cell, cell_index, execution_count=None,
+                                 store_history=True):
+        limiter = self.output_limiter
+        if limiter is None:
+            return await super().async_execute_cell(
+                cell, cell_index, execution_count, store_history
+            )
+        limiter.start_cell(cell_index)
+        try:
+            return await super().async_execute_cell(
+                cell, cell_index, execution_count, store_history
+            )
+        finally:
+            tail = limiter.end_cell()
+            if tail:
+                import nbformat
+                cell.outputs.extend(nbformat.from_dict(output) for output in tail)
+
+    def execute_cell(self, *args, **kwargs):
+        # NotebookClient binds its synchronous wrapper to its own coroutine
+        from jupyter_core.utils import run_sync
+        return run_sync(self.async_execute_cell)(*args, **kwargs)
+
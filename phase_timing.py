@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Per-phase timing for the CS3 Autograder
+Records the wall and CPU time of each step of grading a notebook, and of
+every cell it executes, as one JSON line per notebook
+"""
+
+import csv
+import datetime
+import json
+import math
+import os
+import time
+from contextlib import contextmanager
+
+from prescreen import SKIP_TAG
+from resource_limits import process_cpu_seconds
+
+# Phases of grading one notebook, in pipeline order
+PHASES = {
+    'read': "Reading the submission",
+    'prescreen': "Static pre-screen",
+    'inject': "Adding the autograder cell (and pruning)",
+    'kernel_start': "Starting (and reaping) the kernel or child process",
+    'execute': "Executing the student's cells",
+    'grader': "Executing the autograder cell",
+    'write': "Writing the executed notebook",
+    'extract': "Extracting the CSV line",
+}
+
+# Cell metadata key of the timing stored in executed notebooks
+CELL_METADATA_KEY = 'autograder_timing'
+
+
+class PhaseTimer:
+    """
+    Wall and CPU seconds of each phase of grading one notebook.
+
+    CPU time is that of the process doing the work: the grading worker for
+    reading, injecting, writing and extracting, and the kernel (or fork /
+    subprocess child) for the cells. It is None where it cannot be measured.
+    Cells are matched to the autograder cell through `grader_cell`, set once
+    the cell has been added.
+
+    Besides the totals per phase, every timed step is kept as a span
+    [label, start, wall], with start in seconds from `started`, for
+    timelines.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.phases = {}
+        self.cells = []
+        self.spans = []
+        self.grader_cell = None
+        self._start = time.perf_counter()
+        self._execution = None
+
+    def add(self, name, wall, cpu=None, start=None, label=None):
+        """
+        Adds time to phase `name`, as a span called `label` (default: the
+        phase name) that began at perf_counter() value `start` (default: it
+        ends now).
+        """
+        wall = max(wall, 0.0)
+        total = self.phases.setdefault(name, {'wall': 0.0, 'cpu': None})
+        total['wall'] += wall
+        if cpu is not None:
+            total['cpu'] = (total['cpu'] or 0.0) + max(cpu, 0.0)
+        if start is None:
+            start = time.perf_counter() - wall
+        self.spans.append([label or name, start - self._start, wall])
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager timing the work in this process as phase `name`."""
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - wall, time.process_time() - cpu, wall)
+
+    def add_cell(self, cell, wall, cpu=None, start=None):
+        """
+        Records one executed code cell (after its outputs are in place),
+        adding it to 'grader' or 'execute', and stores its start time,
+        duration, CPU time and output size in the cell's metadata under
+        CELL_METADATA_KEY.
+        """
+        grader = cell is self.grader_cell
+        number = len(self.cells) + 1
+        self.add('grader' if grader else 'execute', wall, cpu, start,
+                 'grader' if grader else f'cell {number}')
+        offset = self.spans[-1][1]
+        output_bytes = len(json.dumps(cell.get('outputs', [])))
+        lines = cell.source.strip().splitlines()
+        self.cells.append({
+            'cell': number,
+            'grader': grader,
+            'start': offset,
+            'wall': wall,
+            'cpu': cpu,
+            'output_bytes': output_bytes,
+            'source': 'autograder' if grader else (lines[0][:80] if lines else ''),
+        })
+        cell.metadata[CELL_METADATA_KEY] = {
+            'start': datetime.datetime.fromtimestamp(self.started + offset,
+                                                     datetime.timezone.utc).isoformat(),
+            'duration': round(wall, 6),
+            'cpu': None if cpu is None else round(cpu, 6),
+            'output_bytes': output_bytes,
+        }
+
+    def start_execution(self):
+        """Marks the start of execution: kernel start runs until the first cell."""
+        self._execution = (time.perf_counter(), time.process_time())
+
+    def kernel_ready(self):
+        """Ends the kernel start phase, the first time it is called."""
+        if self._execution is not None:
+            wall, cpu = self._execution
+            self.add('kernel_start', time.perf_counter() - wall, time.process_time() - cpu, wall)
+            self._execution = None
+
+    def stop_execution(self):
+        """Counts a kernel that never ran a cell as kernel start time."""
+        self.kernel_ready()
+
+    def record(self, **fields):
+        """
+        Returns:
+            dict: The JSON-lines record for this notebook: `fields` plus the
+            start time, total wall seconds, phases, cells and spans
+        """
+        return {
+            **fields,
+            'started': self.started,
+            'wall': time.perf_counter() - self._start,
+            'phases': self.phases,
+            'cells': self.cells,
+            'spans': self.spans,
+        }
+
+
+class PhaseTimingMixin:
+    """
+    Times the cells run by an nbclient NotebookClient (or nbconvert
+    ExecutePreprocessor) into `phase_timer`. Cell CPU time is read from the
+    kernel process where /proc is available. If `usage_monitor` (a
+    resource_usage.UsageMonitor) is set, it is attached to the kernel when
+    the first cell runs and sampled after every cell. Mix it in before the
+    client class and set `phase_timer` before executing.
+    """
+
+    phase_timer = None
+    usage_monitor = None
+
+    def _kernel_pid(self):
+        process = getattr(getattr(self.km, 'provisioner', None), 'process', None)
+        return None if process is None else process.pid
+
+    def _kernel_cpu(self):
+        pid = self._kernel_pid()
+        return None if pid is None else process_cpu_seconds(pid)
+
+    async def async_execute_cell(self, cell, cell_index, execution_count=None,
+                                 store_history=True):
+        timer = self.phase_timer
+        if timer is None or cell.cell_type != 'code' or not cell.source.strip() or (
+                SKIP_TAG in cell.metadata.get('tags', [])):
+            return await super().async_execute_cell(
+                cell, cell_index, execution_count, store_history
+            )
+        timer.kernel_ready()
+        monitor = self.usage_monitor
+        if monitor is not None and self._kernel_pid() is not None:
+            # The kernel may have run other notebooks before (kernel pool)
+            monitor.attach(self._kernel_pid(), reset_peak=True)
+        cpu = self._kernel_cpu()
+        start = time.perf_counter()
+        try:
+            return await super().async_execute_cell(
+                cell, cell_index, execution_count, store_history
+            )
+        finally:
+            used = self._kernel_cpu()
+            if monitor is not None:
+                monitor.sample()
+            timer.add_cell(cell, time.perf_counter() - start,
+                           None if cpu is None or used is None else used - cpu, start)
+
+
+def child_cpu_seconds():
+    """User and system CPU seconds of this process's finished (reaped) children."""
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+def percentile(values, fraction):
+    """The nearest-rank percentile of a list of numbers, or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(len(ordered) * fraction)) - 1]
+
+
+def phase_summary(records):
+    """
+    Aggregates the phases of many notebooks.
+
+    Returns:
+        list: (phase, count, p50, p95, p99, max, total wall, total CPU) for
+        every phase that occurred, in pipeline order
+    """
+    rows = []
+    names = list(PHASES) + sorted({name for record in records for name in record['phases']}
+                                  - set(PHASES))
+    for name in names:
+        timings = [record['phases'][name] for record in records if name in record['phases']]
+        if not timings:
+            continue
+        walls = [timing['wall'] for timing in timings]
+        cpus = [timing['cpu'] for timing in timings if timing['cpu'] is not None]
+        rows.append((name, len(walls), percentile(walls, 0.5), percentile(walls, 0.95),
+                     percentile(walls, 0.99), max(walls), sum(walls),
+                     sum(cpus) if cpus else None))
+    return rows
+
+
+def print_phase_summary(records):
+    """Prints per-phase percentiles of wall time over the notebooks in `records`."""
+    rows = phase_summary(records)
+    if not rows:
+        return
+    print(f"Phase timings over {len(records)} notebook(s), seconds:")
+    print(f"  {'phase':<13}{'n':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+          f"{'total':>10}{'cpu':>10}")
+    for name, count, p50, p95, p99, peak, wall, cpu in rows:
+        print(f"  {name:<13}{count:>5}{p50:>9.3f}{p95:>9.3f}{p99:>9.3f}{peak:>9.3f}"
+              f"{wall:>10.2f}{'-' if cpu is None else f'{cpu:.2f}':>10}")
+
+
+def slowest_cells(records, count, grader=False):
+    """
+    Ranks the executed cells of a whole cohort by wall time: the students'
+    cells, or with `grader` the autograder cells only.
+
+    Returns:
+        list: Up to `count` (filename, cell record) pairs, slowest first
+    """
+    cells = [(record['filename'], cell) for record in records for cell in record['cells']
+             if cell['grader'] == grader]
+    cells.sort(key=lambda item: item[1]['wall'], reverse=True)
+    return cells[:count]
+
+
+def print_slowest_cells(records, count):
+    """
+    Prints the `count` slowest student cells of the cohort, followed by the
+    percentiles of the autograder cell, which runs in every notebook and
+    would otherwise crowd them out.
+    """
+    ranked = slowest_cells(records, count)
+    if ranked:
+        print(f"Slowest student cells of {len(records)} notebook(s):")
+        print(f"  {'wall s':>8}{'cpu s':>8}{'out KB':>8}  cell  notebook / first line")
+        for filename, cell in ranked:
+            cpu = '-' if cell['cpu'] is None else f"{cell['cpu']:.2f}"
+            print(f"  {cell['wall']:>8.2f}{cpu:>8}{cell['output_bytes'] / 1024:>8.1f}  "
+                  f"{cell['cell']:>4}  {filename}")
+            print(f"{'':>34}{cell['source']}")
+    graders = [cell['wall'] for _, cell in slowest_cells(records, None, grader=True)]
+    if graders:
+        print(f"Autograder cell over {len(graders)} notebook(s): "
+              f"p50 {percentile(graders, 0.5):.2f}s, p95 {percentile(graders, 0.95):.2f}s, "
+              f"max {max(graders):.2f}s")
+
+
+def write_cell_timings(path, records):
+    """
+    Writes every executed cell of a run, slowest first, to a CSV file.
+
+    Returns:
+        int: Number of cells written
+    """
+    ranked = slowest_cells(records, None) + slowest_cells(records, None, grader=True)
+    ranked.sort(key=lambda item: item[1]['wall'], reverse=True)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['rank', 'filename', 'status', 'cell', 'autograder', 'start',
+                         'wall', 'cpu', 'output_bytes', 'first_line'])
+        statuses = {record['filename']: record.get('status') for record in records}
+        for rank, (filename, cell) in enumerate(ranked, 1):
+            writer.writerow([rank, filename, statuses[filename], cell['cell'], cell['grader'],
+                             f"{cell['start']:.3f}", f"{cell['wall']:.4f}",
+                             '' if cell['cpu'] is None else f"{cell['cpu']:.4f}",
+                             cell['output_bytes'], cell['source']])
+    return len(ranked)
+
+
+class TimingLog:
+    """
+    A JSON-lines file with the timing record of every notebook graded in a
+    run, appended as each notebook finishes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def reset(self):
+        """Starts a new, empty log."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8'):
+            pass
+
+    def append(self, record):
+        """Adds one notebook's timing record."""
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Static pre-screen for the CS3 Autograder
+Parses a notebook's code cells with `ast`, without running them, to find the
+student's details and the graded classes and methods the notebook defines,
+so submissions that cannot score are graded zero without being executed
+"""
+
+import ast
+import re
+import textwrap
+
+from result_cache import GRADER_MARKER
+
+STUDENT_FIELDS = ('first_name', 'last_name', 'student_id')
+
+# Lines only IPython understands: magics, shell escapes (also `x = !cmd`),
+# pasted prompts and `obj?` help
+IPYTHON_LINE = re.compile(r'^\s*(?:[%!]|>>> |[\w.,\s]*=\s*[%!])|\?\s*$')
+
+# Calls through which a notebook can define names the pre-screen cannot see
+DYNAMIC_CALLS = {'exec', 'eval', 'globals', 'locals', 'vars', 'setattr', '__import__'}
+
+# Nbclient keeps executing after errors in cells with this tag
+RAISES_EXCEPTION_TAG = 'raises-exception'
+
+# Cell tag nbclient (and the kernel-less backends) skip
+SKIP_TAG = 'skip-execution'
+
+
+def is_ipython_line(line):
+    """True if a source line uses syntax that only IPython understands."""
+    return bool(IPYTHON_LINE.search(line))
+
+
+def parse_cell(source):
+    """
+    Parses a code cell as IPython would see it.
+
+    Returns:
+        tuple: (ast.Module or None, SyntaxError or None). Both are None for a
+        cell that uses IPython syntax, which cannot be checked statically.
+    """
+    try:
+        return ast.parse(source), None
+    except (SyntaxError, ValueError) as e:
+        error = e
+    if any(is_ipython_line(line) for line in source.splitlines()):
+        return None, None
+    try:
+        # IPython removes the indentation of a cell's first line
+        return ast.parse(textwrap.dedent(source)), None
+    except (SyntaxError, ValueError):
+        return None, error
+
+
+def _code_cells(notebook):
+    """
+    Yields (source, tags) for every student code cell of a notebook that is
+    executed (cells tagged skip-execution never run).
+    """
+    for cell in notebook.get('cells', []):
+        if cell.get('cell_type') != 'code':
+            continue
+        tags = cell.get('metadata', {}).get('tags', [])
+        if SKIP_TAG in tags:
+            continue
+        source = cell.get('source', '')
+        if isinstance(source, list):
+            source = ''.join(source)
+        if GRADER_MARKER in source:
+            continue
+        yield source, tags
+
+
+def _literal(node):
+    """The value of a literal expression as a string, or None."""
+    try:
+        return str(ast.literal_eval(node))
+    except (ValueError, TypeError, SyntaxError, RecursionError):
+        return None
+
+
+def _student_assignments(statements, student):
+    """Records `first_name = "..."` style literal assignments in `student`."""
+    for node in statements:
+        if isinstance(node, ast.Assign):
+            targets, value = node.targets, node.value
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets, value = [node.target], node.value
+        else:
+            continue
+        for target in targets:
+            if isinstance(target, ast.Name) and target.id in STUDENT_FIELDS:
+                literal = _literal(value)
+                if literal is not None:
+                    student[target.id] = literal
+            elif (isinstance(target, ast.Tuple) and isinstance(value, ast.Tuple)
+                  and len(target.elts) == len(value.elts)):
+                # first_name, last_name = "Ada", "Lovelace"
+                _student_assignments(
+                    [ast.Assign([t], v) for t, v in zip(target.elts, value.elts)], student
+                )
+
+
+def _scrape_student_lines(source, student):
+    """Finds student details line by line in a cell that does not parse."""
+    for line in source.splitlines():
+        if '=' in line and any(field in line for field in STUDENT_FIELDS):
+            try:
+                _student_assignments(ast.parse(line.strip()).body, student)
+            except (SyntaxError, ValueError):
+                pass
+
+
+def student_info(notebook):
+    """
+    Finds the literal first_name, last_name and student_id assignments of a
+    notebook. Later assignments win, as they would when the cells run.
+
+    Returns:
+        dict: The fields that were found, as strings
+    """
+    student = {}
+    for source, _ in _code_cells(notebook):
+        tree, _ = parse_cell(source)
+        if tree is not None:
+            _student_assignments(tree.body, student)
+        else:
+            _scrape_student_lines(source, student)
+    return student
+
+
+def _class_definitions(trees, class_name):
+    """
+    Describes how a class is defined across a notebook's cells.
+
+    Returns:
+        dict: 'defined' (bool), 'methods' (set of method names) and 'opaque'
+        (True if the class may get methods the pre-screen cannot see, e.g.
+        from a base class or because the name is bound by an import)
+    """
+    info = {'defined': False, 'methods': set(), 'opaque': False}
+    for tree in trees:
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ClassDef) and node.name == class_name:
+                info['defined'] = True
+                if node.bases or node.keywords or node.decorator_list:
+                    info['opaque'] = True
+                for item in node.body:
+                    if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                        info['methods'].add(item.name)
+                    elif isinstance(item, ast.Assign):
+                        info['methods'].update(
+                            t.id for t in item.targets if isinstance(t, ast.Name)
+                        )
+                if info['methods'] & {'__getattr__', '__getattribute__'}:
+                    info['opaque'] = True
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and (
+                    node.name == class_name):
+                info['defined'] = info['opaque'] = True
+            elif isinstance(node, ast.Name) and node.id == class_name and (
+                    isinstance(node.ctx, ast.Store)):
+                info['defined'] = info['opaque'] = True
+            elif isinstance(node, (ast.Import, ast.ImportFrom)) and any(
+                    (alias.asname or alias.name) == class_name for alias in node.names):
+                info['defined'] = info['opaque'] = True
+            elif (isinstance(node, ast.Attribute) and isinstance(node.ctx, ast.Store)
+                  and isinstance(node.value, ast.Name) and node.value.id == class_name):
+                # GraphAL.is_isolated = is_isolated
+                info['methods'].add(node.attr)
+    return info
+
+
+def is_dynamic(trees):
+    """True if a notebook can define names in ways ast cannot follow."""
+    for tree in trees:
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and (
+                    node.func.id in DYNAMIC_CALLS):
+                return True
+            if isinstance(node, ast.ImportFrom) and any(a.name == '*' for a in node.names):
+                return True
+    return False
+
+
+def _describe_unscorable(name, info, required):
+    """Explains why a class cannot score."""
+    if not info['defined']:
+        return f"{name} is not defined"
+    missing = [method for method in required['setup'] if method not in info['methods']]
+    if missing:
+        return f"{name} has no {', '.join(missing)}"
+    return f"{name} defines none of the graded methods"
+
+
+def prescreen(notebook, graded_classes):
+    """
+    Checks statically whether a notebook can score any points.
+
+    A notebook cannot score if a student cell has a syntax error (execution
+    stops there, before the autograder cell), or if none of the graded
+    classes has the methods the autograder needs to build its test graphs
+    plus at least one graded method. Notebooks using IPython syntax, exec()
+    and the like, star imports, or classes with bases are given the benefit
+    of the doubt.
+
+    Args:
+        notebook: Notebook dictionary (or NotebookNode)
+        graded_classes: Class name -> {'setup': methods needed to build test
+            graphs, 'graded': methods the autograder scores}
+
+    Returns:
+        dict: 'student' (see student_info()), 'classes' (class name ->
+        {'defined', 'methods', 'opaque', 'can_score'}) and 'reason', a
+        description of why the notebook cannot score or None if it might
+    """
+    trees = []
+    reason = None
+    dynamic = False
+    for number, (source, tags) in enumerate(_code_cells(notebook), 1):
+        tree, error = parse_cell(source)
+        if tree is not None:
+            trees.append(tree)
+            continue
+        # A magic such as %run can define anything
+        dynamic = True
+        if error is not None and reason is None and RAISES_EXCEPTION_TAG not in tags:
+            message = getattr(error, 'msg', None) or str(error)
+            where = f"line {error.lineno}: " if getattr(error, 'lineno', None) else ""
+            reason = f"cell {number} has a syntax error ({where}{message})"
+    dynamic = dynamic or is_dynamic(trees)
+
+    classes = {}
+    for name, required in graded_classes.items():
+        info = _class_definitions(trees, name)
+        classes[name] = info
+        info['can_score'] = info['opaque'] or (
+            info['defined']
+            and all(method in info['methods'] for method in required['setup'])
+            and any(method in info['methods'] for method in required['graded'])
+        )
+
+    if reason is None and not dynamic and not any(i['can_score'] for i in classes.values()):
+        reason = "; ".join(
+            _describe_unscorable(name, classes[name], required)
+            for name, required in graded_classes.items()
+        )
+    return {'student': student_info(notebook), 'classes': classes, 'reason': reason}
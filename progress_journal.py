@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Append-only progress journal for the CS3 Autograder
+Records every graded notebook as soon as it finishes so an interrupted run
+can be resumed without grading those notebooks again
+"""
+
+import json
+import os
+
+
+class ProgressJournal:
+    """
+    A JSON-lines file with one record per graded notebook.
+
+    Each record is flushed and fsync'd before the next notebook is
+    recorded, so after a crash or reboot the journal holds every result
+    that was reported. A partly written last line is discarded on load.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @staticmethod
+    def fingerprint(notebook_path):
+        """Returns the (mtime, size) used to tell if a notebook changed."""
+        stat = os.stat(notebook_path)
+        return stat.st_mtime, stat.st_size
+
+    def reset(self):
+        """Starts a new, empty journal."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8'):
+            pass
+
+    def load(self):
+        """
+        Reads the journal, dropping a partly written last line so that new
+        records are appended after the last complete one.
+
+        Returns:
+            dict: filename -> latest record for that notebook
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return {}
+
+        complete = data[:data.rfind(b'\n') + 1]
+        if len(complete) != len(data):
+            # Interrupted while writing the last line
+            with open(self.path, 'r+b') as f:
+                f.truncate(len(complete))
+
+        records = {}
+        for line in complete.decode('utf-8').splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records[record['filename']] = record
+        return records
+
+    def is_current(self, record, notebook_path):
+        """True if a journaled notebook has not changed since it was graded."""
+        try:
+            mtime, size = self.fingerprint(notebook_path)
+        except OSError:
+            return False
+        return record.get('mtime') == mtime and record.get('size') == size
+
+    def append(self, notebook_path, result):
+        """
+        Durably records the result of grading one notebook, with its timing
+        and resource usage so a resumed run can still report them.
+        """
+        try:
+            mtime, size = self.fingerprint(notebook_path)
+        except OSError:
+            mtime, size = None, None
+        record = {
+            'filename': result['filename'],
+            'success': result['success'],
+            'csv_line': result['csv_line'],
+            'error': result['error'],
+            'seconds': result.get('seconds'),
+            'timing': result.get('timing'),
+            'usage': result.get('usage'),
+            'mtime': mtime,
+            'size': size,
+        }
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Resource limits for the CS3 Autograder
+Runs student code under memory, CPU time, process and open file limits, using
+a cgroup v2 group where one is configured and rlimits otherwise
+
+Kernels are started through this module as a command prefix:
+    python resource_limits.py --memory-mb 4096 ... -- python -m ipykernel_launcher -f ...
+which applies the limits and then exec()s the kernel in the same process.
+"""
+
+import argparse
+import os
+import signal
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Failure reasons for notebooks that broke a limit, by CSV status
+BREACH_MESSAGES = {
+    'memory_limit': "Memory limit exceeded",
+    'cpu_limit': "CPU time limit exceeded",
+    'process_limit': "Process limit exceeded",
+    'open_file_limit': "Open file limit exceeded",
+}
+
+# Where cgroup v1 controllers are mounted, one directory per hierarchy
+CGROUP_V1_MOUNT = '/sys/fs/cgroup'
+
+
+def _lower_limit(which, soft, hard=None):
+    """Lowers an rlimit, never above the current hard limit."""
+    current_soft, current_hard = resource.getrlimit(which)
+    if hard is None:
+        hard = current_hard
+    elif current_hard != resource.RLIM_INFINITY:
+        hard = min(hard, current_hard)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(which, (soft, hard))
+
+
+def _user_task_count():
+    """
+    Counts the processes and threads of the current user, which count
+    towards RLIMIT_NPROC. Returns None where /proc is not available.
+    """
+    uid = os.getuid()
+    try:
+        pids = [name for name in os.listdir('/proc') if name.isdigit()]
+    except OSError:
+        return None
+    count = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status', encoding='utf-8') as f:
+                fields = dict(line.split(':', 1) for line in f if ':' in line)
+            if int(fields['Uid'].split()[0]) == uid:
+                count += int(fields['Threads'])
+        except (OSError, KeyError, ValueError):
+            continue
+    return count
+
+
+def pids_cgroup_root():
+    """
+    The directory of this process's cgroup in a cgroup v1 hierarchy with
+    the pids controller, if the grader may create groups in it (e.g. as
+    root in a container). Returns None otherwise, including on cgroup v2,
+    where RESOURCE_CGROUP_ROOT has to be delegated instead.
+    """
+    try:
+        with open('/proc/self/cgroup', encoding='utf-8') as f:
+            for line in f:
+                _, controllers, path = line.rstrip('\n').split(':', 2)
+                if 'pids' in controllers.split(','):
+                    root = os.path.normpath(os.path.join(CGROUP_V1_MOUNT, controllers, path.lstrip('/')))
+                    if os.path.isdir(root) and os.access(root, os.W_OK):
+                        return root
+                    return None
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def process_cpu_seconds(pid):
+    """CPU time used so far by process `pid`, or None if unknown."""
+    try:
+        with open(f'/proc/{pid}/stat', encoding='utf-8') as f:
+            # Fields after the command name, which may contain spaces
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class ResourceLimits:
+    """
+    Limits for one kernel or forked grading child. A limit of None is not
+    enforced.
+
+    With `cgroup_root` (a cgroup v2 directory the grader may write to),
+    memory and process limits are enforced by a cgroup per kernel, which
+    counts resident memory and only the kernel's own processes. Without
+    it, the process limit still uses a cgroup (pids.max) where a cgroup v1
+    pids hierarchy is writable, and memory is limited by address space
+    (RLIMIT_AS).
+
+    Failing both, processes are limited by RLIMIT_NPROC, which is only
+    best-effort: it counts all of the user's processes, so it is set to the
+    count when the kernel starts plus `max_processes` (kernels started
+    earlier can be starved by later ones), and it does not apply to root.
+    """
+
+    def __init__(self, memory_mb=None, cpu_seconds=None, max_processes=None,
+                 max_open_files=None, cgroup_root=None):
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.max_processes = max_processes
+        self.max_open_files = max_open_files
+        self.cgroup_root = cgroup_root
+
+    @property
+    def enabled(self):
+        """True if any limit is set and this platform supports rlimits."""
+        limits = (self.memory_mb, self.cpu_seconds, self.max_processes, self.max_open_files)
+        return resource is not None and any(limit is not None for limit in limits)
+
+    def to_args(self):
+        """Returns the command line options that recreate these limits."""
+        args = []
+        for option, value in (('--memory-mb', self.memory_mb),
+                              ('--cpu-seconds', self.cpu_seconds),
+                              ('--max-processes', self.max_processes),
+                              ('--max-open-files', self.max_open_files),
+                              ('--cgroup-root', self.cgroup_root)):
+            if value is not None:
+                args += [option, str(value)]
+        return args
+
+    def wrap(self, cmd):
+        """Prefixes a kernel command line so the kernel runs under these limits."""
+        if not self.enabled:
+            return cmd
+        return [sys.executable, os.path.abspath(__file__)] + self.to_args() + ['--'] + cmd
+
+    def cgroup_dir(self, pid):
+        """The cgroup used for process `pid`, if cgroups are configured."""
+        if not self.cgroup_root:
+            return None
+        return os.path.join(self.cgroup_root, f'autograder-{pid}')
+
+    def pids_cgroup_dir(self, pid):
+        """The cgroup v1 pids group used for process `pid`, if one can be."""
+        if self.cgroup_root or self.max_processes is None:
+            return None
+        root = pids_cgroup_root()
+        return None if root is None else os.path.join(root, f'autograder-{pid}')
+
+    def _join_pids_cgroup(self):
+        """
+        Moves the current process into a new cgroup v1 pids group limited
+        to `max_processes`. Returns False if that is not possible here.
+        """
+        path = self.pids_cgroup_dir(os.getpid())
+        if path is None:
+            return False
+        try:
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, 'pids.max'), 'w') as f:
+                f.write(str(self.max_processes))
+            with open(os.path.join(path, 'cgroup.procs'), 'w') as f:
+                f.write('0')
+            return True
+        except OSError:
+            try:
+                os.rmdir(path)
+            except OSError:
+                pass
+            return False
+
+    def process_limit_enforced(self):
+        """
+        True unless the process limit falls back to RLIMIT_NPROC while
+        running as root, which it does not apply to.
+        """
+        if self.max_processes is None or self.cgroup_root:
+            return True
+        if pids_cgroup_root() is not None:
+            return True
+        return not hasattr(os, 'getuid') or os.getuid() != 0
+
+    def _join_cgroup(self):
+        """
+        Moves the current process into a new cgroup with the memory and
+        process limits. Returns False if that is not possible here.
+        """
+        path = self.cgroup_dir(os.getpid())
+        if path is None or (self.memory_mb is None and self.max_processes is None):
+            return False
+        try:
+            os.makedirs(path, exist_ok=True)
+            settings = []
+            if self.memory_mb is not None:
+                settings += [('memory.max', self.memory_mb * 1024 * 1024), ('memory.swap.max', 0)]
+            if self.max_processes is not None:
+                settings.append(('pids.max', self.max_processes))
+            for name, value in settings:
+                with open(os.path.join(path, name), 'w') as f:
+                    f.write(str(value))
+            with open(os.path.join(path, 'cgroup.procs'), 'w') as f:
+                f.write('0')
+            return True
+        except OSError:
+            try:
+                os.rmdir(path)
+            except OSError:
+                pass
+            return False
+
+    def apply(self):
+        """Applies the limits to the current process and its future children."""
+        if not self.enabled:
+            return
+        in_cgroup = self._join_cgroup()
+        if self.memory_mb is not None and not in_cgroup:
+            _lower_limit(resource.RLIMIT_AS, self.memory_mb * 1024 * 1024,
+                         self.memory_mb * 1024 * 1024)
+            # Each malloc arena reserves address space; keep them few so
+            # threads don't use up the limit without allocating anything
+            os.environ.setdefault('MALLOC_ARENA_MAX', '2')
+        if self.cpu_seconds is not None:
+            # Only the soft limit (SIGXCPU), so renew_cpu() can raise it again
+            used = process_cpu_seconds(os.getpid()) or 0
+            _lower_limit(resource.RLIMIT_CPU, int(used) + self.cpu_seconds)
+        if self.max_processes is not None and not in_cgroup and not self._join_pids_cgroup():
+            count = _user_task_count()
+            if count is not None:
+                limit = count + self.max_processes
+                _lower_limit(resource.RLIMIT_NPROC, limit, limit)
+        if self.max_open_files is not None:
+            _lower_limit(resource.RLIMIT_NOFILE, self.max_open_files, self.max_open_files)
+
+    def can_renew_cpu(self):
+        """True if a running kernel's CPU allowance can be renewed (Linux)."""
+        return hasattr(resource, 'prlimit') and os.path.exists('/proc/self/stat')
+
+    def renew_cpu(self, pid):
+        """
+        Gives a reused kernel a fresh CPU time allowance for its next
+        notebook, since RLIMIT_CPU counts the whole life of the process.
+
+        Returns:
+            bool: True if the allowance was renewed (or there is no CPU limit)
+        """
+        if self.cpu_seconds is None or not self.enabled:
+            return True
+        if not self.can_renew_cpu():
+            return False
+        used = process_cpu_seconds(pid)
+        if used is None:
+            return False
+        try:
+            _, hard = resource.prlimit(pid, resource.RLIMIT_CPU)
+            soft = int(used) + self.cpu_seconds
+            if hard != resource.RLIM_INFINITY:
+                soft = min(soft, hard)
+            resource.prlimit(pid, resource.RLIMIT_CPU, (soft, hard))
+            return True
+        except OSError:
+            return False
+
+    def release(self, pid):
+        """
+        Removes the cgroups of a finished process.
+
+        Returns:
+            bool: True if the cgroup killed the process for using too much memory
+        """
+        pids_path = self.pids_cgroup_dir(pid)
+        if pids_path is not None:
+            try:
+                os.rmdir(pids_path)
+            except OSError:
+                pass
+        path = self.cgroup_dir(pid)
+        if path is None or not os.path.isdir(path):
+            return False
+        oom_killed = False
+        try:
+            with open(os.path.join(path, 'memory.events'), encoding='utf-8') as f:
+                for line in f:
+                    name, _, value = line.partition(' ')
+                    if name == 'oom_kill' and int(value) > 0:
+                        oom_killed = True
+        except (OSError, ValueError):
+            pass
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+        return oom_killed
+
+    def breach(self, error_name=None, error_value=None, exit_code=None, oom_killed=False):
+        """
+        Works out whether a failure was caused by one of the limits.
+
+        Args:
+            error_name: Exception class name of the error the notebook raised
+            error_value: Its message
+            exit_code: Exit code of the kernel or child if it died (negative
+                for a signal, as with subprocess)
+            oom_killed: True if the cgroup killed it for using too much memory
+
+        Returns:
+            str: A key of BREACH_MESSAGES, or None
+        """
+        if not self.enabled:
+            return None
+        error_value = error_value or ''
+        if self.memory_mb is not None and (oom_killed or error_name == 'MemoryError'):
+            return 'memory_limit'
+        if self.cpu_seconds is not None and exit_code == -signal.SIGXCPU:
+            return 'cpu_limit'
+        if self.max_processes is not None and (
+                error_name == 'BlockingIOError' or 'Resource temporarily unavailable' in error_value
+                or "can't start new thread" in error_value):
+            return 'process_limit'
+        if self.max_open_files is not None and 'Too many open files' in error_value:
+            return 'open_file_limit'
+        return None
+
+
+def main():
+    """Applies the limits given on the command line, then runs the command."""
+    parser = argparse.ArgumentParser(description="Run a command under resource limits")
+    parser.add_argument('--memory-mb', type=int)
+    parser.add_argument('--cpu-seconds', type=int)
+    parser.add_argument('--max-processes', type=int)
+    parser.add_argument('--max-open-files', type=int)
+    parser.add_argument('--cgroup-root')
+    parser.add_argument('command', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+    command = args.command[1:] if args.command[:1] == ['--'] else args.command
+    if not command:
+        parser.error("no command given")
+
+    ResourceLimits(args.memory_mb, args.cpu_seconds, args.max_processes,
+                   args.max_open_files, args.cgroup_root).apply()
+    os.execvp(command[0], command)
+
+
+if __name__ == "__main__":
+    main()
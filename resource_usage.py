@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Resource accounting for the CS3 Autograder
+Measures the CPU time, peak memory and child processes of the kernel (or
+fork / subprocess child) that ran a student's notebook
+"""
+
+import csv
+import os
+import threading
+
+from phase_timing import percentile
+
+# Seconds between samples of the process tree
+SAMPLE_INTERVAL = 0.1
+
+# Per-notebook resource columns, in the order they are written
+USAGE_FIELDS = ['user_cpu', 'system_cpu', 'peak_rss_mb', 'child_processes', 'output_bytes']
+
+
+def process_times(pid):
+    """
+    Returns:
+        tuple: (user, system) CPU seconds of process `pid`, including its
+        finished children, or None where /proc is not available
+    """
+    try:
+        with open(f'/proc/{pid}/stat', encoding='utf-8') as f:
+            # Fields after the command name, which may contain spaces
+            fields = f.read().rsplit(')', 1)[1].split()
+        ticks = os.sysconf('SC_CLK_TCK')
+        user, system, children_user, children_system = (int(x) for x in fields[11:15])
+        return (user + children_user) / ticks, (system + children_system) / ticks
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _status_kb(pid, field):
+    """A 'kB' field (VmRSS, VmHWM, ...) of /proc/<pid>/status, or None."""
+    try:
+        with open(f'/proc/{pid}/status', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def _children(pid):
+    """Direct child process IDs of `pid` (Linux)."""
+    children = []
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children', encoding='utf-8') as f:
+                children += [int(child) for child in f.read().split()]
+    except (OSError, ValueError):
+        pass
+    return children
+
+
+def _reset_peak_rss(pid):
+    """Resets the peak RSS (VmHWM) of a process we own to its current RSS."""
+    try:
+        with open(f'/proc/{pid}/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+class UsageMonitor:
+    """
+    Resource usage of the process that runs one notebook and of everything
+    it starts.
+
+    Once attached to a process, a background thread samples the resident
+    memory of its process tree and the child processes in it. CPU time is
+    taken from the rusage of a reaped child (fork and subprocess backends)
+    or, for a kernel that outlives the notebook, as the difference in its
+    /proc CPU times. Without /proc (not Linux) only the rusage is known.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.pid = None
+        self.peak_rss_kb = None
+        self.child_pids = set()
+        self.rusage = None
+        self._start_times = None
+        self._last_times = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def attach(self, pid, reset_peak=False):
+        """
+        Starts monitoring process `pid`. With `reset_peak` (a reused kernel)
+        its peak RSS is reset so that earlier notebooks don't count.
+        """
+        if self.pid is not None:
+            return
+        self.pid = pid
+        if reset_peak:
+            _reset_peak_rss(pid)
+        self._start_times = process_times(pid)
+        self.sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def sample(self):
+        """Takes one sample of the process tree's memory, children and CPU time."""
+        if self.pid is None:
+            return
+        with self._lock:
+            times = process_times(self.pid)
+            if times is not None:
+                self._last_times = times
+            total_kb = None
+            for pid in [self.pid] + self._descendants():
+                rss = _status_kb(pid, 'VmHWM' if pid == self.pid else 'VmRSS')
+                if rss is not None:
+                    total_kb = (total_kb or 0) + rss
+            if total_kb is not None:
+                self.peak_rss_kb = max(self.peak_rss_kb or 0, total_kb)
+
+    def _descendants(self):
+        found = []
+        stack = _children(self.pid)
+        while stack:
+            pid = stack.pop()
+            found.append(pid)
+            self.child_pids.add(pid)
+            stack += _children(pid)
+        return found
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def set_rusage(self, rusage):
+        """Records the rusage of the reaped child (from os.wait4)."""
+        self.rusage = rusage
+
+    def stop(self):
+        """Stops sampling."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def usage(self, output_bytes=None):
+        """
+        Returns:
+            dict: USAGE_FIELDS: user and system CPU seconds, peak resident
+            memory of the process tree in MB, number of child processes
+            seen, and `output_bytes`; None where not measured
+        """
+        user = system = None
+        peak_kb = self.peak_rss_kb
+        if self.rusage is not None:
+            user, system = self.rusage.ru_utime, self.rusage.ru_stime
+            # ru_maxrss is in kilobytes on Linux
+            peak_kb = max(peak_kb or 0, self.rusage.ru_maxrss)
+        elif self._start_times is not None and self._last_times is not None:
+            user = self._last_times[0] - self._start_times[0]
+            system = self._last_times[1] - self._start_times[1]
+        return {
+            'user_cpu': user,
+            'system_cpu': system,
+            'peak_rss_mb': None if peak_kb is None else peak_kb / 1024,
+            'child_processes': len(self.child_pids) if self.pid is not None else None,
+            'output_bytes': output_bytes,
+        }
+
+
+def format_value(value):
+    """Formats a CSV cell: empty for None, 4 significant digits for floats."""
+    if value is None:
+        return ''
+    return f"{value:.4g}" if isinstance(value, float) else value
+
+
+def usage_summary(usages):
+    """
+    Cohort percentiles of the notebooks' resource usage.
+
+    Returns:
+        list: (field, count, p50, p95, max) for each of USAGE_FIELDS that
+        was measured for at least one notebook
+    """
+    rows = []
+    for field in USAGE_FIELDS:
+        values = [usage[field] for usage in usages if usage.get(field) is not None]
+        if values:
+            rows.append((field, len(values), percentile(values, 0.5),
+                         percentile(values, 0.95), max(values)))
+    return rows
+
+
+def print_usage_summary(usages):
+    """Prints the cohort percentiles of per-notebook resource usage."""
+    measured = [usage for usage in usages if any(v is not None for v in usage.values())]
+    rows = usage_summary(measured)
+    if not rows:
+        return
+    print(f"Resource usage over {len(measured)} executed notebook(s):")
+    print(f"  {'':<16}{'n':>5}{'p50':>12}{'p95':>12}{'max':>12}")
+    for field, count, p50, p95, peak in rows:
+        print(f"  {field:<16}{count:>5}{p50:>12.6g}{p95:>12.6g}{peak:>12.6g}")
+
+
+def write_usage_csv(path, rows):
+    """
+    Writes the resource usage of every notebook to a CSV file kept next to
+    the grades.
+
+    Args:
+        rows: (csv_line, status, filename, seconds, usage) per notebook, in
+            grades CSV order; usage (a UsageMonitor.usage() dict) and
+            seconds may be None
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['first_name', 'last_name', 'student_id', 'filename', 'status',
+                         'wall_seconds'] + USAGE_FIELDS)
+        for csv_line, status, filename, seconds, usage in rows:
+            values = [(usage or {}).get(field) for field in USAGE_FIELDS]
+            writer.writerow(csv_line.split(',')[:3] + [filename, status]
+                            + [format_value(value) for value in [seconds] + values])
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Persistent result cache for the CS3 Autograder
+Stores each notebook's grading result and executed notebook under a hash of
+everything that can change the result, so unchanged submissions are not
+executed again
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+GRADER_MARKER = 'DO NOT MODIFY THE CODE BELOW'
+
+
+def kernel_environment(kernel_name='python3'):
+    """
+    Describes the environment notebooks run in. A change of Python version
+    or kernel command line invalidates all cached results.
+    """
+    environment = {'python': sys.version, 'executable': sys.executable}
+    try:
+        from jupyter_client.kernelspec import get_kernel_spec
+        spec = get_kernel_spec(kernel_name)
+        environment['kernel'] = spec.argv
+        environment['kernel_dir'] = spec.resource_dir
+    except Exception:
+        environment['kernel'] = None
+    return environment
+
+
+def notebook_code_cells(notebook):
+    """
+    Returns the source and tags of every student code cell in a notebook
+    dictionary. Tags count because 'raises-exception' and 'skip-execution'
+    change how the cell is executed.
+    """
+    sources = []
+    for cell in notebook.get('cells', []):
+        if cell.get('cell_type') != 'code':
+            continue
+        source = cell.get('source', '')
+        if isinstance(source, list):
+            source = ''.join(source)
+        # An autograder cell left over from an earlier run is covered by
+        # the autograder code that is part of the key
+        if GRADER_MARKER in source:
+            continue
+        tags = cell.get('metadata', {}).get('tags', [])
+        sources.append([source, sorted(tags)])
+    return sources
+
+
+def cache_key(notebook_filename, notebook, autograder_code, timeout, environment):
+    """
+    Hashes everything a grading result depends on. The filename is included
+    because students without names in their notebook are identified by it.
+    """
+    payload = json.dumps({
+        'filename': notebook_filename,
+        'cells': notebook_code_cells(notebook),
+        'autograder': autograder_code,
+        'timeout': timeout,
+        'environment': environment,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def stat_token(notebook_filename, stat, autograder_code, timeout, environment):
+    """
+    Hashes a notebook's name, modification time and size together with the
+    grading settings. While input notebooks are not modified by grading, an
+    unchanged token means an unchanged submission, so the cache key can be
+    found without reading and hashing the notebook.
+    """
+    payload = json.dumps({
+        'filename': notebook_filename,
+        'mtime': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'autograder': autograder_code,
+        'timeout': timeout,
+        'environment': environment,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk cache of grading results, evicted least recently used first
+    once it grows past `max_bytes`.
+
+    Each entry is a directory holding result.json and, if execution
+    produced one, the executed notebook. Entries are written to a temporary
+    directory and renamed into place, so concurrent workers never see a
+    half-written entry. A small index maps stat tokens (see stat_token())
+    to entry keys.
+    """
+
+    RESULT_FILE = 'result.json'
+    NOTEBOOK_FILE = 'output.ipynb'
+    STAT_INDEX_DIR = 'by-stat'
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def key_for_stat(self, token):
+        """Returns the cache key last stored for a stat token, or None."""
+        try:
+            with open(os.path.join(self.directory, self.STAT_INDEX_DIR, token),
+                      'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def remember_stat(self, token, key):
+        """Records that notebooks with this stat token have cache key `key`."""
+        index_dir = os.path.join(self.directory, self.STAT_INDEX_DIR)
+        try:
+            os.makedirs(index_dir, exist_ok=True)
+            staging = os.path.join(index_dir, f'.tmp-{token}-{os.getpid()}')
+            with open(staging, 'w', encoding='utf-8') as f:
+                f.write(key)
+            os.replace(staging, os.path.join(index_dir, token))
+        except OSError:
+            pass
+
+    def get(self, key, output_path):
+        """
+        Looks up a cached result, copying its executed notebook to
+        `output_path`.
+
+        Returns:
+            dict: The cached result, or None on a miss
+        """
+        entry = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry, self.RESULT_FILE), 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            notebook = os.path.join(entry, self.NOTEBOOK_FILE)
+            if os.path.exists(notebook):
+                shutil.copyfile(notebook, output_path)
+            # Mark the entry as recently used for LRU eviction
+            os.utime(entry)
+            return result
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, result, output_path):
+        """
+        Stores a result and the executed notebook at `output_path` (if any).
+
+        Returns:
+            int: Number of entries evicted to stay under the size cap
+        """
+        entry = self._entry_dir(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        staging = tempfile.mkdtemp(dir=os.path.dirname(entry), prefix='.tmp-')
+        try:
+            with open(os.path.join(staging, self.RESULT_FILE), 'w', encoding='utf-8') as f:
+                json.dump(result, f)
+            if output_path and os.path.exists(output_path):
+                shutil.copyfile(output_path, os.path.join(staging, self.NOTEBOOK_FILE))
+            if os.path.isdir(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+            os.rename(staging, entry)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            return 0
+        return self.evict()
+
+    def _entries(self):
+        """Yields (last used time, size in bytes, path) for every entry."""
+        for prefix in os.listdir(self.directory):
+            prefix_dir = os.path.join(self.directory, prefix)
+            if prefix == self.STAT_INDEX_DIR or not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                if name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(prefix_dir, name)
+                try:
+                    size = sum(
+                        os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)
+                    )
+                    yield os.path.getmtime(path), size, path
+                except OSError:
+                    continue
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache fits in max_bytes.
+
+        Returns:
+            int: Number of entries removed
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            evicted += 1
+        return evicted
+
+    def clear(self):
+        """Removes every cached result."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
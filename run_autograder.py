@@ -5,17 +5,374 @@ Combines all three steps: adding autograder cell, executing notebooks, and readi
 """
 
 import os
+import io
 import json
 import textwrap
 import shutil
 import sys
 import re
+import argparse
+import asyncio
+import contextlib
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import util
 import nbformat
 from nbconvert.preprocessors import ExecutePreprocessor
 from config import (
-    INPUT_DIR, OUTPUT_DIR, GRADES_CSV, 
-    EXECUTION_TIMEOUT, AUTOGRADER_CODE
+    INPUT_DIR, OUTPUT_DIR, GRADES_CSV, JOURNAL_PATH, PERFORMANCE_CSV, TIMING_LOG,
+    CELL_TIMINGS_CSV, SLOWEST_CELLS_SHOWN, RESOURCE_USAGE_CSV,
+    MODIFY_INPUT_NOTEBOOKS, RESULT_CACHE_ENABLED, CACHE_DIR, CACHE_MAX_MB,
+    EXECUTION_TIMEOUT, AUTOGRADER_CODE, GRADING_SPEC, REFERENCE_NOTEBOOK, EXPECTED_VALUES_FILE,
+    CELL_OUTPUT_LIMIT, NOTEBOOK_OUTPUT_LIMIT, OUTPUT_TAIL_SIZE,
+    KERNEL_POOL_SIZE, KERNEL_POOL_RESET, KERNEL_POOL_SPARES, KERNEL_POOL_MAX_USES,
+    PRESCREEN_ENABLED, GRADED_CLASSES, PRUNE_CELLS,
+    EXECUTION_BACKEND, FORK_SERVER_PRELOAD,
+    METRICS_PORT, METRICS_ADDRESS, METRICS_FILE, METRICS_INTERVAL,
+    ASYNC_CONCURRENCY, NOTEBOOK_TIMEOUT,
+    MEMORY_LIMIT_MB, CPU_TIME_LIMIT, MAX_PROCESSES, MAX_OPEN_FILES, RESOURCE_CGROUP_ROOT
 )
+from kernel_pool import KernelPool, ResourceLimitedClientMixin
+from fork_server import ForkServer
+from subprocess_runner import SubprocessRunner, needs_kernel
+from async_executor import AsyncNotebookExecutor
+from result_cache import ResultCache, cache_key, kernel_environment, stat_token
+from progress_journal import ProgressJournal
+from output_limits import OutputLimiter, OutputLimitMixin
+from prescreen import SKIP_TAG, parse_cell, prescreen, student_info
+from cell_pruning import cells_to_skip
+from grading_spec import (
+    PERFORMANCE_MARKER, compile_spec, expected_values, grading_budget, problem_count
+)
+from phase_timing import (
+    PhaseTimer, PhaseTimingMixin, TimingLog, child_cpu_seconds, print_phase_summary,
+    print_slowest_cells, write_cell_timings
+)
+from resource_limits import ResourceLimits, BREACH_MESSAGES
+from resource_usage import UsageMonitor, print_usage_summary, write_usage_csv
+from trace_export import write_trace
+from live_metrics import GradingMetrics, MetricsExporter
+
+
+class LimitedExecutePreprocessor(PhaseTimingMixin, OutputLimitMixin, ResourceLimitedClientMixin,
+                                 ExecutePreprocessor):
+    """
+    ExecutePreprocessor that caps the stream output it keeps and the
+    resources its kernel uses, and times its cells.
+    """
+
+
+class ThreadStdout(io.TextIOBase):
+    """
+    Stands in for sys.stdout while the async backend grades notebooks on
+    several threads: what a thread prints inside capture_output() goes to
+    that notebook's log, and everything else to the original stream.
+    """
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+    
+    def _target(self):
+        return getattr(self._local, 'log', None) or self.stream
+    
+    def write(self, text):
+        return self._target().write(text)
+    
+    def flush(self):
+        self._target().flush()
+
+
+@contextlib.contextmanager
+def capture_output(log):
+    """Sends this thread's printed output to `log` (a text stream)."""
+    stdout = sys.stdout
+    if not isinstance(stdout, ThreadStdout):
+        with contextlib.redirect_stdout(log):
+            yield
+        return
+    previous = getattr(stdout._local, 'log', None)
+    stdout._local.log = log
+    try:
+        yield
+    finally:
+        stdout._local.log = previous
+
+
+# Reasons reported for notebooks that could not be executed, by CSV status
+FAILURE_MESSAGES = {
+    'error': "Notebook execution failed or crashed",
+    'timeout': "Notebook execution timed out",
+    'cannot_score': "Cannot score",
+    **BREACH_MESSAGES,
+}
+
+
+# Per-process settings (set from the command line by main() and init_worker())
+kernel_pool_size = KERNEL_POOL_SIZE
+kernel_pool_spares = KERNEL_POOL_SPARES or 0
+execution_backend = EXECUTION_BACKEND
+result_cache_enabled = RESULT_CACHE_ENABLED
+prune_cells = PRUNE_CELLS
+_autograder_code = AUTOGRADER_CODE
+_kernel_pool = None
+_fork_server = None
+_subprocess_runner = None
+_result_cache = None
+_environment = None
+
+
+def autograder_code():
+    """
+    Returns the code injected into each notebook: config's AUTOGRADER_CODE,
+    or GRADING_SPEC compiled the first time it is needed. main() compiles
+    it once and hands it to the workers through init_worker().
+    """
+    global _autograder_code
+    if _autograder_code is None:
+        _autograder_code = compile_spec(
+            GRADING_SPEC, expected_values(GRADING_SPEC, REFERENCE_NOTEBOOK, EXPECTED_VALUES_FILE)
+        )
+    return _autograder_code
+
+
+def get_resource_limits():
+    """
+    Returns the limits that student code runs under.
+    
+    Returns:
+        ResourceLimits: The limits, or None if no limit is set (or the
+        platform has no rlimits)
+    """
+    limits = ResourceLimits(MEMORY_LIMIT_MB, CPU_TIME_LIMIT, MAX_PROCESSES,
+                            MAX_OPEN_FILES, RESOURCE_CGROUP_ROOT)
+    return limits if limits.enabled else None
+
+
+def get_kernel_pool():
+    """
+    Returns this process's warm kernel pool, starting it on first use.
+    
+    Returns:
+        KernelPool: The pool, or None if kernel pooling is disabled
+    """
+    global _kernel_pool
+    if _kernel_pool is None and kernel_pool_size > 0:
+        _kernel_pool = KernelPool(
+            kernel_pool_size, kernel_name='python3', cwd=INPUT_DIR,
+            reset_mode=KERNEL_POOL_RESET, spares=kernel_pool_spares,
+            max_uses=KERNEL_POOL_MAX_USES,
+            resource_limits=get_resource_limits()
+        ).start()
+        # Shut the kernels down when this process (or pool worker) exits
+        util.Finalize(_kernel_pool, _kernel_pool.close, exitpriority=10)
+    return _kernel_pool
+
+
+def get_fork_server():
+    """
+    Returns this process's fork server, creating it on first use.
+    
+    Returns:
+        ForkServer: The fork server with the autograder code precompiled
+    """
+    global _fork_server
+    if _fork_server is None:
+        _fork_server = ForkServer(autograder_code(), EXECUTION_TIMEOUT, FORK_SERVER_PRELOAD,
+                                  resource_limits=get_resource_limits())
+    return _fork_server
+
+
+def get_subprocess_runner():
+    """
+    Returns this process's subprocess runner, creating it on first use.
+    
+    Returns:
+        SubprocessRunner: Runner for notebooks that don't need a kernel
+    """
+    global _subprocess_runner
+    if _subprocess_runner is None:
+        _subprocess_runner = SubprocessRunner(autograder_code(), EXECUTION_TIMEOUT, INPUT_DIR,
+                                              get_resource_limits())
+    return _subprocess_runner
+
+
+def get_result_cache():
+    """
+    Returns this process's result cache, opening it on first use.
+    
+    Returns:
+        ResultCache: The cache, or None if caching is disabled
+    """
+    global _result_cache, _environment
+    if _result_cache is None and result_cache_enabled:
+        _result_cache = ResultCache(CACHE_DIR, CACHE_MAX_MB * 1024 * 1024)
+        _environment = kernel_environment('python3')
+        _environment['backend'] = execution_backend
+        _environment['prune_cells'] = prune_cells
+        # The limits and the pre-screen change results as much as the code does
+        _environment['output_limits'] = [CELL_OUTPUT_LIMIT, NOTEBOOK_OUTPUT_LIMIT,
+                                         OUTPUT_TAIL_SIZE]
+        _environment['resource_limits'] = [MEMORY_LIMIT_MB, CPU_TIME_LIMIT, MAX_PROCESSES,
+                                           MAX_OPEN_FILES]
+        _environment['notebook_timeout'] = NOTEBOOK_TIMEOUT
+        _environment['prescreen'] = PRESCREEN_ENABLED
+        _environment['graded_classes'] = GRADED_CLASSES
+    return _result_cache
+
+
+def input_stat_token(notebook_filename):
+    """
+    Returns the stat token (name, mtime, size and grading settings) of an
+    input notebook, or None when input notebooks are modified by grading
+    and their mtime therefore says nothing about the submission.
+    """
+    if MODIFY_INPUT_NOTEBOOKS:
+        return None
+    try:
+        stat = os.stat(os.path.join(INPUT_DIR, notebook_filename))
+    except OSError:
+        return None
+    return stat_token(notebook_filename, stat, autograder_code(), EXECUTION_TIMEOUT, _environment)
+
+
+def lookup_cached_result(notebook_filename, notebook=None):
+    """
+    Looks up a notebook in the result cache. On a hit the cached executed
+    notebook is copied to the output directory.
+    
+    Without `notebook`, only the notebook's modification time and size are
+    checked, so an unchanged submission is found without reading it. With
+    `notebook`, the cache key is computed from its contents.
+    
+    Returns:
+        tuple: (cache key or None, cached (success, csv_line, error) or None)
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return None, None
+    
+    output_path = os.path.join(OUTPUT_DIR, notebook_filename)
+    token = input_stat_token(notebook_filename)
+    if notebook is None:
+        key = cache.key_for_stat(token) if token else None
+        if key is None:
+            return None, None
+    else:
+        try:
+            key = cache_key(notebook_filename, notebook, autograder_code(),
+                            EXECUTION_TIMEOUT, _environment)
+        except Exception:
+            return None, None
+    
+    cached = cache.get(key, output_path)
+    if cached is None:
+        return key, None
+    if token and notebook is not None:
+        cache.remember_stat(token, key)
+    return key, (cached['success'], cached['csv_line'], cached['error'])
+
+
+def has_syntax_error(notebook):
+    """True if a code cell that is executed (not skipped) has a syntax error."""
+    for cell in notebook.cells:
+        tags = cell.get('metadata', {}).get('tags', [])
+        if cell.cell_type != 'code' or SKIP_TAG in tags or 'raises-exception' in tags:
+            continue
+        if parse_cell(cell.source)[1] is not None:
+            return True
+    return False
+
+
+# Lines the grader prints when a time limit cut a test, a fixture or the
+# performance stage short; those results depend on how loaded the machine was
+TIME_LIMIT_OUTPUT = re.compile(
+    r"TIMEOUT:|SKIPPED:|took too long|ran out of the problem time limit|\(time limit reached\)"
+)
+
+
+def hit_time_limit(notebook):
+    """True if the grader's output shows a test or problem running out of time."""
+    cell = grader_cell(notebook)
+    if cell is None:
+        return False
+    return any(output.get('output_type') == 'stream'
+               and TIME_LIMIT_OUTPUT.search(output.get('text', ''))
+               for output in cell.get('outputs', []))
+
+
+def is_deterministic(success, error, notebook=None):
+    """
+    True if grading the same notebook again is bound to give the same
+    result: a success where no test ran out of time, a pre-screen verdict,
+    or a failure caused by a syntax error in a student cell. Timeouts,
+    crashes and broken limits can come from an overloaded machine or a
+    kernel that failed to start, so those notebooks are graded again next
+    time.
+    """
+    status = result_status(success, error)
+    if status == 'ok':
+        return notebook is not None and not hit_time_limit(notebook)
+    if status == 'cannot_score':
+        return True
+    return status == 'error' and notebook is not None and has_syntax_error(notebook)
+
+
+def store_cached_result(key, notebook_filename, success, csv_line, error, notebook=None):
+    """
+    Saves a grading result in the result cache. Only deterministic results
+    (see is_deterministic) with a CSV line are cached; the rest are retried.
+    
+    Returns:
+        int: Number of cache entries evicted to make room
+    """
+    cache = get_result_cache()
+    if cache is None or key is None or csv_line is None:
+        return 0
+    if not is_deterministic(success, error, notebook):
+        return 0
+    # Only successes write the executed notebook; any other file at the
+    # output path is left over from an earlier run
+    output_path = os.path.join(OUTPUT_DIR, notebook_filename) if success else None
+    result = {'success': success, 'csv_line': csv_line, 'error': error}
+    evicted = cache.put(key, result, output_path)
+    token = input_stat_token(notebook_filename)
+    if token:
+        cache.remember_stat(token, key)
+    return evicted
+
+
+def init_worker(settings):
+    """Initializes a grading worker process with the settings chosen in main()."""
+    global kernel_pool_size, kernel_pool_spares, execution_backend, result_cache_enabled
+    global prune_cells
+    global INPUT_DIR, OUTPUT_DIR, GRADES_CSV, JOURNAL_PATH, CACHE_DIR, PERFORMANCE_CSV, TIMING_LOG
+    global CELL_TIMINGS_CSV, RESOURCE_USAGE_CSV
+    global EXECUTION_TIMEOUT, _autograder_code
+    kernel_pool_size = settings['kernel_pool_size']
+    kernel_pool_spares = settings['kernel_pool_spares']
+    execution_backend = settings['execution_backend']
+    result_cache_enabled = settings['result_cache_enabled']
+    prune_cells = settings['prune_cells']
+    if settings['input_dir'] is not None:
+        INPUT_DIR = settings['input_dir']
+    if settings['output_dir'] is not None:
+        # Everything the run writes goes under the output directory
+        OUTPUT_DIR = settings['output_dir']
+        GRADES_CSV = os.path.join(OUTPUT_DIR, os.path.basename(GRADES_CSV))
+        JOURNAL_PATH = os.path.join(OUTPUT_DIR, os.path.basename(JOURNAL_PATH))
+        CACHE_DIR = os.path.join(OUTPUT_DIR, os.path.basename(CACHE_DIR))
+        PERFORMANCE_CSV = os.path.join(OUTPUT_DIR, os.path.basename(PERFORMANCE_CSV))
+        TIMING_LOG = os.path.join(OUTPUT_DIR, os.path.basename(TIMING_LOG))
+        CELL_TIMINGS_CSV = os.path.join(OUTPUT_DIR, os.path.basename(CELL_TIMINGS_CSV))
+        RESOURCE_USAGE_CSV = os.path.join(OUTPUT_DIR, os.path.basename(RESOURCE_USAGE_CSV))
+    if settings['timeout'] is not None:
+        EXECUTION_TIMEOUT = settings['timeout']
+    if settings.get('autograder_code') is not None:
+        _autograder_code = settings['autograder_code']
 
 
 def extract_username_from_filename(filename):
@@ -63,42 +420,54 @@ def extract_username_from_filename(filename):
         return None
 
 
-def add_autograder_cell(notebook_path):
+def read_notebook(notebook_path):
+    """
+    Reads and parses a student notebook. This is the only time the
+    notebook is read from disk; every later step works on this copy.
+    
+    Returns:
+        NotebookNode: The notebook, or None if it could not be read
+    """
+    try:
+        with open(notebook_path, 'r', encoding='utf-8') as nb_file:
+            return nbformat.read(nb_file, as_version=4)
+    except Exception as e:
+        print(f"  ERROR reading {os.path.basename(notebook_path)}: {e}")
+        return None
+
+
+def add_autograder_cell(notebook, notebook_path):
     """
-    Adds the autograder cell to a notebook.
+    Adds the autograder cell to an in-memory notebook. The notebook in the
+    input directory is left untouched unless MODIFY_INPUT_NOTEBOOKS is set,
+    in which case the cell is also saved back to notebook_path.
     
     Returns:
         bool: True if successful, False otherwise
     """
     try:
-        # Read the notebook
-        with open(notebook_path, 'r', encoding='utf-8') as f:
-            notebook = json.load(f)
-        
         # Check if autograder cell already exists
-        for cell in notebook.get('cells', []):
-            if 'DO NOT MODIFY THE CODE BELOW' in cell.get('source', ''):
+        for cell in notebook.cells:
+            if 'DO NOT MODIFY THE CODE BELOW' in cell.source:
                 print(f"  Autograder cell already exists in {os.path.basename(notebook_path)}")
                 return True
         
         # Remove any common leading whitespace
-        code_block = textwrap.dedent(AUTOGRADER_CODE)
+        code_block = textwrap.dedent(autograder_code())
         
-        # Create a new code cell
-        cell = {
+        # Create a new code cell and append it
+        notebook.cells.append(nbformat.from_dict({
             "cell_type": "code",
             "execution_count": None,
             "metadata": {},
             "outputs": [],
-            "source": code_block.splitlines(keepends=True)
-        }
-        
-        # Append the new cell
-        notebook['cells'].append(cell)
+            "source": code_block
+        }))
         
         # Write back to the notebook
-        with open(notebook_path, 'w', encoding='utf-8') as f:
-            json.dump(notebook, f, indent=1)
+        if MODIFY_INPUT_NOTEBOOKS:
+            with open(notebook_path, 'w', encoding='utf-8') as f:
+                nbformat.write(notebook, f)
         
         return True
     except Exception as e:
@@ -106,227 +475,874 @@ def add_autograder_cell(notebook_path):
         return False
 
 
-def execute_notebook(notebook_path, output_path):
+def prune_notebook(notebook, notebook_path):
     """
-    Executes a notebook and saves the result.
+    Tags the student cells the autograder does not depend on with
+    "skip-execution", so they are not executed, if pruning is enabled.
     
     Returns:
-        bool: True if successful, False if crashed
+        list: Numbers (1-based, among code cells) of the skipped cells
     """
+    if not prune_cells:
+        return []
+    cells = [cell for cell in notebook.cells if cell.cell_type == 'code'
+             and 'DO NOT MODIFY THE CODE BELOW' not in cell.source]
     try:
-        # Read the notebook content
-        with open(notebook_path, 'r', encoding='utf-8') as nb_file:
-            notebook = nbformat.read(nb_file, as_version=4)
+        skipped = cells_to_skip([cell.source for cell in cells], textwrap.dedent(autograder_code()))
+    except Exception as e:
+        print(f"  Not pruning {os.path.basename(notebook_path)}: {e}")
+        return []
+    if skipped is None:
+        print("  Not pruning: uses IPython syntax or dynamic code")
+        return []
+    for index in skipped:
+        tags = cells[index].metadata.setdefault('tags', [])
+        if SKIP_TAG not in tags:
+            tags.append(SKIP_TAG)
+    numbers = [index + 1 for index in skipped]
+    if numbers:
+        print(f"  Skipping cells not needed by the autograder: {', '.join(map(str, numbers))}")
+    return numbers
+
+
+def new_output_limiter(notebook_path):
+    """
+    Returns an OutputLimiter for one notebook, spilling excess output to
+    "<notebook>.overflow.txt" in the output directory.
+    """
+    name = os.path.splitext(os.path.basename(notebook_path))[0]
+    spill_path = os.path.join(OUTPUT_DIR, name + '.overflow.txt')
+    return OutputLimiter(CELL_OUTPUT_LIMIT, NOTEBOOK_OUTPUT_LIMIT, OUTPUT_TAIL_SIZE, spill_path)
+
+
+def report_truncated_output(limiter):
+    """Notes in the log if a notebook's output was too long to keep."""
+    if limiter.spilled:
+        print(f"  Output too long, truncated (full output in {os.path.basename(limiter.spill_path)})")
+
+
+def report_limit_breach(status, notebook_path):
+    """Notes in the log if a notebook was stopped by a resource limit."""
+    if status in BREACH_MESSAGES:
+        print(f"  LIMIT: {os.path.basename(notebook_path)}: {BREACH_MESSAGES[status]}")
+
+
+def split_code_cells(notebook):
+    """
+    Returns:
+        tuple: (code cells to execute, their sources, index of the
+            autograder cell among them or None). Cells tagged
+            "skip-execution" are left out, as nbclient skips them.
+    """
+    code_cells = [cell for cell in notebook.cells if cell.cell_type == 'code'
+                  and SKIP_TAG not in cell.metadata.get('tags', [])]
+    sources = [cell.source for cell in code_cells]
+    grader_index = None
+    for index, source in enumerate(sources):
+        if 'DO NOT MODIFY THE CODE BELOW' in source:
+            grader_index = index
+    return code_cells, sources, grader_index
+
+
+def grader_cell(notebook):
+    """Returns the autograder cell of a notebook, or None."""
+    code_cells, _, grader_index = split_code_cells(notebook)
+    return None if grader_index is None else code_cells[grader_index]
+
+
+def execute_notebook_without_kernel(notebook, notebook_path, runner, timer, monitor=None):
+    """
+    Executes a notebook's code cells with the fork server or a subprocess
+    runner, filling in the outputs in the same form as a kernel-executed
+    notebook.
+    
+    Returns:
+        str: 'ok', 'error', 'timeout' or the resource limit that was broken
+    """
+    try:
+        code_cells, sources, grader_index = split_code_cells(notebook)
         
-        # Configure the notebook executor
-        executor = ExecutePreprocessor(timeout=EXECUTION_TIMEOUT, kernel_name='python3')
+        limiter = new_output_limiter(notebook_path)
+        timings = []
+        start, cpu = time.perf_counter(), child_cpu_seconds()
+        cell_outputs, status = runner.run(sources, grader_index, limiter, timings, monitor)
+        wall, cpu = time.perf_counter() - start, child_cpu_seconds() - cpu
+        report_truncated_output(limiter)
         
-        # Execute the notebook
-        executor.preprocess(notebook, {'metadata': {'path': os.path.dirname(notebook_path)}})
+        for count, (cell, outputs) in enumerate(zip(code_cells, cell_outputs), 1):
+            cell.execution_count = count
+            cell.outputs = [nbformat.from_dict(output) for output in outputs]
+            for output in cell.outputs:
+                if output.output_type == 'execute_result':
+                    output.execution_count = count
         
-        # Save the executed notebook
-        with open(output_path, 'w', encoding='utf-8') as nb_file:
-            nbformat.write(notebook, nb_file)
+        # What the cells did not take went to starting and reaping the child;
+        # on the timeline it is put first, followed by the cells
+        cell_cpus = [cell_cpu for _, cell_cpu in timings]
+        startup = wall - sum(cell_wall for cell_wall, _ in timings)
+        timer.add('kernel_start', startup, None if None in cell_cpus else cpu - sum(cell_cpus),
+                  start)
+        start += max(startup, 0.0)
+        for cell, (cell_wall, cell_cpu) in zip(code_cells, timings):
+            timer.add_cell(cell, cell_wall, cell_cpu, start)
+            start += cell_wall
         
-        return True
+        if status == 'timeout':
+            print(f"  TIMEOUT: {os.path.basename(notebook_path)} exceeded {EXECUTION_TIMEOUT} seconds")
+        elif status != 'ok':
+            errors = [o for outputs in cell_outputs for o in outputs if o['output_type'] == 'error']
+            reason = f"{errors[-1]['ename']}: {errors[-1]['evalue']}" if errors else "kernel process died"
+            print(f"  ERROR executing {os.path.basename(notebook_path)}: {reason}")
+            report_limit_breach(status, notebook_path)
+        return status
+    except Exception as e:
+        print(f"  ERROR executing {os.path.basename(notebook_path)}: {e}")
+        return 'error'
+
+
+def execute_notebook(notebook, notebook_path, timer=None, monitor=None):
+    """
+    Executes an in-memory notebook in place, timing kernel start and each
+    cell with `timer` (a PhaseTimer) and measuring the resource usage of the
+    kernel or child process with `monitor` (a UsageMonitor) if given.
+    
+    Returns:
+        str: 'ok', 'error', 'timeout' or the resource limit that was broken
+            (a key of BREACH_MESSAGES)
+    """
+    if timer is None:
+        timer = PhaseTimer()
+        timer.grader_cell = grader_cell(notebook)
+    if execution_backend == 'fork':
+        return execute_notebook_without_kernel(notebook, notebook_path, get_fork_server(), timer,
+                                               monitor)
+    if execution_backend == 'subprocess':
+        _, sources, grader_index = split_code_cells(notebook)
+        student_sources = [s for i, s in enumerate(sources) if i != grader_index]
+        if not needs_kernel(student_sources):
+            return execute_notebook_without_kernel(notebook, notebook_path,
+                                                   get_subprocess_runner(), timer, monitor)
+        print(f"  {os.path.basename(notebook_path)} uses IPython features, executing in a kernel")
+    
+    executor = None
+    km = None
+    try:
+        # Configure the notebook executor
+        executor = LimitedExecutePreprocessor(timeout=EXECUTION_TIMEOUT, kernel_name='python3')
+        executor.output_limiter = new_output_limiter(notebook_path)
+        executor.resource_limits = get_resource_limits()
+        executor.phase_timer = timer
+        executor.usage_monitor = monitor
+        
+        # Execute the notebook, on a warm kernel from the pool if enabled
+        resources = {'metadata': {'path': os.path.dirname(notebook_path)}}
+        timer.start_execution()
+        pool = get_kernel_pool()
+        if pool is None:
+            executor.preprocess(notebook, resources)
+        else:
+            with pool.kernel() as kernel:
+                km = kernel.km
+                try:
+                    executor.preprocess(notebook, resources, km=kernel.km)
+                finally:
+                    if executor.kc is not None:
+                        executor.kc.stop_channels()
+        
+        return 'ok'
     except TimeoutError:
         print(f"  TIMEOUT: {os.path.basename(notebook_path)} exceeded {EXECUTION_TIMEOUT} seconds")
-        return False
+        return 'timeout'
     except Exception as e:
         print(f"  ERROR executing {os.path.basename(notebook_path)}: {e}")
+        if km is None and executor is not None:
+            km = executor.limited_km
+        status = None
+        if km is not None:
+            status = km.limit_breach(getattr(e, 'ename', None), getattr(e, 'evalue', None))
+        report_limit_breach(status, notebook_path)
+        return status or 'error'
+    finally:
+        timer.stop_execution()
+        if monitor is not None:
+            # Before a pooled kernel moves on to another notebook
+            monitor.stop()
+        if executor is not None:
+            executor.output_limiter.close()
+            report_truncated_output(executor.output_limiter)
+
+
+def write_notebook(notebook, output_path):
+    """
+    Saves an executed notebook.
+    
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        with open(output_path, 'w', encoding='utf-8') as nb_file:
+            nbformat.write(notebook, nb_file)
+        return True
+    except Exception as e:
+        print(f"  ERROR writing {output_path}: {e}")
         return False
 
 
-def extract_csv_output(notebook_path):
+def extract_csv_output(notebook):
     """
-    Extracts the CSV line from the last output of a notebook.
+    Extracts the CSV line from the last output of an executed notebook.
+    
+    The outputs are scanned from the end, so only the tail of a notebook
+    with a lot of student output is looked at.
     
     Returns:
         str: CSV line or None if not found
     """
     try:
-        # Open and read the notebook file
-        with open(notebook_path, 'r', encoding='utf-8') as nb_file:
-            notebook = nbformat.read(nb_file, as_version=4)
-        
         # Extract cells from the notebook
         cells = notebook.get('cells', [])
         if not cells:
             return None
         
-        # Initialize a variable to store the last output
-        last_output = None
+        # Walk code cell outputs backwards; the first CSV line found is the last one printed
+        for cell in reversed(cells):
+            if cell['cell_type'] != 'code' or 'outputs' not in cell:
+                continue
+            for output in reversed(cell['outputs']):
+                # Handle stream outputs (e.g., print statements)
+                if output.get('output_type') == 'stream' and 'text' in output:
+                    text = output['text'].strip()
+                    # Look for CSV line (contains commas and numbers)
+                    end = len(text)
+                    while end > 0:
+                        start = text.rfind('\n', 0, end) + 1
+                        line = text[start:end]
+                        # Check if this looks like a CSV line (has commas and student info)
+                        if ',' in line and (line.count(',') >= 2):
+                            return line
+                        end = start - 1
+                
+                # Handle execution result outputs
+                elif output.get('output_type') == 'execute_result' and 'data' in output:
+                    if 'text/plain' in output['data']:
+                        text = output['data']['text/plain'].strip()
+                        if ',' in text and (text.count(',') >= 2):
+                            return text
         
-        # Iterate through all code cells to find outputs
-        for cell in cells:
-            if cell['cell_type'] == 'code' and 'outputs' in cell:
-                for output in cell['outputs']:
-                    # Handle stream outputs (e.g., print statements)
-                    if output.get('output_type') == 'stream' and 'text' in output:
-                        text = output['text']
-                        # Look for CSV line (contains commas and numbers)
-                        lines = text.strip().split('\n')
-                        for line in lines:
-                            # Check if this looks like a CSV line (has commas and student info)
-                            if ',' in line and (line.count(',') >= 2):
-                                last_output = line
-                    
-                    # Handle execution result outputs
-                    elif output.get('output_type') == 'execute_result' and 'data' in output:
-                        if 'text/plain' in output['data']:
-                            text = output['data']['text/plain'].strip()
-                            if ',' in text and (text.count(',') >= 2):
-                                last_output = text
+        return None
+    except Exception as e:
+        print(f"  ERROR reading output: {e}")
+        return None
+
+
+def extract_performance_output(notebook):
+    """
+    Extracts the results of the performance stage, printed just before the
+    CSV line, from an executed notebook.
+    
+    Returns:
+        list: One dictionary per timed method, or None if not found
+    """
+    for cell in reversed(notebook.get('cells', [])):
+        if cell['cell_type'] != 'code' or 'outputs' not in cell:
+            continue
+        for output in reversed(cell['outputs']):
+            if output.get('output_type') != 'stream' or 'text' not in output:
+                continue
+            for line in reversed(output['text'].splitlines()):
+                if line.startswith(PERFORMANCE_MARKER):
+                    try:
+                        return json.loads(line[len(PERFORMANCE_MARKER):])
+                    except ValueError:
+                        return None
+    return None
+
+
+def write_performance_csv(notebooks, results):
+    """
+    Writes the performance stage's exponents, points and timings for every
+    notebook graded 'ok' to PERFORMANCE_CSV, reading them from the executed
+    notebooks in the output directory (so cached and resumed results are
+    included).
+    
+    Returns:
+        int: Number of students written
+    """
+    names = [f"{class_name}.{method}"
+             for class_name, method, _, _ in GRADING_SPEC['performance']['problems']]
+    written = 0
+    with open(PERFORMANCE_CSV, 'w', encoding='utf-8') as f:
+        f.write("first_name,last_name,student_id,")
+        f.write(",".join(f"{name}_exponent,{name}_points,{name}_timings" for name in names))
+        f.write(",performance_total\n")
         
-        return last_output
+        for notebook_filename, result in zip(notebooks, results):
+            if result is None or result[1] != 'ok':
+                continue
+            notebook = read_notebook(os.path.join(OUTPUT_DIR, notebook_filename))
+            measured = extract_performance_output(notebook) if notebook is not None else None
+            if measured is None:
+                print(f"  No performance results in {notebook_filename}")
+                continue
+            by_name = {f"{m['class']}.{m['method']}": m for m in measured}
+            fields = result[0].split(',')[:3]
+            total = 0.0
+            for name in names:
+                m = by_name.get(name, {})
+                exponent = m.get('exponent')
+                timings = ";".join(f"{vertices}:{seconds:.3g}"
+                                   for vertices, seconds in m.get('timings', []))
+                fields += ["" if exponent is None else f"{exponent:.2f}",
+                           str(m.get('points', 0.0)), timings]
+                total += m.get('points', 0.0)
+            fields.append(f"{total:.2f}")
+            f.write(",".join(fields) + "\n")
+            written += 1
+    return written
+
+
+def zero_csv_line(notebook, notebook_filename):
+    """
+    Builds a CSV line with zeros for every problem, identifying the student
+    from the notebook's first_name/last_name/student_id assignments or,
+    failing that, from the username in the filename.
+    
+    Returns:
+        str: CSV line
+    """
+    num_problems = problem_count(GRADING_SPEC)
+    try:
+        # Try to find student info in the cells' literal assignments
+        student = student_info(notebook)
+        first_name = student.get('first_name', "Unknown")
+        last_name = student.get('last_name', "Unknown")
+        student_id = student.get('student_id', "Unknown")
+        
+        # If names are still unknown, try to extract username from filename
+        if first_name == "Unknown" or last_name == "Unknown":
+            username = extract_username_from_filename(notebook_filename)
+            if username:
+                # Use username as both first and last name
+                first_name = username
+                last_name = username
+        
+        return (
+            f"{first_name},{last_name},{student_id}," +
+            ",".join(["0"] * num_problems) +
+            ",0.00"
+        )
+    except Exception:
+        # Fallback: try to extract username from filename
+        username = extract_username_from_filename(notebook_filename)
+        if username:
+            return f"{username},{username},Unknown,{','.join(['0'] * num_problems)},0.00"
+        return f"Unknown,Unknown,Unknown,{','.join(['0'] * num_problems)},0.00"
+
+
+def result_status(success, error):
+    """
+    Returns the CSV status of a graded notebook: 'ok', the key of its
+    failure reason in FAILURE_MESSAGES (which may be followed by ": details"),
+    or 'error' for any other failure.
+    """
+    if success:
+        return 'ok'
+    for status, message in FAILURE_MESSAGES.items():
+        if error == message or (error or '').startswith(message + ': '):
+            return status
+    return 'error'
+
+
+def prescreen_notebook(notebook_filename, notebook):
+    """
+    Grades a notebook that cannot score zero without executing it.
+    
+    Returns:
+        tuple: (success, csv_line, error_message), or None if the notebook
+        needs to be executed
+    """
+    if not PRESCREEN_ENABLED:
+        return None
+    try:
+        reason = prescreen(notebook, GRADED_CLASSES)['reason']
     except Exception as e:
-        print(f"  ERROR reading output from {os.path.basename(notebook_path)}: {e}")
+        print(f"  Pre-screen failed, executing anyway: {e}")
+        return None
+    if reason is None:
         return None
+    print(f"  Pre-screen: {reason}; graded with zeros without executing")
+    return (False, zero_csv_line(notebook, notebook_filename),
+            f"{FAILURE_MESSAGES['cannot_score']}: {reason}")
 
 
-def process_student_notebook(notebook_filename):
+def process_student_notebook(notebook_filename, notebook=None, timer=None, monitor=None):
     """
     Processes a single student notebook through all three steps.
     
+    The notebook is read once (or passed in already read), the autograder
+    cell is added and the notebook executed in memory, and the executed
+    notebook is written to the output directory once. Each phase is timed
+    with `timer` (a PhaseTimer), and execution measured with `monitor` (a
+    UsageMonitor), if given.
+    
     Returns:
         tuple: (success, csv_line, error_message)
     """
     notebook_path = os.path.join(INPUT_DIR, notebook_filename)
     output_path = os.path.join(OUTPUT_DIR, notebook_filename)
+    if timer is None:
+        timer = PhaseTimer()
+    
+    if notebook is None:
+        with timer.phase('read'):
+            notebook = read_notebook(notebook_path)
+        if notebook is None:
+            return (False, None, "Failed to read notebook")
+    
+    with timer.phase('prescreen'):
+        prescreened = prescreen_notebook(notebook_filename, notebook)
+    if prescreened is not None:
+        return prescreened
     
     # Step 1: Add autograder cell
     print(f"  Step 1: Adding autograder cell...")
-    if not add_autograder_cell(notebook_path):
-        return (False, None, "Failed to add autograder cell")
+    with timer.phase('inject'):
+        if not add_autograder_cell(notebook, notebook_path):
+            return (False, None, "Failed to add autograder cell")
+        prune_notebook(notebook, notebook_path)
+        timer.grader_cell = grader_cell(notebook)
     
     # Step 2: Execute notebook
     print(f"  Step 2: Executing notebook...")
-    execution_success = execute_notebook(notebook_path, output_path)
+    status = execute_notebook(notebook, notebook_path, timer, monitor)
+    if status == 'ok':
+        with timer.phase('write'):
+            if not write_notebook(notebook, output_path):
+                status = 'error'
+    
+    with timer.phase('extract'):
+        return finish_student_notebook(notebook_filename, notebook, status)
+
+
+def finish_student_notebook(notebook_filename, notebook, status):
+    """
+    Extracts the grades from an executed notebook (step 3), grading it with
+    zeros if execution failed or produced no CSV line.
+    
+    Args:
+        status: Execution status from execute_notebook()
+    
+    Returns:
+        tuple: (success, csv_line, error_message)
+    """
+    if status != 'ok':
+        # If execution failed, create a CSV line with zeros
+        return (False, zero_csv_line(notebook, notebook_filename),
+                FAILURE_MESSAGES.get(status, FAILURE_MESSAGES['error']))
     
     # Step 3: Extract CSV output
     print(f"  Step 3: Extracting results...")
-    csv_line = extract_csv_output(output_path)
+    csv_line = extract_csv_output(notebook)
     
-    if not execution_success:
-        # If execution failed, create a CSV line with zeros
-        # Try to extract student info from the notebook
-        try:
-            with open(notebook_path, 'r', encoding='utf-8') as f:
-                notebook = json.load(f)
-            
-            first_name = "Unknown"
-            last_name = "Unknown"
-            student_id = "Unknown"
+    if csv_line is None:
+        # Execution succeeded but the autograder printed no CSV line
+        # (e.g. the autograder code itself had errors)
+        return (False, zero_csv_line(notebook, notebook_filename),
+                "Could not extract CSV output from autograder")
+    
+    return (True, csv_line, None)
+
+
+def notebook_usage(timer, monitor):
+    """
+    Returns:
+        dict: The resource usage of one notebook's execution (see
+        UsageMonitor.usage), its output size being that of its timed cells
+    """
+    monitor.stop()
+    output_bytes = sum(cell['output_bytes'] for cell in timer.cells) if timer.cells else None
+    return monitor.usage(output_bytes)
+
+
+def grade_notebook_task(notebook_filename):
+    """
+    Grades one notebook, capturing its console output so that the collector
+    can print it as a single block (used by both serial and parallel runs).
+    
+    Returns:
+        dict: filename, success, csv_line, error, the captured log text,
+        the result cache outcome ('hit', 'miss' or None), evictions, the
+        seconds taken, the phase timing record and the resource usage
+    """
+    start = time.perf_counter()
+    timer = PhaseTimer()
+    monitor = UsageMonitor()
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        notebook = None
+        key, cached = lookup_cached_result(notebook_filename)
+        if cached is None:
+            with timer.phase('read'):
+                notebook = read_notebook(os.path.join(INPUT_DIR, notebook_filename))
+            if notebook is not None:
+                key, cached = lookup_cached_result(notebook_filename, notebook)
+        if cached is not None:
+            print("  Unchanged since last graded, using cached result")
+            success, csv_line, error = cached
+            evicted = 0
+        elif notebook is None:
+            success, csv_line, error = False, None, "Failed to read notebook"
+            evicted = 0
+        else:
+            try:
+                success, csv_line, error = process_student_notebook(notebook_filename, notebook,
+                                                                    timer, monitor)
+            except Exception as e:
+                success, csv_line, error = False, None, f"Unexpected error: {e}"
+            evicted = store_cached_result(key, notebook_filename, success, csv_line, error,
+                                          notebook)
+    
+    return {
+        'filename': notebook_filename,
+        'success': success,
+        'csv_line': csv_line,
+        'error': error,
+        'log': log.getvalue(),
+        'cache': None if key is None else ('hit' if cached is not None else 'miss'),
+        'evicted': evicted,
+        'seconds': time.perf_counter() - start,
+        'timing': timer.record(filename=notebook_filename, backend=execution_backend,
+                               worker=os.getpid()),
+        'usage': notebook_usage(timer, monitor),
+    }
+
+
+async def grade_notebook_async(notebook_filename, executor):
+    """
+    Async counterpart of grade_notebook_task: the notebook is executed on the
+    shared event loop, while the steps before and after it (reading,
+    pre-screen, writing, cache updates) run on worker threads so their disk
+    I/O does not hold up the other notebooks in flight.
+    
+    Returns:
+        dict: filename, success, csv_line, error, the captured log text,
+        the result cache outcome ('hit', 'miss' or None), evictions, the
+        seconds taken, the phase timing record and the resource usage
+    """
+    start = time.perf_counter()
+    timer = PhaseTimer()
+    monitor = UsageMonitor()
+    notebook_path = os.path.join(INPUT_DIR, notebook_filename)
+    output_path = os.path.join(OUTPUT_DIR, notebook_filename)
+    log = io.StringIO()
+    key = None
+    
+    notebook = None
+    
+    def result(success, csv_line, error, cache='miss'):
+        evicted = 0
+        if cache == 'miss':
+            evicted = store_cached_result(key, notebook_filename, success, csv_line, error,
+                                          notebook)
+        return {
+            'filename': notebook_filename,
+            'success': success,
+            'csv_line': csv_line,
+            'error': error,
+            'log': log.getvalue(),
+            'cache': None if key is None else cache,
+            'evicted': evicted,
+            'seconds': time.perf_counter() - start,
+            'timing': timer.record(filename=notebook_filename, backend='async',
+                                   worker=os.getpid()),
+            'usage': notebook_usage(timer, monitor),
+        }
+    
+    def prepare():
+        """Readies `notebook` for execution; returns the result if it is already graded."""
+        nonlocal key, notebook
+        with capture_output(log):
+            key, cached = lookup_cached_result(notebook_filename)
+            if cached is None:
+                with timer.phase('read'):
+                    notebook = read_notebook(notebook_path)
+                if notebook is None:
+                    return result(False, None, "Failed to read notebook")
+                key, cached = lookup_cached_result(notebook_filename, notebook)
+            if cached is not None:
+                print("  Unchanged since last graded, using cached result")
+                return result(*cached, cache='hit')
             
-            # Try to find student info in cells
-            for cell in notebook.get('cells', []):
-                source = cell.get('source', '')
-                if 'first_name' in source:
-                    # Try to extract from source code
-                    for line in source.split('\n'):
-                        if 'first_name' in line and '=' in line:
-                            try:
-                                first_name = line.split('=')[1].strip().strip('"').strip("'")
-                            except:
-                                pass
-                        if 'last_name' in line and '=' in line:
-                            try:
-                                last_name = line.split('=')[1].strip().strip('"').strip("'")
-                            except:
-                                pass
-                        if 'student_id' in line and '=' in line:
-                            try:
-                                student_id = line.split('=')[1].strip().strip('"').strip("'")
-                            except:
-                                pass
+            with timer.phase('prescreen'):
+                prescreened = prescreen_notebook(notebook_filename, notebook)
+            if prescreened is not None:
+                return result(*prescreened)
             
-            # If names are still unknown, try to extract username from filename
-            if first_name == "Unknown" or last_name == "Unknown":
-                username = extract_username_from_filename(notebook_filename)
-                if username:
-                    # Use username as both first and last name, or split if possible
-                    first_name = username
-                    last_name = username
+            # Step 1: Add autograder cell
+            print("  Step 1: Adding autograder cell...")
+            with timer.phase('inject'):
+                if not add_autograder_cell(notebook, notebook_path):
+                    return result(False, None, "Failed to add autograder cell")
+                prune_notebook(notebook, notebook_path)
+                timer.grader_cell = grader_cell(notebook)
+            print("  Step 2: Executing notebook...")
+            return None
+    
+    def finish(status, message):
+        with capture_output(log):
+            report_truncated_output(limiter)
+            if status == 'timeout':
+                print(f"  TIMEOUT: {notebook_filename} exceeded the execution time limit")
+            elif status != 'ok' and message:
+                print(f"  ERROR executing {notebook_filename}: {message}")
+            report_limit_breach(status, notebook_path)
+            if status == 'ok':
+                with timer.phase('write'):
+                    if not write_notebook(notebook, output_path):
+                        status = 'error'
             
-            # Create CSV line with zeros for all problems
-            num_problems = 12
-            csv_line = (
-                f"{first_name},{last_name},{student_id}," +
-                ",".join(["0"] * num_problems) +
-                ",0.00"
-            )
-        except:
-            # Fallback: try to extract username from filename
-            username = extract_username_from_filename(notebook_filename)
-            if username:
-                csv_line = f"{username},{username},Unknown,{','.join(['0'] * 12)},0.00"
-            else:
-                csv_line = f"Unknown,Unknown,Unknown,{','.join(['0'] * 12)},0.00"
-        
-        return (False, csv_line, "Notebook execution failed or crashed")
+            # Step 3: Extract CSV output
+            try:
+                with timer.phase('extract'):
+                    graded = finish_student_notebook(notebook_filename, notebook, status)
+            except Exception as e:
+                return result(False, None, f"Unexpected error: {e}")
+            return result(*graded)
     
-    if csv_line is None:
-        # If CSV output is None but execution succeeded, try to extract student info
-        # This might happen if autograder code had errors but notebook executed
+    finished = await asyncio.to_thread(prepare)
+    if finished is not None:
+        return finished
+    
+    # Step 2: Execute notebook (the only step that waits on the kernel)
+    limiter = new_output_limiter(notebook_path)
+    status, message = await executor.execute(notebook, os.path.dirname(notebook_path),
+                                             limiter, timer, monitor)
+    return await asyncio.to_thread(finish, status, message)
+
+
+def iter_async_grading_results(notebooks, concurrency):
+    """
+    Yields (index, result) pairs as notebooks finish grading on a single
+    asyncio event loop, which runs in a background thread.
+    """
+    executor = AsyncNotebookExecutor(
+        concurrency, cell_timeout=EXECUTION_TIMEOUT, notebook_timeout=NOTEBOOK_TIMEOUT,
+        resource_limits=get_resource_limits()
+    )
+    finished = queue.Queue()
+    
+    async def run_all():
+        async def run_one(index, notebook):
+            finished.put((index, await grade_notebook_async(notebook, executor)))
+        await asyncio.gather(*(run_one(i, nb) for i, nb in enumerate(notebooks)))
+    
+    def run_loop():
         try:
-            with open(notebook_path, 'r', encoding='utf-8') as f:
-                notebook = json.load(f)
-            
-            first_name = "Unknown"
-            last_name = "Unknown"
-            student_id = "Unknown"
-            
-            # Try to find student info in cells
-            for cell in notebook.get('cells', []):
-                source = cell.get('source', '')
-                if 'first_name' in source:
-                    for line in source.split('\n'):
-                        if 'first_name' in line and '=' in line:
-                            try:
-                                first_name = line.split('=')[1].strip().strip('"').strip("'")
-                            except:
-                                pass
-                        if 'last_name' in line and '=' in line:
-                            try:
-                                last_name = line.split('=')[1].strip().strip('"').strip("'")
-                            except:
-                                pass
-                        if 'student_id' in line and '=' in line:
-                            try:
-                                student_id = line.split('=')[1].strip().strip('"').strip("'")
-                            except:
-                                pass
-            
-            # If names are still unknown, try to extract username from filename
-            if first_name == "Unknown" or last_name == "Unknown":
-                username = extract_username_from_filename(notebook_filename)
-                if username:
-                    first_name = username
-                    last_name = username
-            
-            # Create CSV line with zeros (autograder didn't produce output)
-            num_problems = 12
-            csv_line = (
-                f"{first_name},{last_name},{student_id}," +
-                ",".join(["0"] * num_problems) +
-                ",0.00"
-            )
-            return (False, csv_line, "Could not extract CSV output from autograder")
-        except:
-            username = extract_username_from_filename(notebook_filename)
-            if username:
-                csv_line = f"{username},{username},Unknown,{','.join(['0'] * 12)},0.00"
-            else:
-                csv_line = f"Unknown,Unknown,Unknown,{','.join(['0'] * 12)},0.00"
-            return (False, csv_line, "Could not extract CSV output")
+            asyncio.run(run_all())
+        finally:
+            finished.put(None)
     
-    return (True, csv_line, None)
+    # Each notebook's steps print to its own log from whichever thread runs them
+    stdout = sys.stdout
+    sys.stdout = ThreadStdout(stdout)
+    try:
+        thread = threading.Thread(target=run_loop, daemon=True)
+        thread.start()
+        while True:
+            item = finished.get()
+            if item is None:
+                break
+            yield item
+        thread.join()
+    finally:
+        sys.stdout = stdout
+
+
+def grading_record(result, status, seconds, cache):
+    """The record main() returns for one graded (or journaled) notebook."""
+    return {
+        'filename': result['filename'],
+        'status': status,
+        'success': result['success'],
+        'csv_line': result['csv_line'],
+        'error': result['error'],
+        'cache': cache,
+        'seconds': seconds,
+        'timing': result.get('timing'),
+        'usage': result.get('usage'),
+    }
+
+
+def iter_grading_results(notebooks, workers, settings):
+    """
+    Yields (index, result) pairs as notebooks finish grading.
+    
+    With one worker the notebooks are graded in order in this process;
+    otherwise they are sent to a process pool and yielded as they complete.
+    The async backend grades them concurrently on one event loop instead.
+    """
+    if settings['execution_backend'] == 'async':
+        yield from iter_async_grading_results(notebooks, settings['concurrency'])
+        return
+    
+    if workers <= 1:
+        for index, notebook in enumerate(notebooks):
+            yield index, grade_notebook_task(notebook)
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(settings,)) as pool:
+        futures = {
+            pool.submit(grade_notebook_task, notebook): index
+            for index, notebook in enumerate(notebooks)
+        }
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        except BaseException:
+            # Don't start the remaining notebooks if the run is interrupted
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def parse_args(argv=None):
+    """Parses the command line options for the autograder."""
+    parser = argparse.ArgumentParser(description="CS3 Autograder - Unified Processing")
+    parser.add_argument(
+        '--workers', type=int, default=os.cpu_count() or 1,
+        help="Number of notebooks to grade in parallel (default: CPU count)"
+    )
+    parser.add_argument(
+        '--kernel-pool', type=int, default=KERNEL_POOL_SIZE, metavar='K',
+        help="Warm kernels kept per worker and reused across notebooks "
+             "(0 starts a fresh kernel for every notebook)"
+    )
+    parser.add_argument(
+        '--backend', choices=['kernel', 'fork', 'async', 'subprocess'],
+        default=EXECUTION_BACKEND,
+        help="How notebooks are executed: in a Jupyter kernel, in forked "
+             "copies of a preloaded grading process (POSIX only), in "
+             "kernels driven concurrently from one asyncio event loop, or in "
+             "a plain Python process, falling back to a kernel for notebooks "
+             "that use magics or display"
+    )
+    parser.add_argument(
+        '--prune', action='store_true', default=PRUNE_CELLS,
+        help="Skip student cells the autograder does not depend on"
+    )
+    parser.add_argument(
+        '--resume', action='store_true',
+        help="Continue an interrupted run: notebooks already recorded in the "
+             "progress journal (and unchanged since) are not graded again"
+    )
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help="Execute every notebook instead of reusing cached results"
+    )
+    parser.add_argument(
+        '--clear-cache', action='store_true',
+        help="Delete all cached results before grading"
+    )
+    parser.add_argument(
+        '--concurrency', type=int, default=ASYNC_CONCURRENCY or os.cpu_count() or 1,
+        help="Notebooks executed at once by the async backend (default: "
+             "ASYNC_CONCURRENCY, or the CPU count)"
+    )
+    parser.add_argument(
+        '--input-dir', metavar='DIR',
+        help="Grade the notebooks in DIR instead of INPUT_DIR"
+    )
+    parser.add_argument(
+        '--output-dir', metavar='DIR',
+        help="Write executed notebooks, grades, journal and cache under DIR "
+             "instead of the configured paths"
+    )
+    parser.add_argument(
+        '--timeout', type=int, metavar='SECONDS',
+        help="Seconds per notebook (default: EXECUTION_TIMEOUT)"
+    )
+    parser.add_argument(
+        '--metrics-port', type=int, default=METRICS_PORT, metavar='PORT',
+        help="Serve live progress metrics (Prometheus format) on this port "
+             f"of {METRICS_ADDRESS} while grading"
+    )
+    parser.add_argument(
+        '--metrics-file', default=METRICS_FILE, metavar='FILE',
+        help=f"Rewrite live progress metrics to FILE every {METRICS_INTERVAL}s while grading"
+    )
+    parser.add_argument(
+        '--trace', metavar='FILE',
+        help="Write a timeline of the run (workers, notebooks, phases and "
+             "cells) to FILE in Chrome Trace Event format, for Perfetto"
+    )
+    args = parser.parse_args(argv)
+    if args.backend == 'fork' and not hasattr(os, 'fork'):
+        parser.error("--backend fork requires a POSIX system")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.kernel_pool < 0:
+        parser.error("--kernel-pool cannot be negative")
+    if args.timeout is not None and args.timeout < 1:
+        parser.error("--timeout must be at least 1")
+    return args
+
+
+def grading_settings(args):
+    """Returns the per-worker settings (see init_worker) chosen on the command line."""
+    return {
+        'kernel_pool_size': args.kernel_pool,
+        'kernel_pool_spares': (KERNEL_POOL_SPARES if KERNEL_POOL_SPARES is not None
+                               else int(args.workers <= 1)),
+        'execution_backend': args.backend,
+        'concurrency': args.concurrency,
+        'result_cache_enabled': RESULT_CACHE_ENABLED and not args.no_cache,
+        'prune_cells': args.prune,
+        'input_dir': args.input_dir,
+        'output_dir': args.output_dir,
+        'timeout': args.timeout,
+    }
+
+
+def write_grades_csv(results):
+    """
+    Writes the grades to GRADES_CSV.
+    
+    Args:
+        results: (csv_line, status) per notebook in CSV order, or None for
+            notebooks that produced no CSV line
+    """
+    with open(GRADES_CSV, 'w', encoding='utf-8') as f:
+        # Write header
+        f.write("first_name,last_name,student_id,")
+        f.write(",".join([f"problem_{i}" for i in range(1, problem_count(GRADING_SPEC) + 1)]))
+        f.write(",total,status\n")
+        
+        # Write results
+        for result in results:
+            if result is not None:
+                csv_line, status = result
+                f.write(f"{csv_line},{status}\n")
 
 
-def main():
+def main(argv=None):
     """
     Main function to run the autograder on all student notebooks.
+    
+    Returns:
+        list: One record per notebook, in CSV order: filename, status,
+        success, csv_line, error, cache outcome, the seconds grading it
+        took, its phase timing record and its resource usage (as journaled
+        for notebooks restored from the progress journal)
     """
+    args = parse_args(argv)
+    settings = grading_settings(args)
+    init_worker(settings)
+    # Compiled once here; the workers get the code with their settings
+    settings['autograder_code'] = autograder_code()
+    
     print("=" * 70)
     print("CS3 Autograder - Unified Processing")
     print("=" * 70)
@@ -343,6 +1359,11 @@ def main():
     print(f"Grades CSV: {GRADES_CSV}")
     print()
     
+    if args.clear_cache:
+        ResultCache(CACHE_DIR, CACHE_MAX_MB * 1024 * 1024).clear()
+        print(f"Cleared result cache: {CACHE_DIR}")
+        print()
+    
     # Find all .ipynb files in the input directory
     notebooks = [f for f in os.listdir(INPUT_DIR) if f.endswith('.ipynb')]
     
@@ -350,52 +1371,154 @@ def main():
         print(f"No .ipynb files found in {INPUT_DIR}")
         sys.exit(1)
     
+    workers = min(args.workers, len(notebooks))
     print(f"Found {len(notebooks)} notebook(s) to process")
+    if args.backend == 'async':
+        print(f"Concurrent notebooks: {args.concurrency}")
+    else:
+        print(f"Workers: {workers}")
+    print(f"Execution backend: {args.backend}")
+    print(f"Execution timeout: {EXECUTION_TIMEOUT}s")
+    if grading_budget(GRADING_SPEC) >= EXECUTION_TIMEOUT:
+        print(f"Warning: the grader may use {grading_budget(GRADING_SPEC):g} CPU seconds, "
+              f"which does not fit in the execution timeout")
+    limits = get_resource_limits()
+    if limits is not None and not limits.process_limit_enforced():
+        print("Process limit: not enforced (RLIMIT_NPROC does not apply to root; "
+              "set RESOURCE_CGROUP_ROOT)")
+    if args.backend in ('kernel', 'subprocess'):
+        print(f"Warm kernels per worker: {args.kernel_pool}"
+              + (f" (+{kernel_pool_spares} spare)" if args.kernel_pool and kernel_pool_spares
+                 else ""))
+    if args.prune:
+        print("Skipping cells not needed by the autograder")
+    if GRADING_SPEC.get('performance'):
+        print("Timing graded methods on growing graphs (performance stage)")
     print()
     
-    # Process each notebook
-    results = []
+    # Results are stored by notebook position so the CSV rows come out in
+    # the same order as a serial run.
+    results = [None] * len(notebooks)
+    records = [None] * len(notebooks)
     successful = 0
     failed = 0
+    failure_statuses = Counter()
+    cache_stats = {'hit': 0, 'miss': 0, 'evicted': 0}
+    
+    # With --resume, notebooks already in the journal are not graded again
+    journal = ProgressJournal(JOURNAL_PATH)
+    journaled = journal.load() if args.resume else {}
+    timing_log = TimingLog(TIMING_LOG)
+    timings = []
+    restored_timings = []
+    if not args.resume:
+        journal.reset()
+        timing_log.reset()
+    pending = []
+    for index, notebook in enumerate(notebooks):
+        record = journaled.get(notebook)
+        if record and journal.is_current(record, os.path.join(INPUT_DIR, notebook)):
+            status = result_status(record['success'], record['error'])
+            if record['csv_line']:
+                results[index] = (record['csv_line'], status)
+            records[index] = grading_record(record, status, record.get('seconds'), 'journal')
+            if record.get('timing'):
+                restored_timings.append(dict(record['timing'], status=status, cache='journal'))
+            if record['success']:
+                successful += 1
+            else:
+                failed += 1
+                failure_statuses[status] += 1
+        else:
+            pending.append(index)
+    resumed = len(notebooks) - len(pending)
+    if args.resume:
+        print(f"Resuming: {resumed} notebook(s) already graded, {len(pending)} remaining")
+        print()
+    
+    metrics = GradingMetrics(len(notebooks), len(pending),
+                             args.concurrency if args.backend == 'async' else workers)
+    exporter = MetricsExporter(metrics, args.metrics_port, METRICS_ADDRESS,
+                               args.metrics_file, METRICS_INTERVAL)
+    try:
+        exporter.start()
+    except OSError as e:
+        print(f"ERROR starting the metrics server on port {args.metrics_port}: {e}")
+        sys.exit(1)
+    if args.metrics_port is not None:
+        print(f"Live metrics: http://{METRICS_ADDRESS}:{args.metrics_port}/metrics")
+    if args.metrics_file:
+        print(f"Live metrics file: {args.metrics_file}")
+    if args.metrics_port is not None or args.metrics_file:
+        print()
     
-    for i, notebook in enumerate(notebooks, 1):
-        print(f"[{i}/{len(notebooks)}] Processing: {notebook}")
-        success, csv_line, error = process_student_notebook(notebook)
+    # Process each remaining notebook
+    grading = iter_grading_results([notebooks[i] for i in pending], workers, settings)
+    for done, (position, result) in enumerate(grading, resumed + 1):
+        index = pending[position]
+        print(f"[{done}/{len(notebooks)}] Processing: {result['filename']}")
+        print(result['log'], end='')
+        if result['cache']:
+            cache_stats[result['cache']] += 1
+        cache_stats['evicted'] += result['evicted']
         
-        if success:
-            results.append(csv_line)
+        status = result_status(result['success'], result['error'])
+        records[index] = grading_record(result, status, result['seconds'], result['cache'])
+        timing = dict(result['timing'], status=status, cache=result['cache'])
+        timings.append(timing)
+        metrics.observe(status, result['seconds'], timing, result['cache'])
+        if result['success']:
+            results[index] = (result['csv_line'], status)
             successful += 1
             print(f"  ✓ Success")
         else:
-            if csv_line:
-                results.append(csv_line)
+            failure_statuses[status] += 1
+            if result['csv_line']:
+                results[index] = (result['csv_line'], status)
                 failed += 1
-                print(f"  ✗ Failed: {error} (graded with zeros)")
+                print(f"  ✗ Failed: {result['error']} (graded with zeros)")
             else:
                 failed += 1
-                print(f"  ✗ Failed: {error} (no output generated)")
+                print(f"  ✗ Failed: {result['error']} (no output generated)")
         
+        journal.append(os.path.join(INPUT_DIR, result['filename']), result)
+        timing_log.append(timing)
         print()
     
+    metrics.finish()
+    exporter.stop()
+    
     # Write all results to CSV file
     print("=" * 70)
     print("Writing results to CSV...")
     try:
-        with open(GRADES_CSV, 'w', encoding='utf-8') as f:
-            # Write header
-            f.write("first_name,last_name,student_id,")
-            f.write(",".join([f"problem_{i}" for i in range(1, 13)]))
-            f.write(",total\n")
-            
-            # Write results
-            for csv_line in results:
-                f.write(f"{csv_line}\n")
-        
+        write_grades_csv(results)
         print(f"✓ Results written to: {GRADES_CSV}")
     except Exception as e:
         print(f"ERROR writing CSV file: {e}")
         sys.exit(1)
     
+    try:
+        written = write_cell_timings(CELL_TIMINGS_CSV, restored_timings + timings)
+        print(f"✓ Timings of {written} executed cell(s) written to: {CELL_TIMINGS_CSV}")
+    except Exception as e:
+        print(f"ERROR writing cell timings CSV file: {e}")
+    
+    usage_rows = [(record['csv_line'], record['status'], record['filename'], record['seconds'],
+                   record['usage']) for record in records if record and record['csv_line']]
+    try:
+        write_usage_csv(RESOURCE_USAGE_CSV, usage_rows)
+        print(f"✓ Resource usage written to: {RESOURCE_USAGE_CSV}")
+    except Exception as e:
+        print(f"ERROR writing resource usage CSV file: {e}")
+    
+    if GRADING_SPEC.get('performance'):
+        try:
+            written = write_performance_csv(notebooks, results)
+            print(f"✓ Performance results for {written} student(s) written to: {PERFORMANCE_CSV}")
+        except Exception as e:
+            print(f"ERROR writing performance CSV file: {e}")
+    
     # Print summary
     print()
     print("=" * 70)
@@ -404,8 +1527,33 @@ def main():
     print(f"Total notebooks processed: {len(notebooks)}")
     print(f"Successful: {successful}")
     print(f"Failed (graded with zeros): {failed}")
+    for status, count in sorted(failure_statuses.items()):
+        print(f"  {FAILURE_MESSAGES.get(status, status)}: {count}")
+    if args.resume:
+        print(f"Restored from progress journal: {resumed}")
+    if settings['result_cache_enabled']:
+        print(f"Result cache: {cache_stats['hit']} hit(s), {cache_stats['miss']} miss(es), "
+              f"{cache_stats['evicted']} eviction(s)")
+    if timings:
+        print()
+        print_phase_summary(timings)
+        print(f"Phase timings saved to: {TIMING_LOG}")
+        print()
+        print_slowest_cells(restored_timings + timings, SLOWEST_CELLS_SHOWN)
+    usages = [record['usage'] for record in records if record and record['usage']]
+    if usages:
+        print()
+        print_usage_summary(usages)
+        print(f"Resource usage saved to: {RESOURCE_USAGE_CSV}")
+    if args.trace:
+        try:
+            write_trace(args.trace, timings)
+            print(f"Trace saved to: {args.trace} (open in https://ui.perfetto.dev)")
+        except Exception as e:
+            print(f"ERROR writing trace file: {e}")
     print(f"Results saved to: {GRADES_CSV}")
     print("=" * 70)
+    return records
 
 
 if __name__ == "__main__":
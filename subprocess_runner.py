@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Kernel-less subprocess backend for the CS3 Autograder
+Runs the code cells of notebooks that need nothing from IPython in a fresh,
+isolated Python process instead of a Jupyter kernel
+"""
+
+import ast
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import cell_runner
+from output_limits import OutputLimiter
+from prescreen import is_ipython_line
+
+# Names whose use means a notebook needs a real IPython kernel
+KERNEL_NAMES = {'display', 'get_ipython'}
+
+# Modules that only behave as in Jupyter inside a kernel (rich display,
+# inline plots, widgets)
+KERNEL_MODULES = {'IPython', 'ipywidgets', 'matplotlib'}
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def needs_kernel(sources):
+    """
+    Checks whether a notebook's code cells use IPython magics (`%`), shell
+    escapes (`!`), help (`?`) or rich display, which only work in a kernel.
+
+    Returns:
+        bool: True if the notebook must be executed in a Jupyter kernel
+    """
+    for source in sources:
+        try:
+            tree = ast.parse(source)
+        except SyntaxError:
+            # Plain syntax errors fail the same way without a kernel
+            if any(is_ipython_line(line) for line in source.splitlines()):
+                return True
+            continue
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and node.id in KERNEL_NAMES:
+                return True
+            if isinstance(node, ast.Import) and any(
+                    alias.name.split('.')[0] in KERNEL_MODULES for alias in node.names):
+                return True
+            if isinstance(node, ast.ImportFrom) and node.level == 0 and (
+                    node.module.split('.')[0] in KERNEL_MODULES):
+                return True
+    return False
+
+
+class SubprocessRunner:
+    """
+    Runs student code cells plus the autograder in a new Python process per
+    notebook.
+
+    The child is started with `python -I` (no user site-packages, no PYTHON*
+    environment variables), in its own session so a timeout kills everything
+    it started, under the same resource limits as a kernel, and with its
+    stdout and stderr discarded: cell output is captured by cell_runner and
+    sent back as one JSON line per cell over a separate pipe, exactly as the
+    fork backend does. Unlike the fork backend, nothing is shared with the
+    grading worker.
+    """
+
+    def __init__(self, autograder_code, timeout, cwd=None, resource_limits=None):
+        self.autograder_code = textwrap.dedent(autograder_code)
+        self.timeout = timeout
+        self.cwd = cwd
+        self.resource_limits = resource_limits
+
+    def command(self):
+        """The command line that starts a child."""
+        cmd = [
+            sys.executable, '-I', '-c',
+            f'import sys; sys.path.insert(0, {REPO_DIR!r}); '
+            'import subprocess_runner; subprocess_runner.child_main()',
+        ]
+        if self.resource_limits is not None:
+            cmd = self.resource_limits.wrap(cmd)
+        return cmd
+
+    def run(self, sources, grader_index=None, limiter=None, timings=None, monitor=None):
+        """
+        Runs a notebook's code cells in a new Python process.
+
+        Args:
+            sources: List of code cell sources, in notebook order
+            grader_index: Index in `sources` of the autograder cell, which is
+                replaced by the autograder code
+            limiter: Optional OutputLimiter whose limits and spill file the
+                child uses for its stream output
+            timings: Optional list the (wall, CPU) seconds of each cell, as
+                measured in the child, are appended to
+            monitor: Optional UsageMonitor, attached to the child and given
+                its rusage once it is reaped
+
+        Returns:
+            tuple: (list of per-cell output lists, status) where status is
+            'ok', 'error', 'timeout' or, if the child broke one of its
+            resource limits, a key of resource_limits.BREACH_MESSAGES.
+            Cells after a failing cell are not run and have no entry.
+        """
+        request = {
+            'sources': sources,
+            'grader': self.autograder_code,
+            'grader_index': grader_index,
+            'output_limits': None,
+        }
+        if limiter is not None:
+            request['output_limits'] = [limiter.cell_limit, limiter.notebook_limit,
+                                        limiter.tail_size, limiter.spill_path]
+
+        read_fd, write_fd = os.pipe()
+        request['result_fd'] = write_fd
+        try:
+            process = subprocess.Popen(
+                self.command(), stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL, cwd=self.cwd, pass_fds=(write_fd,),
+                start_new_session=True,
+            )
+        except OSError:
+            os.close(read_fd)
+            raise
+        finally:
+            os.close(write_fd)
+        if monitor is not None:
+            monitor.attach(process.pid)
+
+        try:
+            try:
+                process.stdin.write(json.dumps(request).encode('utf-8'))
+                process.stdin.close()
+            except BrokenPipeError:
+                # The child died at startup; collect_cells() sees the EOF
+                pass
+            cells, status = cell_runner.collect_cells(read_fd, process.pid, self.timeout,
+                                                      timings)
+        finally:
+            os.close(read_fd)
+            if monitor is not None:
+                monitor.stop()
+            # Reaped with wait4 for its rusage, then recorded on the Popen
+            _, wait_status, rusage = os.wait4(process.pid, 0)
+            exit_code = process.returncode = os.waitstatus_to_exitcode(wait_status)
+            if monitor is not None:
+                monitor.set_rusage(rusage)
+
+        status = cell_runner.final_status(
+            cells, status, len(sources), exit_code, self.resource_limits, process.pid
+        )
+        return cells, status
+
+
+def child_main():
+    """Runs in the child: reads a request from stdin and runs its cells."""
+    request = json.load(sys.stdin)
+    # Student code sees the notebook directory on sys.path, as in a kernel,
+    # rather than the grader's own modules
+    sys.path.remove(REPO_DIR)
+    sys.path.insert(0, '')
+
+    limiter = None
+    if request['output_limits'] is not None:
+        limiter = OutputLimiter(*request['output_limits'])
+    grader = cell_runner.compile_cell(request['grader'], '<autograder>')
+    try:
+        with os.fdopen(request['result_fd'], 'w', encoding='utf-8') as pipe:
+            cell_runner.run_cells(request['sources'], grader, request['grader_index'],
+                                  pipe, limiter)
+    finally:
+        if limiter is not None:
+            limiter.close()
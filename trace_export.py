@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Trace export for the CS3 Autograder
+Turns the phase timing records of a grading run into a Chrome Trace Event
+file (opens in Perfetto or chrome://tracing) with one track per worker
+"""
+
+import json
+import os
+
+from resource_limits import BREACH_MESSAGES
+
+# Statuses marked with an instant event at the end of their notebook
+FAILURE_EVENTS = {'error', 'timeout', *BREACH_MESSAGES}
+
+PID = 1
+
+
+def assign_tracks(records):
+    """
+    Places each notebook on a track: one per worker process, split into
+    slots where a worker runs notebooks at the same time (the async
+    backend), so spans on a track never overlap.
+
+    Returns:
+        tuple: (list of track numbers, parallel to `records`; dict of track
+        number -> track name)
+    """
+    tracks = [None] * len(records)
+    names = {}
+    slots = {}     # worker -> [(track, end time of its last notebook)]
+    order = sorted(range(len(records)), key=lambda i: records[i]['started'])
+    for index in order:
+        record = records[index]
+        start = record['started']
+        worker = slots.setdefault(record.get('worker'), [])
+        for slot, (track, end) in enumerate(worker):
+            if end <= start:
+                break
+        else:
+            track = len(names) + 1
+            slot = len(worker)
+            worker.append(None)
+            names[track] = f"worker {record.get('worker')}" + (f" slot {slot + 1}" if slot else "")
+        worker[slot] = (track, start + record['wall'])
+        tracks[index] = track
+    return tracks, names
+
+
+def trace_events(records):
+    """
+    Builds the trace events of a grading run.
+
+    Each notebook is a span on its worker's track, with its phases and
+    cells nested inside it, and an instant event where it timed out,
+    crashed or broke a resource limit. A counter track shows how many
+    notebooks were being graded at each moment.
+
+    Args:
+        records: Timing records (see phase_timing.PhaseTimer.record) with
+            'status' and 'worker' fields
+
+    Returns:
+        list: Trace Event Format dictionaries, timestamps in microseconds
+        from the start of the first notebook
+    """
+    if not records:
+        return []
+    origin = min(record['started'] for record in records)
+
+    def us(seconds):
+        return round(seconds * 1_000_000, 1)
+
+    tracks, names = assign_tracks(records)
+    events = [{'name': 'process_name', 'ph': 'M', 'pid': PID,
+               'args': {'name': "CS3 Autograder"}}]
+    for track, name in sorted(names.items()):
+        events.append({'name': 'thread_name', 'ph': 'M', 'pid': PID, 'tid': track,
+                       'args': {'name': name}})
+        events.append({'name': 'thread_sort_index', 'ph': 'M', 'pid': PID, 'tid': track,
+                       'args': {'sort_index': track}})
+
+    changes = []
+    for record, track in zip(records, tracks):
+        start = record['started'] - origin
+        end = start + record['wall']
+        events.append({
+            'name': record['filename'], 'cat': 'notebook', 'ph': 'X', 'pid': PID, 'tid': track,
+            'ts': us(start), 'dur': us(record['wall']),
+            'args': {'status': record.get('status'), 'cache': record.get('cache'),
+                     'backend': record.get('backend')},
+        })
+        for label, offset, wall in record.get('spans', []):
+            events.append({
+                'name': label, 'cat': 'cell' if label.startswith('cell ') else 'phase',
+                'ph': 'X', 'pid': PID, 'tid': track,
+                'ts': us(start + offset), 'dur': us(wall),
+                'args': {'notebook': record['filename']},
+            })
+        if record.get('status') in FAILURE_EVENTS:
+            events.append({
+                'name': record['status'], 'cat': 'failure', 'ph': 'i', 's': 't',
+                'pid': PID, 'tid': track, 'ts': us(end),
+                'args': {'notebook': record['filename']},
+            })
+        changes += [(start, 1), (end, -1)]
+
+    busy = 0
+    for time, change in sorted(changes):
+        busy += change
+        events.append({'name': 'notebooks in progress', 'ph': 'C', 'pid': PID,
+                       'ts': us(time), 'args': {'notebooks': busy}})
+    return events
+
+
+def write_trace(path, records):
+    """Writes the trace of a grading run to `path` as Chrome Trace Event JSON."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': trace_events(records), 'displayTimeUnit': 'ms'}, f)
@@ -0,0 +1,644 @@
+#!/usr/bin/env python3
+"""
+Work queue for the CS3 Autograder
+Spreads the grading of one exam over several machines that share a
+filesystem: the notebooks are queued in a SQLite database there, workers on
+any host lease them one at a time, and a final collect step writes the
+grades from the queue
+
+    python work_queue.py enqueue              # once, from any host
+    python work_queue.py worker --workers 8   # on every grading host
+    python work_queue.py status
+    python work_queue.py collect              # once every notebook is graded
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import run_autograder
+from config import (
+    QUEUE_PATH, QUEUE_LEASE_SECONDS, QUEUE_HEARTBEAT, QUEUE_MAX_ATTEMPTS, GRADING_SPEC
+)
+from phase_timing import (
+    TimingLog, print_phase_summary, print_slowest_cells, write_cell_timings
+)
+from progress_journal import ProgressJournal
+from resource_usage import print_usage_summary, write_usage_csv
+from trace_export import write_trace
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS notebooks (
+    filename TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',   -- pending, leased or done
+    mtime REAL,
+    size INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    success INTEGER,
+    csv_line TEXT,
+    error TEXT,
+    status TEXT,
+    seconds REAL,
+    cache TEXT,
+    timing TEXT,
+    usage TEXT,
+    finished REAL
+)
+'''
+
+# Seconds an idle worker waits before looking for expired leases again
+POLL_INTERVAL = 5
+
+# Error recorded for a notebook whose workers kept dying
+ABANDONED_ERROR = "Notebook execution failed or crashed: its worker died {attempts} times"
+
+# Held by the heartbeat thread while it renews a lease. The fork backend
+# forks the worker while that thread runs, so every fork waits for the lock:
+# the child never inherits a half-finished renewal (a held SQLite or stdout
+# lock), and no renewal starts until the fork is done.
+_heartbeat_lock = threading.Lock()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_heartbeat_lock.acquire,
+                        after_in_parent=_heartbeat_lock.release,
+                        after_in_child=_heartbeat_lock.release)
+
+
+def abandoned_csv_line(filename):
+    """
+    Returns:
+        str: The zero CSV line of a notebook no worker could grade, naming
+        the student from the notebook in INPUT_DIR or else its filename
+    """
+    with contextlib.redirect_stdout(None):
+        notebook = run_autograder.read_notebook(os.path.join(run_autograder.INPUT_DIR, filename))
+    return run_autograder.zero_csv_line(notebook, filename)
+
+
+def worker_id():
+    """Identifies this worker process across hosts, e.g. 'grader2:4711'."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    The notebooks of one exam and their grading state, in a SQLite database.
+
+    Every operation opens its own connection and runs in one transaction,
+    so any number of processes on any number of hosts can share the
+    database (the filesystem must support POSIX locks, as NFSv4 does).
+    Claiming takes the write lock first (BEGIN IMMEDIATE), so a notebook is
+    leased to exactly one worker at a time. The rollback journal is kept
+    rather than WAL, which does not work over a network filesystem.
+
+    Lease expiry compares wall clocks, so the hosts' clocks must agree to
+    well within the lease time (NTP).
+    """
+
+    def __init__(self, path, timeout=60):
+        self.path = path
+        self.timeout = timeout
+
+    @contextlib.contextmanager
+    def transaction(self, write=True):
+        """
+        A connection inside a transaction, committed on success. A write
+        transaction takes the write lock up front (BEGIN IMMEDIATE); a read
+        (BEGIN) only holds a shared lock while it reads.
+        """
+        db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            db.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+            try:
+                yield db
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+            db.execute('COMMIT')
+        finally:
+            db.close()
+
+    def create(self):
+        """Creates the database, if it does not exist yet."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self.transaction() as db:
+            db.execute(SCHEMA)
+
+    def enqueue(self, input_dir, filenames, regrade=False):
+        """
+        Adds notebooks to the queue. Notebooks already graded are queued
+        again if they changed since (or all of them with `regrade`).
+
+        Returns:
+            tuple: (notebooks added, notebooks queued again)
+        """
+        added = requeued = 0
+        with self.transaction() as db:
+            position = db.execute('SELECT COALESCE(MAX(position), 0) FROM notebooks').fetchone()[0]
+            for filename in filenames:
+                try:
+                    mtime, size = ProgressJournal.fingerprint(os.path.join(input_dir, filename))
+                except OSError:
+                    mtime, size = None, None
+                row = db.execute('SELECT state, mtime, size FROM notebooks WHERE filename = ?',
+                                 (filename,)).fetchone()
+                if row is None:
+                    position += 1
+                    db.execute('INSERT INTO notebooks (filename, position, mtime, size) '
+                               'VALUES (?, ?, ?, ?)', (filename, position, mtime, size))
+                    added += 1
+                elif row['state'] == 'done' and (regrade or (row['mtime'], row['size'])
+                                                 != (mtime, size)):
+                    db.execute("UPDATE notebooks SET state = 'pending', attempts = 0, "
+                               "worker = NULL, lease_expires = NULL, mtime = ?, size = ? "
+                               "WHERE filename = ?", (mtime, size, filename))
+                    requeued += 1
+        return added, requeued
+
+    def _expire_leases(self, db, now):
+        """
+        Requeues notebooks whose worker stopped renewing its lease.
+
+        Returns:
+            list: (filename, attempts) of the expired notebooks that ran out
+            of attempts; they stay leased until _abandon() grades them
+        """
+        expired = db.execute("SELECT filename, attempts FROM notebooks "
+                             "WHERE state = 'leased' AND lease_expires < ?", (now,)).fetchall()
+        abandoned = []
+        for row in expired:
+            if row['attempts'] >= QUEUE_MAX_ATTEMPTS:
+                abandoned.append((row['filename'], row['attempts']))
+            else:
+                db.execute("UPDATE notebooks SET state = 'pending', worker = NULL, "
+                           "lease_expires = NULL WHERE filename = ?", (row['filename'],))
+        return abandoned
+
+    def _abandon(self, abandoned, now):
+        """
+        Grades notebooks that ran out of attempts with zeros; probably the
+        notebook itself takes its worker down, and the student still gets a
+        CSV row. Called after _expire_leases()'s transaction is committed,
+        so the notebooks are read from INPUT_DIR without holding the lock.
+        """
+        if not abandoned:
+            return
+        rows = [(abandoned_csv_line(filename), ABANDONED_ERROR.format(attempts=attempts),
+                 now, filename, now) for filename, attempts in abandoned]
+        with self.transaction() as db:
+            # Skips notebooks another worker abandoned (or renewed) meanwhile
+            db.executemany("UPDATE notebooks SET state = 'done', success = 0, status = 'error', "
+                           "worker = NULL, lease_expires = NULL, csv_line = ?, error = ?, "
+                           "finished = ? WHERE filename = ? AND state = 'leased' "
+                           "AND lease_expires < ?", rows)
+
+    def expire_leases(self):
+        """Requeues (or, out of attempts, abandons) notebooks whose leases expired."""
+        now = time.time()
+        with self.transaction() as db:
+            abandoned = self._expire_leases(db, now)
+        self._abandon(abandoned, now)
+
+    def claim(self, worker, lease_seconds=QUEUE_LEASE_SECONDS):
+        """
+        Leases the next pending notebook to `worker`, first requeueing the
+        notebooks of workers whose leases expired.
+
+        Returns:
+            str: The notebook's filename, or None if none is pending
+        """
+        now = time.time()
+        filename = None
+        with self.transaction() as db:
+            abandoned = self._expire_leases(db, now)
+            row = db.execute("SELECT filename FROM notebooks WHERE state = 'pending' "
+                             "ORDER BY position LIMIT 1").fetchone()
+            if row is not None:
+                filename = row['filename']
+                db.execute("UPDATE notebooks SET state = 'leased', worker = ?, "
+                           "lease_expires = ?, attempts = attempts + 1 WHERE filename = ?",
+                           (worker, now + lease_seconds, filename))
+        self._abandon(abandoned, now)
+        return filename
+
+    def heartbeat(self, filename, worker, lease_seconds=QUEUE_LEASE_SECONDS):
+        """
+        Renews `worker`'s lease on a notebook.
+
+        Returns:
+            bool: False if the lease was lost (it expired and the notebook
+            was handed to another worker)
+        """
+        with self.transaction() as db:
+            updated = db.execute("UPDATE notebooks SET lease_expires = ? WHERE filename = ? "
+                                 "AND worker = ? AND state = 'leased'",
+                                 (time.time() + lease_seconds, filename, worker))
+            return updated.rowcount == 1
+
+    def release(self, filename, worker):
+        """Gives a leased notebook back to the queue without counting the attempt."""
+        with self.transaction() as db:
+            db.execute("UPDATE notebooks SET state = 'pending', worker = NULL, "
+                       "lease_expires = NULL, attempts = MAX(attempts - 1, 0) "
+                       "WHERE filename = ? AND worker = ? AND state = 'leased'",
+                       (filename, worker))
+
+    def complete(self, filename, worker, result, status):
+        """
+        Records the result of grading a notebook (from grade_notebook_task).
+        If two workers graded it (a lease expired while its worker was still
+        alive), the first result is kept.
+
+        Returns:
+            bool: True if this result was recorded
+        """
+        with self.transaction() as db:
+            updated = db.execute(
+                "UPDATE notebooks SET state = 'done', worker = ?, lease_expires = NULL, "
+                "success = ?, csv_line = ?, error = ?, status = ?, seconds = ?, cache = ?, "
+                "timing = ?, usage = ?, finished = ? WHERE filename = ? AND state != 'done'",
+                (worker, int(result['success']), result['csv_line'], result['error'], status,
+                 result['seconds'], result['cache'], json.dumps(result.get('timing')),
+                 json.dumps(result.get('usage')), time.time(), filename))
+            return updated.rowcount == 1
+
+    def counts(self):
+        """
+        Returns:
+            dict: Number of notebooks per state (pending, leased, done);
+            expired leases count as leased until expire_leases() or claim()
+            requeues them
+        """
+        counts = {'pending': 0, 'leased': 0, 'done': 0}
+        with self.transaction(write=False) as db:
+            for row in db.execute('SELECT state, COUNT(*) FROM notebooks GROUP BY state'):
+                counts[row[0]] = row[1]
+        return counts
+
+    def leases(self):
+        """
+        Returns:
+            list: (filename, worker, seconds until the lease expires) of the
+            notebooks being graded
+        """
+        with self.transaction(write=False) as db:
+            rows = db.execute("SELECT filename, worker, lease_expires FROM notebooks "
+                              "WHERE state = 'leased' ORDER BY position").fetchall()
+        now = time.time()
+        return [(row['filename'], row['worker'], row['lease_expires'] - now) for row in rows]
+
+    def results(self):
+        """
+        Returns:
+            list: One dict per notebook in queue order: filename, state,
+            success, csv_line, error, status, seconds, cache, worker, and
+            the timing and usage records (None if not graded)
+        """
+        with self.transaction(write=False) as db:
+            rows = db.execute('SELECT * FROM notebooks ORDER BY position').fetchall()
+        results = []
+        for row in rows:
+            results.append({
+                'filename': row['filename'],
+                'state': row['state'],
+                'success': bool(row['success']),
+                'csv_line': row['csv_line'],
+                'error': row['error'],
+                'status': row['status'],
+                'seconds': row['seconds'],
+                'cache': row['cache'],
+                'worker': row['worker'],
+                'timing': json.loads(row['timing']) if row['timing'] else None,
+                'usage': json.loads(row['usage']) if row['usage'] else None,
+            })
+        return results
+
+
+@contextlib.contextmanager
+def keep_lease(queue, filename, worker, lease_seconds, interval):
+    """
+    Renews the lease on `filename` every `interval` seconds in a background
+    thread, paused while the worker forks (see _heartbeat_lock).
+    """
+    stop = threading.Event()
+
+    def renew():
+        while not stop.wait(interval):
+            with _heartbeat_lock:
+                try:
+                    if not queue.heartbeat(filename, worker, lease_seconds):
+                        print(f"  [{worker}] Lost the lease on {filename}")
+                        return
+                except sqlite3.Error as e:
+                    print(f"  [{worker}] Could not renew the lease on {filename}: {e}")
+
+    thread = threading.Thread(target=renew, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def work(queue_path, lease_seconds, heartbeat):
+    """
+    Grades notebooks from the queue until none is left, in a process set up
+    with run_autograder.init_worker(). While other workers still hold
+    leases, it waits in case one of them dies and its notebook is requeued.
+
+    Returns:
+        int: Number of notebooks this worker graded
+    """
+    queue = WorkQueue(queue_path)
+    worker = worker_id()
+    graded = 0
+    while True:
+        filename = queue.claim(worker, lease_seconds)
+        if filename is None:
+            if queue.counts()['leased'] == 0:
+                return graded
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        try:
+            with keep_lease(queue, filename, worker, lease_seconds, heartbeat):
+                result = run_autograder.grade_notebook_task(filename)
+        except BaseException:
+            queue.release(filename, worker)
+            raise
+        if result.get('timing') is not None:
+            result['timing']['worker'] = worker
+        status = run_autograder.result_status(result['success'], result['error'])
+        recorded = queue.complete(filename, worker, result, status)
+        print(f"[{worker}] {filename}: {status}"
+              + ("" if recorded else " (already graded by another worker)")
+              + "\n" + result['log'], end='', flush=True)
+        graded += 1
+
+
+def default_queue_path(output_dir):
+    """QUEUE_PATH, moved under `output_dir` if one was given."""
+    if output_dir is None:
+        return QUEUE_PATH
+    return os.path.join(output_dir, os.path.basename(QUEUE_PATH))
+
+
+def use_folders(args):
+    """
+    Points run_autograder at the input and output folders the workers use,
+    for the commands that do not grade (GRADES_CSV, ... follow --output-dir).
+    """
+    folder_argv = []
+    if args.input_dir is not None:
+        folder_argv += ['--input-dir', args.input_dir]
+    if args.output_dir is not None:
+        folder_argv += ['--output-dir', args.output_dir]
+    run_autograder.init_worker(run_autograder.grading_settings(
+        run_autograder.parse_args(folder_argv)))
+
+
+def enqueue_command(args):
+    use_folders(args)
+    input_dir = run_autograder.INPUT_DIR
+    if not os.path.isdir(input_dir):
+        print(f"ERROR: Input directory does not exist: {input_dir}")
+        sys.exit(1)
+    notebooks = [f for f in os.listdir(input_dir) if f.endswith('.ipynb')]
+    if not notebooks:
+        print(f"No .ipynb files found in {input_dir}")
+        sys.exit(1)
+    queue = WorkQueue(args.queue or default_queue_path(args.output_dir))
+    queue.create()
+    added, requeued = queue.enqueue(input_dir, notebooks, args.regrade)
+    counts = queue.counts()
+    print(f"Queue: {queue.path}")
+    print(f"Added {added} notebook(s), queued {requeued} changed notebook(s) again")
+    print(f"Pending: {counts['pending']}, being graded: {counts['leased']}, "
+          f"graded: {counts['done']}")
+
+
+def worker_command(args, grading_argv):
+    grading_args = run_autograder.parse_args(grading_argv)
+    if grading_args.backend == 'async':
+        print("ERROR: the async backend cannot be used by queue workers; use --workers")
+        sys.exit(1)
+    settings = run_autograder.grading_settings(grading_args)
+    run_autograder.init_worker(settings)
+    settings['autograder_code'] = run_autograder.autograder_code()
+    queue_path = args.queue or default_queue_path(grading_args.output_dir)
+    if not os.path.exists(queue_path):
+        print(f"ERROR: Queue does not exist (run 'work_queue.py enqueue' first): {queue_path}")
+        sys.exit(1)
+    os.makedirs(run_autograder.OUTPUT_DIR, exist_ok=True)
+
+    workers = grading_args.workers
+    print(f"Worker {socket.gethostname()}: {workers} process(es), "
+          f"backend {grading_args.backend}, queue {queue_path}")
+    start = time.perf_counter()
+    if workers <= 1:
+        graded = work(queue_path, args.lease, args.heartbeat)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=run_autograder.init_worker,
+                                 initargs=(settings,)) as pool:
+            futures = [pool.submit(work, queue_path, args.lease, args.heartbeat)
+                       for _ in range(workers)]
+            graded = sum(future.result() for future in futures)
+    elapsed = time.perf_counter() - start
+    print(f"Worker {socket.gethostname()} graded {graded} notebook(s) in {elapsed:.1f}s; "
+          f"queue is empty")
+
+
+def status_command(args):
+    use_folders(args)
+    queue = WorkQueue(args.queue or default_queue_path(args.output_dir))
+    if not os.path.exists(queue.path):
+        print(f"ERROR: Queue does not exist: {queue.path}")
+        sys.exit(1)
+    queue.expire_leases()
+    counts = queue.counts()
+    print(f"Queue: {queue.path}")
+    print(f"Pending: {counts['pending']}, being graded: {counts['leased']}, "
+          f"graded: {counts['done']}")
+    for filename, worker, remaining in queue.leases():
+        print(f"  {filename}: {worker} (lease expires in {remaining:.0f}s)")
+    by_host = Counter(result['worker'].rsplit(':', 1)[0]
+                      for result in queue.results() if result['state'] == 'done'
+                      and result['worker'])
+    for host, count in sorted(by_host.items()):
+        print(f"  {host}: {count} graded")
+
+
+def collect_command(args):
+    use_folders(args)
+    queue = WorkQueue(args.queue or default_queue_path(args.output_dir))
+    if not os.path.exists(queue.path):
+        print(f"ERROR: Queue does not exist: {queue.path}")
+        sys.exit(1)
+    queue.expire_leases()
+    counts = queue.counts()
+    unfinished = counts['pending'] + counts['leased']
+    if unfinished and not args.partial:
+        print(f"ERROR: {unfinished} notebook(s) not graded yet "
+              f"(use --partial to write the grades so far)")
+        sys.exit(1)
+
+    graded = [result for result in queue.results() if result['state'] == 'done']
+    results = [(result['csv_line'], result['status']) if result['csv_line'] else None
+               for result in graded]
+    try:
+        run_autograder.write_grades_csv(results)
+        print(f"✓ Results written to: {run_autograder.GRADES_CSV}")
+    except Exception as e:
+        print(f"ERROR writing CSV file: {e}")
+        sys.exit(1)
+
+    timings = [dict(result['timing'], status=result['status'], cache=result['cache'])
+               for result in graded if result['timing']]
+    timing_log = TimingLog(run_autograder.TIMING_LOG)
+    try:
+        timing_log.reset()
+        for timing in timings:
+            timing_log.append(timing)
+        written = write_cell_timings(run_autograder.CELL_TIMINGS_CSV, timings)
+        print(f"✓ Timings of {written} executed cell(s) written to: "
+              f"{run_autograder.CELL_TIMINGS_CSV}")
+    except Exception as e:
+        print(f"ERROR writing timings: {e}")
+
+    usage_rows = [(result['csv_line'], result['status'], result['filename'], result['seconds'],
+                   result['usage']) for result in graded if result['csv_line']]
+    try:
+        write_usage_csv(run_autograder.RESOURCE_USAGE_CSV, usage_rows)
+        print(f"✓ Resource usage written to: {run_autograder.RESOURCE_USAGE_CSV}")
+    except Exception as e:
+        print(f"ERROR writing resource usage CSV file: {e}")
+
+    if GRADING_SPEC.get('performance'):
+        try:
+            written = run_autograder.write_performance_csv(
+                [result['filename'] for result in graded], results)
+            print(f"✓ Performance results for {written} student(s) written to: "
+                  f"{run_autograder.PERFORMANCE_CSV}")
+        except Exception as e:
+            print(f"ERROR writing performance CSV file: {e}")
+
+    # Print summary
+    statuses = Counter(result['status'] for result in graded)
+    print()
+    print("=" * 70)
+    print("SUMMARY")
+    print("=" * 70)
+    print(f"Total notebooks processed: {len(graded)}")
+    if unfinished:
+        print(f"Not graded yet: {unfinished}")
+    print(f"Successful: {statuses.pop('ok', 0)}")
+    print(f"Failed (graded with zeros): {sum(statuses.values())}")
+    for status, count in sorted(statuses.items()):
+        print(f"  {run_autograder.FAILURE_MESSAGES.get(status, status)}: {count}")
+    by_host = Counter(result['worker'].rsplit(':', 1)[0] for result in graded
+                      if result['worker'])
+    for host, count in sorted(by_host.items()):
+        print(f"Graded on {host}: {count}")
+    if timings:
+        print()
+        print_phase_summary(timings)
+        print()
+        print_slowest_cells(timings, run_autograder.SLOWEST_CELLS_SHOWN)
+    usages = [result['usage'] for result in graded if result['usage']]
+    if usages:
+        print()
+        print_usage_summary(usages)
+    if args.trace:
+        try:
+            write_trace(args.trace, timings)
+            print(f"Trace saved to: {args.trace} (open in https://ui.perfetto.dev)")
+        except Exception as e:
+            print(f"ERROR writing trace file: {e}")
+    print(f"Results saved to: {run_autograder.GRADES_CSV}")
+    print("=" * 70)
+
+
+def parse_args(argv=None):
+    """
+    Parses the command line. The worker command also takes the grading
+    options of run_autograder.py (--workers, --backend, --timeout, ...).
+
+    Returns:
+        tuple: (options, remaining arguments for run_autograder.parse_args)
+    """
+    parser = argparse.ArgumentParser(description="CS3 Autograder - Work Queue")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    enqueue = commands.add_parser('enqueue', help="Queue the notebooks of the input directory")
+    enqueue.add_argument('--regrade', action='store_true',
+                         help="Queue notebooks that were already graded again")
+
+    worker = commands.add_parser(
+        'worker', help="Grade queued notebooks until none is left",
+        description="Grade queued notebooks until none is left. Any option of "
+                    "run_autograder.py that chooses how to grade (--workers, --backend, "
+                    "--kernel-pool, --prune, --no-cache, --input-dir, --output-dir, "
+                    "--timeout) may be given as well."
+    )
+    worker.add_argument('--lease', type=int, default=QUEUE_LEASE_SECONDS, metavar='SECONDS',
+                        help="Seconds without a heartbeat after which a notebook is "
+                             "handed to another worker")
+    worker.add_argument('--heartbeat', type=int, default=QUEUE_HEARTBEAT, metavar='SECONDS',
+                        help="Seconds between renewals of a worker's lease")
+
+    commands.add_parser('status', help="Show how far grading has got")
+
+    collect = commands.add_parser('collect', help="Write the grades CSV from the queue")
+    collect.add_argument('--partial', action='store_true',
+                         help="Write the grades even if some notebooks are not graded yet")
+    collect.add_argument('--trace', metavar='FILE',
+                         help="Write a timeline of all workers to FILE (Chrome Trace format)")
+
+    for command in (enqueue, commands.choices['status'], collect):
+        command.add_argument('--input-dir', metavar='DIR',
+                             help="Input directory the workers use, instead of INPUT_DIR")
+        command.add_argument('--output-dir', metavar='DIR',
+                             help="Output directory the workers use, instead of OUTPUT_DIR")
+    for command in commands.choices.values():
+        command.add_argument('--queue', metavar='FILE',
+                             help="Queue database (default: QUEUE_PATH, or queue.sqlite "
+                                  "in --output-dir)")
+
+    args, remaining = parser.parse_known_args(argv)
+    if args.command != 'worker' and remaining:
+        parser.error(f"unrecognized arguments: {' '.join(remaining)}")
+    if args.command == 'worker':
+        if args.heartbeat < 1:
+            parser.error("--heartbeat must be at least 1")
+        if args.lease <= args.heartbeat:
+            parser.error("--lease must be longer than --heartbeat")
+    return args, remaining
+
+
+def main(argv=None):
+    """Runs one work queue command."""
+    args, grading_argv = parse_args(argv)
+    if args.command == 'enqueue':
+        enqueue_command(args)
+    elif args.command == 'worker':
+        worker_command(args, grading_argv)
+    elif args.command == 'status':
+        status_command(args)
+    else:
+        collect_command(args)
+
+
+if __name__ == "__main__":
+    main()